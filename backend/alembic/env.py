@@ -14,7 +14,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from app.database import Base
 from app.config import settings
-from app.models import user  # noqa: F401 確保模型被載入
+from app.models import user, invoice  # noqa: F401 確保模型被載入
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
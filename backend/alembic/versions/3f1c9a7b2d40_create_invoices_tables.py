@@ -0,0 +1,59 @@
+"""create invoices tables
+
+Revision ID: 3f1c9a7b2d40
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7b2d40'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'invoices',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('invoice_number', sa.String(length=50), nullable=False, comment='發票號碼'),
+        sa.Column('invoice_code', sa.String(length=50), nullable=False, comment='發票代碼'),
+        sa.Column('invoice_date', sa.Date(), nullable=True, comment='開票日期'),
+        sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=True, comment='金額'),
+        sa.Column('tax_amount', sa.Numeric(precision=18, scale=2), nullable=True, comment='稅額'),
+        sa.Column('total_amount', sa.Numeric(precision=18, scale=2), nullable=True, comment='價稅合計'),
+        sa.Column('seller', sa.Unicode(length=200), nullable=False, comment='銷售方名稱'),
+        sa.Column('seller_tax_id', sa.String(length=50), nullable=False, comment='銷售方納稅人識別號'),
+        sa.Column('buyer', sa.Unicode(length=200), nullable=False, comment='購買方名稱'),
+        sa.Column('buyer_tax_id', sa.String(length=50), nullable=False, comment='購買方納稅人識別號'),
+        sa.Column('remarks', sa.Unicode(length=500), nullable=False, comment='備註'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True, comment='建立時間'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_invoices_id'), 'invoices', ['id'], unique=False)
+    op.create_table(
+        'invoice_items',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=False, comment='所屬發票 ID'),
+        sa.Column('name', sa.Unicode(length=200), nullable=False, comment='項目名稱'),
+        sa.Column('quantity', sa.String(length=50), nullable=False, comment='數量'),
+        sa.Column('price', sa.String(length=50), nullable=False, comment='價格'),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_invoice_items_id'), 'invoice_items', ['id'], unique=False)
+    op.create_index(op.f('ix_invoice_items_invoice_id'), 'invoice_items', ['invoice_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_invoice_items_invoice_id'), table_name='invoice_items')
+    op.drop_index(op.f('ix_invoice_items_id'), table_name='invoice_items')
+    op.drop_table('invoice_items')
+    op.drop_index(op.f('ix_invoices_id'), table_name='invoices')
+    op.drop_table('invoices')
@@ -0,0 +1,48 @@
+"""add invoice unique index
+
+Revision ID: 8d2e4b61c9f3
+Revises: 3f1c9a7b2d40
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4b61c9f3'
+down_revision: Union[str, None] = '3f1c9a7b2d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 同一 (發票號碼, 發票代碼, 銷售方稅號) 中 ID 較大的重複記錄（保留最早保存的一筆）
+DUPLICATE_IDS = """
+    SELECT later.id FROM invoices later
+    WHERE later.invoice_number <> '' AND EXISTS (
+        SELECT 1 FROM invoices earlier
+        WHERE earlier.invoice_number = later.invoice_number
+          AND earlier.invoice_code = later.invoice_code
+          AND earlier.seller_tax_id = later.seller_tax_id
+          AND earlier.id < later.id
+    )
+"""
+
+
+def upgrade() -> None:
+    # 建立唯一索引前先移除既有的重複發票
+    op.execute(f"DELETE FROM invoice_items WHERE invoice_id IN ({DUPLICATE_IDS})")
+    op.execute(f"DELETE FROM invoices WHERE id IN ({DUPLICATE_IDS})")
+    op.create_index(
+        'uq_invoices_number_code_seller',
+        'invoices',
+        ['invoice_number', 'invoice_code', 'seller_tax_id'],
+        unique=True,
+        mssql_where=sa.text("invoice_number <> ''"),
+        sqlite_where=sa.text("invoice_number <> ''"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_invoices_number_code_seller', table_name='invoices')
@@ -0,0 +1,44 @@
+"""add invoice query indexes
+
+Revision ID: c47a9e15b3d2
+Revises: 8d2e4b61c9f3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a9e15b3d2'
+down_revision: Union[str, None] = '8d2e4b61c9f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_invoices_date_amounts',
+        'invoices',
+        ['invoice_date', 'id', 'seller_tax_id', 'amount', 'tax_amount', 'total_amount'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_invoices_seller_date_amounts',
+        'invoices',
+        ['seller_tax_id', 'invoice_date', 'amount', 'tax_amount', 'total_amount'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_invoices_buyer_tax_id_invoice_date',
+        'invoices',
+        ['buyer_tax_id', 'invoice_date'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invoices_buyer_tax_id_invoice_date', table_name='invoices')
+    op.drop_index('ix_invoices_seller_date_amounts', table_name='invoices')
+    op.drop_index('ix_invoices_date_amounts', table_name='invoices')
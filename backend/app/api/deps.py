@@ -1,10 +1,46 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
+from fastapi import Depends, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.core.exceptions import UnauthorizedException
+from app.core.security import decode_access_token
+from app.database import get_async_db, get_db
+
+# Bearer 權杖（可選，未提供時不報錯）
+bearer_scheme = HTTPBearer(auto_error=False)
+
 
 # 重新匯出 get_db 方便使用
 def get_database() -> Generator:
     """
     資料庫依賴注入
     """
-    return get_db()
+    yield from get_db()
+
+
+async def get_async_database() -> AsyncGenerator:
+    """
+    異步資料庫依賴注入
+    """
+    async for db in get_async_db():
+        yield db
+
+
+def get_quota_key(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> str:
+    """
+    AI 用量配額鍵依賴注入
+
+    攜帶 JWT 時按權杖主題（使用者）計量，否則按客戶端 IP 計量
+
+    Raises:
+        UnauthorizedException: 權杖無效或已過期
+    """
+    if credentials:
+        subject = decode_access_token(credentials.credentials)
+        if subject is None:
+            raise UnauthorizedException(detail="存取權杖無效或已過期")
+        return f"user:{subject}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
@@ -0,0 +1,24 @@
+"""調試端點 - 導出最近記錄的 span"""
+from typing import Optional
+from fastapi import APIRouter, Query
+from app.utils.performance import span_recorder
+
+router = APIRouter()
+
+
+@router.get("/spans")
+async def get_spans(
+    limit: int = Query(200, ge=1, description="最多返回的 span 數（最近的）"),
+    trace_id: Optional[str] = Query(None, description="只返回指定 trace 的 span"),
+    format: str = Query("json", pattern="^(json|otlp)$", description="json 或 otlp（OpenTelemetry OTLP/JSON）"),
+):
+    """
+    獲取最近記錄的 span
+
+    Returns:
+        span 列表，format=otlp 時為可直接送往 OTLP collector 的 JSON
+    """
+    spans = span_recorder.get_spans(limit=limit, trace_id=trace_id)
+    if format == "otlp":
+        return span_recorder.export_otlp(spans)
+    return {"total": len(spans), "spans": [item.to_dict() for item in spans]}
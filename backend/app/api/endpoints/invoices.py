@@ -1,17 +1,69 @@
-from fastapi import APIRouter
+import json
+from typing import Any, Callable, Coroutine, Dict, Optional
+from fastapi import APIRouter, Depends, File, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_database, get_quota_key
+from app.config import settings
+from app.core.exceptions import BadRequestException, NotFoundException, ServiceUnavailableException
+from app.core.response import cursor_paginated_response
+from app.crud.crud_base import InvalidCursorError
 from app.schemas.invoice import (
+    InvoiceFilter,
+    InvoiceListResponse,
+    MonthlySummaryResponse,
     RecognizeRequest,
     RecognizeResponse,
+    BatchRecognizeRequest,
+    BatchRecognizeResponse,
+    RecognizeJobResponse,
     SaveInvoicesRequest,
     SaveResponse,
+    SellerSummaryResponse,
 )
 from app.services.invoice_service import invoice_service
+from app.services.ai_service import ai_service
+from app.services.job_service import JOB_FAILED, job_service
+from app.services.quota_service import quota_service
 
-router = APIRouter()
+def _upload_too_large_message() -> str:
+    return f"圖片大小超過上限 {settings.UPLOAD_MAX_BYTES // (1024 * 1024)}MB"
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    在解析 multipart 表單前按 Content-Length 拒絕超大上傳
+
+    FastAPI 會先完整讀取並暫存表單再調用端點，端點內的大小檢查只能在接收完畢後進行；
+    此路由類在讀取請求主體前檢查標頭，聲明大小超過上限的上傳直接拒絕
+    """
+
+    # multipart 分隔線與欄位標頭的額外位元組
+    MULTIPART_OVERHEAD = 64 * 1024
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            content_length = request.headers.get("content-length", "")
+            if (
+                content_type.startswith("multipart/form-data")
+                and content_length.isdigit()
+                and int(content_length) > settings.UPLOAD_MAX_BYTES + self.MULTIPART_OVERHEAD
+            ):
+                raise BadRequestException(detail=_upload_too_large_message())
+            return await handler(request)
+
+        return limited_handler
+
+
+router = APIRouter(route_class=UploadLimitRoute)
 
 
 @router.post("/recognize", response_model=RecognizeResponse)
-async def recognize_invoice(request: RecognizeRequest):
+async def recognize_invoice(request: RecognizeRequest, quota_key: str = Depends(get_quota_key)):
     """
     識別發票圖片
 
@@ -20,8 +72,11 @@ async def recognize_invoice(request: RecognizeRequest):
 
     Returns:
         識別結果
+
+    Raises:
+        ServiceUnavailableException: AI 服務暫不可用（503，帶 Retry-After）
     """
-    success, data, message = await invoice_service.recognize_invoice(request.image)
+    success, data, message = await invoice_service.recognize_invoice(request.image, quota_key)
     return RecognizeResponse(
         success=success,
         data=data,
@@ -29,8 +84,192 @@ async def recognize_invoice(request: RecognizeRequest):
     )
 
 
+@router.post("/recognize/stream")
+async def recognize_invoice_stream(
+    request: RecognizeRequest, quota_key: str = Depends(get_quota_key)
+):
+    """
+    流式識別發票圖片（Server-Sent Events）
+
+    模型輸出時即時推送進度，無需等待完整結果：
+    - field: 表頭欄位完成，如 {"name": "invoiceNumber", "value": "12345678"}
+    - item: 發票項目完成，如 {"index": 0, "item": {...}}
+    - done / error: 最終結果，格式與 /recognize 的回應相同
+
+    Args:
+        request: 包含 base64 編碼圖片的請求
+
+    Returns:
+        text/event-stream 回應
+    """
+    async def event_stream():
+        async for event, data in invoice_service.recognize_invoice_stream(request.image, quota_key):
+            yield _format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 禁止 Nginx 緩衝事件
+        },
+    )
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化為 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/recognize/upload", response_model=RecognizeResponse)
+async def recognize_invoice_upload(
+    file: UploadFile = File(..., description="發票圖片檔案"),
+    quota_key: str = Depends(get_quota_key),
+):
+    """
+    識別上傳的發票圖片（multipart/form-data）
+
+    圖片以二進位上傳，省去 Base64 膨脹與 JSON 解析的記憶體開銷。
+
+    Args:
+        file: 發票圖片檔案
+
+    Returns:
+        識別結果
+
+    Raises:
+        BadRequestException: 檔案類型不支持、為空或超過大小上限
+        ServiceUnavailableException: AI 服務暫不可用（503，帶 Retry-After）
+    """
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise BadRequestException(detail=f"不支持的檔案類型: {file.content_type}")
+
+    # Starlette 已將上傳內容暫存（小檔在記憶體、大檔在磁碟），先按大小拒絕再一次讀出
+    if file.size is not None and file.size > settings.UPLOAD_MAX_BYTES:
+        raise BadRequestException(detail=_upload_too_large_message())
+    if file.size == 0:
+        raise BadRequestException(detail="上傳的圖片為空")
+
+    image_bytes = await file.read()
+    if len(image_bytes) > settings.UPLOAD_MAX_BYTES:
+        raise BadRequestException(detail=_upload_too_large_message())
+    if not image_bytes:
+        raise BadRequestException(detail="上傳的圖片為空")
+
+    success, data, message = await invoice_service.recognize_invoice_bytes(
+        image_bytes, file.content_type, quota_key
+    )
+    return RecognizeResponse(
+        success=success,
+        data=data,
+        message=message
+    )
+
+
+@router.post("/recognize/batch", response_model=BatchRecognizeResponse)
+async def recognize_invoices(
+    request: BatchRecognizeRequest, quota_key: str = Depends(get_quota_key)
+):
+    """
+    批量識別發票圖片
+
+    Args:
+        request: 包含多張 base64 編碼圖片的請求
+
+    Returns:
+        每張圖片的識別結果（允許部分失敗）
+    """
+    if len(request.images) > settings.BATCH_RECOGNIZE_MAX_IMAGES:
+        raise BadRequestException(
+            detail=f"單次最多識別 {settings.BATCH_RECOGNIZE_MAX_IMAGES} 張圖片"
+        )
+
+    results = await invoice_service.recognize_invoices(request.images, quota_key)
+    succeeded = sum(1 for result in results if result.success)
+    failed = len(results) - succeeded
+    return BatchRecognizeResponse(
+        success=failed == 0,
+        data=results,
+        total=len(results),
+        succeeded=succeeded,
+        failed=failed,
+        message=f"識別完成：成功 {succeeded} 張，失敗 {failed} 張",
+    )
+
+
+@router.post(
+    "/jobs",
+    response_model=RecognizeJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_recognize_job(
+    request: RecognizeRequest, quota_key: str = Depends(get_quota_key)
+):
+    """
+    提交異步識別任務
+
+    立即返回任務 ID，客戶端透過 GET /jobs/{job_id} 輪詢結果。
+
+    Args:
+        request: 包含 base64 編碼圖片的請求
+
+    Returns:
+        任務 ID 與狀態
+    """
+    job = job_service.submit(request.image, quota_key)
+    return RecognizeJobResponse(
+        success=True,
+        job_id=job.id,
+        status=job.status,
+        message="任務已提交",
+    )
+
+
+@router.get("/jobs/stats")
+async def get_job_stats():
+    """
+    獲取識別任務隊列統計
+
+    Returns:
+        隊列深度、worker 數與各狀態任務數
+    """
+    return job_service.get_stats()
+
+
+@router.get("/jobs/{job_id}", response_model=RecognizeJobResponse)
+async def get_recognize_job(
+    job_id: str,
+    wait: float = Query(
+        0,
+        ge=0,
+        le=settings.JOB_MAX_WAIT_SECONDS,
+        description="長輪詢等待秒數，0 表示立即返回",
+    ),
+    quota_key: str = Depends(get_quota_key),
+):
+    """
+    查詢識別任務狀態與結果（只能查詢以同一身分提交的任務）
+
+    - **job_id**: 任務 ID
+    - **wait**: 任務未完成時最多等待的秒數（長輪詢）
+    """
+    job = await job_service.wait(job_id, wait, quota_key)
+    if not job:
+        raise NotFoundException(detail=f"任務 {job_id} 不存在或已過期")
+
+    return RecognizeJobResponse(
+        success=job.status != JOB_FAILED,
+        job_id=job.id,
+        status=job.status,
+        data=job.data,
+        message=job.message,
+    )
+
+
 @router.post("/save", response_model=SaveResponse)
-async def save_invoices(request: SaveInvoicesRequest):
+async def save_invoices(
+    request: SaveInvoicesRequest, db: AsyncSession = Depends(get_async_database)
+):
     """
     保存發票資料
 
@@ -40,13 +279,135 @@ async def save_invoices(request: SaveInvoicesRequest):
     Returns:
         保存結果
     """
-    success, message = await invoice_service.save_invoices(request)
+    success, result, message = await invoice_service.save_invoices(request, db)
     return SaveResponse(
         success=success,
+        saved=result.saved,
+        duplicates=result.duplicates,
+        conflicts=result.conflicts,
         message=message
     )
 
 
+def _check_query(filters: InvoiceFilter, db: Optional[AsyncSession]) -> None:
+    """
+    檢查查詢條件與資料庫連線
+
+    Raises:
+        BadRequestException: 日期或金額範圍無效
+        ServiceUnavailableException: 資料庫未連線
+    """
+    if filters.date_from and filters.date_to and filters.date_from > filters.date_to:
+        raise BadRequestException(detail="開票日期起不可晚於開票日期迄")
+    if (
+        filters.min_amount is not None
+        and filters.max_amount is not None
+        and filters.min_amount > filters.max_amount
+    ):
+        raise BadRequestException(detail="價稅合計下限不可大於上限")
+    if db is None:
+        raise ServiceUnavailableException(detail="資料庫未連線")
+
+
+@router.get("/list", response_model=InvoiceListResponse)
+async def list_invoices(
+    filters: InvoiceFilter = Depends(),
+    cursor: Optional[str] = Query(None, description="上一頁返回的 next_cursor，不傳表示第一頁"),
+    page_size: int = Query(
+        settings.DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=settings.MAX_PAGE_SIZE,
+        description="每頁數量",
+    ),
+    with_total: bool = Query(False, description="是否返回總數（緩存或估算值）"),
+    db: AsyncSession = Depends(get_async_database),
+):
+    """
+    查詢已保存的發票（按開票日期降序，游標分頁）
+
+    - **date_from** / **date_to**: 開票日期範圍
+    - **seller_tax_id** / **buyer_tax_id**: 銷售方 / 購買方稅號
+    - **min_amount** / **max_amount**: 價稅合計範圍
+    - **cursor**: 以上一頁的 next_cursor 取得下一頁，任何深度的頁面耗時相同
+    """
+    _check_query(filters, db)
+    try:
+        invoices, next_cursor = await invoice_service.search_invoices(filters, cursor, page_size, db)
+    except InvalidCursorError as e:
+        raise BadRequestException(detail=str(e))
+
+    total, total_estimated = None, False
+    if with_total:
+        total, total_estimated = await invoice_service.count_invoices(filters, db)
+    return cursor_paginated_response(invoices, next_cursor, page_size, total, total_estimated)
+
+
+@router.get("/stats/sellers", response_model=SellerSummaryResponse)
+async def get_seller_stats(
+    filters: InvoiceFilter = Depends(),
+    limit: int = Query(100, ge=1, le=1000, description="返回的最大銷售方數"),
+    db: AsyncSession = Depends(get_async_database),
+):
+    """
+    按銷售方合計已保存發票的數量與金額（按價稅合計降序）
+
+    查詢條件同 /list
+    """
+    _check_query(filters, db)
+    data = await invoice_service.summarize_by_seller(filters, limit, db)
+    return SellerSummaryResponse(data=data)
+
+
+@router.get("/stats/monthly", response_model=MonthlySummaryResponse)
+async def get_monthly_stats(
+    filters: InvoiceFilter = Depends(),
+    db: AsyncSession = Depends(get_async_database),
+):
+    """
+    按開票月份合計已保存發票的數量與金額（按月份升序）
+
+    查詢條件同 /list
+    """
+    _check_query(filters, db)
+    data = await invoice_service.summarize_by_month(filters, db)
+    return MonthlySummaryResponse(data=data)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    獲取識別結果緩存統計
+
+    Returns:
+        緩存命中與未命中次數
+    """
+    return ai_service.get_cache_stats()
+
+
+@router.get("/usage")
+async def get_ai_usage(quota_key: str = Depends(get_quota_key)):
+    """
+    獲取目前使用者的 AI 用量與配額
+
+    攜帶 JWT 時返回該使用者的用量，否則返回客戶端 IP 的用量
+
+    Returns:
+        最近 24 小時與 30 天的 token、圖片流量與請求數，以及配額上限
+    """
+    return await quota_service.get_usage(quota_key)
+
+
+@router.get("/ai/status")
+async def get_ai_status():
+    """
+    獲取 AI 後端狀態
+
+    Returns:
+        熔斷器狀態與自適應並發限制
+    """
+    return ai_service.get_status()
+
+
 @router.get("/health")
 async def health_check():
     """
@@ -0,0 +1,51 @@
+"""指標端點 - 以 Prometheus 文字格式輸出應用指標"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.core.cache import cache_service
+from app.core.metrics import registry
+from app.services.ai_service import ai_service
+
+router = APIRouter()
+
+
+class CacheStatsCollector:
+    """
+    輸出指標時讀取各緩存的命中、未命中次數與條目數
+
+    命中與未命中以計數器輸出，命中率由查詢計算（如 rate(cache_hits_total[5m])），
+    不受進程重啟前的累計值影響
+    """
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "緩存命中次數", labels=("cache", "tier"))
+        misses = CounterMetricFamily("cache_misses", "緩存未命中次數（所有層均未命中）", labels=("cache",))
+        entries = GaugeMetricFamily("cache_entries", "內存緩存條目數", labels=("cache",))
+        for name, cache in (("default", cache_service), ("recognition", ai_service.recognition_cache)):
+            stats = cache.get_stats()
+            if stats["backend"] == "redis":
+                hits.add_metric((name, "l1"), stats["l1"]["hits"])
+                hits.add_metric((name, "l2"), stats["l2"]["hits"])
+                misses.add_metric((name,), stats["l2"]["misses"])
+                entries.add_metric((name,), stats["l1"]["memory"]["entries"])
+            else:
+                hits.add_metric((name, "memory"), stats["hits"])
+                misses.add_metric((name,), stats["misses"])
+                entries.add_metric((name,), stats["entries"])
+        yield hits
+        yield misses
+        yield entries
+
+
+registry.register(CacheStatsCollector())
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus 指標
+
+    指標按進程統計，多 worker 部署時每個 worker 各自輸出
+    """
+    return Response(generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
@@ -1,8 +1,8 @@
 from typing import Any
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from app.api.deps import get_database
-from app.crud.crud_user import crud_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_database
+from app.crud.crud_user import async_crud_user
 from app.schemas.user import User, UserCreate, UserUpdate, UserResponse, UsersListResponse
 from app.core.response import success, paginated_response
 from app.core.exceptions import NotFoundException, ConflictException
@@ -12,7 +12,7 @@ router = APIRouter()
 
 
 @router.get("/", summary="獲取使用者清單", response_model=UsersListResponse)
-def get_users(
+async def get_users(
     page: int = Query(1, ge=1, description="頁碼"),
     page_size: int = Query(
         settings.DEFAULT_PAGE_SIZE,
@@ -20,7 +20,7 @@ def get_users(
         le=settings.MAX_PAGE_SIZE,
         description="每頁數量",
     ),
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
 ) -> Any:
     """
     獲取使用者清單（分頁）
@@ -77,7 +77,7 @@ def get_users(
 
 
 @router.get("/{user_id}", summary="獲取使用者詳情", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_database)) -> Any:
+async def get_user(user_id: int, db: AsyncSession = Depends(get_async_database)) -> Any:
     """
     根據 ID 獲取使用者詳情
 
@@ -128,7 +128,7 @@ def get_user(user_id: int, db: Session = Depends(get_database)) -> Any:
 
 
 @router.post("/", summary="建立使用者")
-def create_user(user_in: UserCreate, db: Session = Depends(get_database)) -> Any:
+async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_database)) -> Any:
     """
     建立新使用者
 
@@ -137,20 +137,20 @@ def create_user(user_in: UserCreate, db: Session = Depends(get_database)) -> Any
     - **password**: 密碼（6-50 字元）
     """
     # 檢查使用者名稱是否已存在
-    if crud_user.get_by_username(db, username=user_in.username):
+    if await async_crud_user.get_by_username(db, username=user_in.username):
         raise ConflictException(detail=f"使用者名稱 {user_in.username} 已存在")
 
     # 檢查電子郵件是否已存在
-    if crud_user.get_by_email(db, email=user_in.email):
+    if await async_crud_user.get_by_email(db, email=user_in.email):
         raise ConflictException(detail=f"電子郵件 {user_in.email} 已存在")
 
-    user = crud_user.create(db, obj_in=user_in)
+    user = await async_crud_user.create(db, obj_in=user_in)
     return success(data=User.model_validate(user), message="使用者建立成功")
 
 
 @router.put("/{user_id}", summary="更新使用者")
-def update_user(
-    user_id: int, user_in: UserUpdate, db: Session = Depends(get_database)
+async def update_user(
+    user_id: int, user_in: UserUpdate, db: AsyncSession = Depends(get_async_database)
 ) -> Any:
     """
     更新使用者資訊
@@ -161,36 +161,36 @@ def update_user(
     - **password**: 密碼（選填）
     - **is_active**: 是否啟用（選填）
     """
-    user = crud_user.get(db, id=user_id)
+    user = await async_crud_user.get(db, id=user_id)
     if not user:
         raise NotFoundException(detail=f"使用者 ID {user_id} 不存在")
 
     # 檢查使用者名稱是否被其他使用者使用
     if user_in.username and user_in.username != user.username:
-        existing_user = crud_user.get_by_username(db, username=user_in.username)
+        existing_user = await async_crud_user.get_by_username(db, username=user_in.username)
         if existing_user and existing_user.id != user_id:
             raise ConflictException(detail=f"使用者名稱 {user_in.username} 已被使用")
 
     # 檢查電子郵件是否被其他使用者使用
     if user_in.email and user_in.email != user.email:
-        existing_user = crud_user.get_by_email(db, email=user_in.email)
+        existing_user = await async_crud_user.get_by_email(db, email=user_in.email)
         if existing_user and existing_user.id != user_id:
             raise ConflictException(detail=f"電子郵件 {user_in.email} 已被使用")
 
-    user = crud_user.update(db, db_obj=user, obj_in=user_in)
+    user = await async_crud_user.update(db, db_obj=user, obj_in=user_in)
     return success(data=User.model_validate(user), message="使用者更新成功")
 
 
 @router.delete("/{user_id}", summary="刪除使用者")
-def delete_user(user_id: int, db: Session = Depends(get_database)) -> Any:
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_database)) -> Any:
     """
     刪除使用者
 
     - **user_id**: 使用者 ID
     """
-    user = crud_user.get(db, id=user_id)
+    user = await async_crud_user.get(db, id=user_id)
     if not user:
         raise NotFoundException(detail=f"使用者 ID {user_id} 不存在")
 
-    crud_user.delete(db, id=user_id)
+    await async_crud_user.delete(db, id=user_id)
     return success(message="使用者刪除成功")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.api.endpoints import users, invoices
+from app.api.endpoints import users, invoices, debug
+from app.config import settings
 
 # 建立 API 路由
 api_router = APIRouter()
@@ -8,6 +9,10 @@ api_router = APIRouter()
 api_router.include_router(users.router, prefix="/users", tags=["使用者管理"])
 api_router.include_router(invoices.router, prefix="/invoice", tags=["發票管理"])
 
+# 調試端點（導出 span，預設關閉）
+if settings.TRACE_ENDPOINT_ENABLED:
+    api_router.include_router(debug.router, prefix="/debug", tags=["調試"])
+
 # 可以在這裡新增更多的路由
 # api_router.include_router(auth.router, prefix="/auth", tags=["認證"])
 # api_router.include_router(items.router, prefix="/items", tags=["物品管理"])
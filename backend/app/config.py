@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 import json
@@ -15,12 +15,15 @@ class Settings(BaseSettings):
     API_PREFIX: str = "/api"
 
     # 資料庫設定
+    DB_TYPE: str = "mssql"  # "mssql" 或 "sqlite"（本地開發/測試）
+    SQLITE_PATH: str = "./app.db"  # DB_TYPE=sqlite 時的資料庫檔案路徑
     DB_DRIVER: str = "ODBC Driver 17 for SQL Server"
     DB_SERVER: str = "localhost"
     DB_PORT: int = 1433
     DB_NAME: str = "testdb"
     DB_USER: str = "sa"
     DB_PASSWORD: str = "password"
+    DB_BULK_BATCH_SIZE: int = 1000  # 批量建立/更新/刪除（create_many 等）每批的筆數
 
     # JWT 設定
     SECRET_KEY: str = "your-secret-key-change-this"
@@ -40,16 +43,45 @@ class Settings(BaseSettings):
     # 分頁設定
     DEFAULT_PAGE_SIZE: int = 10
     MAX_PAGE_SIZE: int = 100
+    PAGINATION_COUNT_CACHE_SECONDS: int = 60  # 清單總數（COUNT）的緩存時間（秒）
 
     # 緩存設定
     CACHE_ENABLED: bool = True
     CACHE_EXPIRE_SECONDS: int = 3600  # 緩存過期時間（秒）
     REDIS_ENABLED: bool = False
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_MAX_CONNECTIONS: int = 50  # Redis 連接池大小
+    REDIS_SOCKET_TIMEOUT: float = 1.0  # Redis 連接與讀寫超時（秒）
+    REDIS_RETRY_SECONDS: float = 30.0  # Redis 出錯後降級為內存緩存的時間（秒）
+    CACHE_MAX_ENTRIES: int = 10000  # 內存緩存最大條目數（LRU 淘汰）
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 內存緩存最大估算位元組數
+    CACHE_L1_ENABLED: bool = True  # 啟用 Redis 時在進程內保留 L1 副本
+    CACHE_L1_TTL_SECONDS: int = 60  # L1 副本最長存活時間（秒），錯過失效通知時的兜底
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"  # L1 失效通知的 pub/sub 頻道
+
+    # 監控設定
+    METRICS_ENABLED: bool = True  # 在 /metrics 輸出 Prometheus 指標
+    TRACE_ENABLED: bool = True  # 記錄 span（請求與識別各階段耗時）
+    TRACE_SAMPLE_RATE: float = 0.1  # 根 span 採樣率（0~1），未採樣的請求不計時
+    TRACE_BUFFER_SIZE: int = 2048  # 內存中保留的最近 span 數
+    TRACE_ENDPOINT_ENABLED: bool = False  # 開放 /api/debug/spans 調試端點
 
     # 限流設定
     RATE_LIMIT_ENABLED: bool = True
-    RATE_LIMIT_REQUESTS_PER_MINUTE: int = 60
+    RATE_LIMIT_REQUESTS_PER_MINUTE: int = 60  # 每個 IP 每分鐘的請求單位數
+    # 路由消耗量（鍵為路徑前綴或「方法 路徑前綴」，最長前綴優先；未匹配消耗 1，0 表示不限流，
+    # 超過 RATE_LIMIT_REQUESTS_PER_MINUTE 的消耗量按該上限計算）
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, float] = {
+        "/api/invoice/health": 0,
+        "/metrics": 0,
+        "/api/invoice/recognize": 5,
+        "/api/invoice/recognize/batch": 20,
+        "POST /api/invoice/jobs": 5,
+    }
+    # 限流狀態儲存："auto"（啟用 Redis 時使用 Redis，否則內存）、"memory"、"file"（單機多 worker）或 "redis"
+    RATE_LIMIT_STORAGE: str = "auto"
+    RATE_LIMIT_FILE_PATH: str = "./rate_limit.dat"  # RATE_LIMIT_STORAGE=file 時的共享狀態檔案
+    RATE_LIMIT_FILE_SLOTS: int = 65536  # 共享狀態檔案的雜湊表槽位數（每槽 16 位元組）
 
     # AI 服務設定
     AI_SERVICE_TYPE: str = "openai"  # "openai" 或 "ollama"
@@ -63,15 +95,89 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://localhost:11434/v1"  # Ollama API 基礎 URL
     OLLAMA_MODEL: str = "llava"  # Ollama 模型名稱（支援視覺的模型，如 llava）
 
+    # 多後端路由設定
+    AI_BACKENDS: List[str] = []  # 後端池，例如 ["openai", "ollama"]；為空時只使用 AI_SERVICE_TYPE
+    AI_BACKEND_WEIGHTS: Dict[str, float] = {}  # 路由權重，例如 {"openai": 2, "ollama": 1}
+    AI_HEDGE_ENABLED: bool = False  # 主要後端過慢時是否向備用後端發出對沖請求
+    AI_HEDGE_DELAY_SECONDS: float = 5.0  # 主要後端多久未返回時發出對沖請求（秒）
+
+    # 識別結果緩存設定
+    AI_PROMPT_VERSION: str = "v1"  # 提示詞版本，修改提示詞時需同步遞增以使舊緩存失效
+    RECOGNITION_CACHE_ENABLED: bool = True
+    RECOGNITION_CACHE_EXPIRE_SECONDS: int = 86400  # 識別結果緩存時間（秒）
+    RECOGNITION_CACHE_MAX_ENTRIES: int = 1000  # 內存緩存最大條目數
+
+    # 圖片預處理設定
+    IMAGE_OPTIMIZE_ENABLED: bool = True
+    IMAGE_MAX_EDGE: int = 2048  # 最長邊像素，超過時等比縮小
+    IMAGE_OUTPUT_FORMAT: str = "jpeg"  # 重新編碼格式："jpeg" 或 "webp"
+    IMAGE_OUTPUT_QUALITY: int = 85  # 重新編碼品質（1-100）
+
+    # 近似重複檢測設定（同一使用者近期上傳的相似圖片）
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_MAX_DISTANCE: int = 8  # 64 位元 dHash 的 Hamming 距離上限，不超過即視為疑似重複
+    # "flag"：照常識別並在結果中標記 duplicateOf；"reuse"：直接返回先前的識別結果，不調用模型
+    DUPLICATE_ACTION: str = "flag"
+    DUPLICATE_WINDOW_SECONDS: int = 86400  # 只比對此時間內的圖片（秒）
+    DUPLICATE_MAX_PER_USER: int = 200  # 每個使用者保留的近期圖片數
+    DUPLICATE_MAX_USERS: int = 10000  # 保留索引的使用者數（LRU 淘汰）
+
+    # 圖片上傳設定
+    UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024  # 單張上傳圖片大小上限（位元組）
+
+    # 批量識別設定
+    AI_MAX_CONCURRENCY: int = 5  # 初始的 AI 並發調用上限（所有請求共用，之後自適應調整）
+    BATCH_RECOGNIZE_MAX_IMAGES: int = 50  # 單次批量識別的最大圖片數
+
+    # AI 熔斷與自適應並發設定
+    AI_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 連續失敗多少次後熔斷
+    AI_CIRCUIT_RECOVERY_SECONDS: float = 30.0  # 熔斷後多久進行半開探測（秒）
+    AI_CONCURRENCY_MIN: int = 1  # 自適應並發上限的下界
+    AI_CONCURRENCY_MAX: int = 20  # 自適應並發上限的上界
+    AI_LATENCY_THRESHOLD_SECONDS: float = 20.0  # 單次調用超過此延遲視為過載
+    AI_ACQUIRE_TIMEOUT_SECONDS: float = 10.0  # 單張識別等待並發名額的最長時間（秒），批量與後台任務不限
+
+    # 識別任務隊列設定
+    JOB_QUEUE_MAX_SIZE: int = 100  # 等待中任務數上限，超過時拒絕提交
+    JOB_WORKER_COUNT: int = 4  # 處理任務的背景 worker 數
+    JOB_TTL_SECONDS: int = 600  # 任務完成後結果保留時間（秒）
+    JOB_MAX_WAIT_SECONDS: int = 30  # 長輪詢最長等待時間（秒）
+
+    # AI 用量配額設定（按使用者統計，滾動日窗口 24 小時、月窗口 30 天；上限 0 表示不限制）
+    AI_QUOTA_ENABLED: bool = True
+    AI_QUOTA_DAILY_TOKENS: int = 0  # 每日 token 上限（prompt + completion）
+    AI_QUOTA_MONTHLY_TOKENS: int = 0  # 每月 token 上限
+    AI_QUOTA_DAILY_IMAGE_BYTES: int = 0  # 每日發送給模型的圖片位元組上限
+    AI_QUOTA_MONTHLY_IMAGE_BYTES: int = 0  # 每月發送給模型的圖片位元組上限
+    AI_QUOTA_TOKEN_ESTIMATE: int = 1500  # 調用前預留的單次 token 數，調用後按實際用量結算
+
+    @property
+    def is_sqlite(self) -> bool:
+        """是否使用 SQLite 資料庫"""
+        return self.DB_TYPE.lower() == "sqlite"
+
     @property
     def database_url(self) -> str:
         """建構資料庫連線字串"""
+        if self.is_sqlite:
+            return f"sqlite:///{self.SQLITE_PATH}"
         return (
             f"mssql+pyodbc://{self.DB_USER}:{self.DB_PASSWORD}"
             f"@{self.DB_SERVER}:{self.DB_PORT}/{self.DB_NAME}"
             f"?driver={self.DB_DRIVER.replace(' ', '+')}"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        """建構異步資料庫連線字串（aioodbc / aiosqlite）"""
+        if self.is_sqlite:
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
+        return (
+            f"mssql+aioodbc://{self.DB_USER}:{self.DB_PASSWORD}"
+            f"@{self.DB_SERVER}:{self.DB_PORT}/{self.DB_NAME}"
+            f"?driver={self.DB_DRIVER.replace(' ', '+')}"
+        )
+
     class Config:
         env_file = ".env"
         case_sensitive = True
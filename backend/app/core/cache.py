@@ -1,94 +1,498 @@
 """緩存模組 - 支持內存緩存和 Redis（可選）"""
-from typing import Optional, Any
+from typing import Optional, Any, Awaitable, Callable, Dict, List, Tuple
+from collections import OrderedDict
 from functools import wraps
+import asyncio
 import hashlib
 import json
+import logging
+import math
+import random
+import sys
+import time
+import uuid
+from pydantic import BaseModel
 from app.config import settings
+from app.core.serializer import dumps, loads
 
-# 簡單的內存緩存實現
-_memory_cache: dict[str, tuple[Any, float]] = {}
+logger = logging.getLogger(__name__)
+
+# 關閉時取消失效通知訂閱任務的最多嘗試次數（每次等待 0.1 秒）
+LISTENER_CANCEL_ATTEMPTS = 20
+
+
+def estimate_size(value: Any) -> int:
+    """
+    估算物件佔用的記憶體位元組數（遞迴計算容器內容，用於緩存容量控制）
+
+    Args:
+        value: 任意物件
+
+    Returns:
+        估算的位元組數
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, BaseModel):
+        return sys.getsizeof(value) + estimate_size(value.__dict__)
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """
+    有界內存緩存（LRU 淘汰）
+
+    - 同時限制條目數與估算的位元組數，超出時淘汰最久未使用的條目
+    - 過期條目除了在讀取時刪除，還會每隔 sweep_interval 秒在讀寫時全量清理一次，
+      只寫不讀的鍵也不會永久駐留
+    - 統計命中、未命中、淘汰與過期次數
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+    ):
+        """
+        初始化內存緩存
+
+        Args:
+            max_entries: 最大條目數
+            max_bytes: 最大估算位元組數，超過此大小的單個值不緩存
+            sweep_interval: 清理過期條目的間隔（秒）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # 鍵 -> (值, 過期時間, 估算位元組數)
+        self._data: OrderedDict[str, Tuple[Any, float, int]] = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._last_sweep = time.monotonic()
+
+    def get(self, key: str) -> Optional[Any]:
+        """獲取緩存值，不存在或已過期返回 None"""
+        now = time.monotonic()
+        self._sweep(now)
+
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expire_at, _ = entry
+        if expire_at <= now:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, expire_seconds: float) -> bool:
+        """
+        設置緩存值
+
+        Returns:
+            是否已緩存（值超過容量上限時不緩存）
+        """
+        now = time.monotonic()
+        self._sweep(now)
+        self._remove(key)
+
+        size = estimate_size(key) + estimate_size(value)
+        if size > self.max_bytes:
+            return False
+
+        self._data[key] = (value, now + expire_seconds, size)
+        self.current_bytes += size
+        while len(self._data) > self.max_entries or self.current_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+        return True
+
+    def delete(self, key: str) -> bool:
+        """刪除緩存值"""
+        return self._remove(key)
+
+    def clear(self) -> None:
+        """清空所有緩存"""
+        self._data.clear()
+        self.current_bytes = 0
+
+    def _remove(self, key: str) -> bool:
+        """移除條目並更新位元組計數"""
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self.current_bytes -= entry[2]
+        return True
+
+    def _sweep(self, now: float) -> None:
+        """清理所有過期條目（按間隔攤銷執行）"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        expired = [key for key, (_, expire_at, _) in self._data.items() if expire_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取緩存統計"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# 模組級共享的內存緩存（未指定容量的 CacheService 實例共用）
+_memory_cache = MemoryCache(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+)
 
 
 class CacheService:
-    """緩存服務類"""
+    """
+    緩存服務類（異步）
+
+    未啟用 Redis 時只使用有界內存緩存。啟用 Redis 時為兩層緩存：
+    - L1：進程內有界內存緩存，命中時無需網路往返
+    - L2：Redis（連接池的異步客戶端），多 worker 共享；批量讀寫以 pipeline 一次往返完成，
+      值以 orjson 序列化（保留 pydantic 模型類型）
+    寫入與刪除時在 pub/sub 頻道發布失效通知，其他 worker 收到後刪除 L1 中的副本；
+    未訂閱成功期間不使用 L1，避免錯過通知而讀到舊值。
+    Redis 不可用時降級為內存緩存，並在 REDIS_RETRY_SECONDS 秒後重試。
+    """
 
-    def __init__(self, use_redis: bool = False, redis_url: Optional[str] = None):
+    def __init__(
+        self,
+        use_redis: bool = False,
+        redis_url: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
         """
         初始化緩存服務
 
         Args:
             use_redis: 是否使用 Redis（需要安裝 redis 包）
             redis_url: Redis 連接 URL
+            max_entries: 內存緩存最大條目數，設置後使用獨立的有界緩存
+            max_bytes: 獨立內存緩存的最大估算位元組數，預設為 CACHE_MAX_BYTES
         """
         self.use_redis = use_redis
         self.redis_client = None
+        self.redis_errors = 0
+        self._redis_retry_at = 0.0
+        # 未指定容量時共用模組級緩存，否則使用實例獨立的有界緩存
+        self._memory_cache = (
+            _memory_cache
+            if max_entries is None and max_bytes is None
+            else MemoryCache(
+                max_entries=max_entries or settings.CACHE_MAX_ENTRIES,
+                max_bytes=max_bytes or settings.CACHE_MAX_BYTES,
+            )
+        )
+
+        # 兩層緩存的失效通知（節點 ID 用於忽略自己發布的通知）
+        self.node_id = uuid.uuid4().hex
+        self.channel = settings.CACHE_INVALIDATION_CHANNEL
+        self._listener: Optional[asyncio.Task] = None
+        self._listener_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribed = False
+        self.invalidations_received = 0
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
 
         if use_redis:
             try:
-                import redis
-                self.redis_client = redis.from_url(redis_url or "redis://localhost:6379")
+                import redis.asyncio as redis
+                pool = redis.ConnectionPool.from_url(
+                    redis_url or "redis://localhost:6379",
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+                self.redis_client = redis.Redis(connection_pool=pool)
             except ImportError:
                 print("警告: Redis 未安裝，使用內存緩存")
                 self.use_redis = False
 
-    def get(self, key: str) -> Optional[Any]:
-        """獲取緩存值"""
-        if self.use_redis and self.redis_client:
+    def _redis_available(self) -> bool:
+        """Redis 是否可用（出錯後在重試時間前直接使用內存緩存）"""
+        return self.redis_client is not None and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, error: Exception) -> None:
+        """記錄 Redis 錯誤並暫時降級為內存緩存"""
+        self.redis_errors += 1
+        self._redis_retry_at = time.monotonic() + settings.REDIS_RETRY_SECONDS
+        logger.warning(
+            f"Redis 緩存不可用，{settings.REDIS_RETRY_SECONDS:g} 秒內使用內存緩存: {str(error)}"
+        )
+
+    def _l1_enabled(self) -> bool:
+        """L1 是否可用（已訂閱失效通知），未啟動訂閱時順帶啟動"""
+        if not settings.CACHE_L1_ENABLED:
+            return False
+        self._ensure_listener()
+        return self._subscribed
+
+    def _ensure_listener(self) -> None:
+        """在目前事件循環中啟動失效通知訂閱任務（只啟動一次）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._listener is not None and not self._listener.done() and self._listener_loop is loop:
+            return
+        self._subscribed = False
+        self._listener_loop = loop
+        self._listener = loop.create_task(self._listen_invalidations())
+
+    async def _listen_invalidations(self) -> None:
+        """訂閱失效通知並刪除 L1 副本，連接中斷時重新訂閱"""
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
             try:
-                value = self.redis_client.get(key)
-                return json.loads(value) if value else None
-            except Exception:
-                return None
-        else:
+                await pubsub.subscribe(self.channel)
+                # 訂閱前可能錯過通知，清空 L1 後再啟用
+                self._memory_cache.clear()
+                self._subscribed = True
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"緩存失效通知訂閱中斷，暫停使用 L1 緩存: {str(e)}")
+            finally:
+                self._subscribed = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(settings.REDIS_RETRY_SECONDS)
+
+    def _apply_invalidation(self, data: bytes) -> None:
+        """處理其他 worker 發布的失效通知"""
+        message = loads(data)
+        if message.get("node") == self.node_id:
+            return
+        self.invalidations_received += 1
+        if message.get("clear"):
+            self._memory_cache.clear()
+            return
+        for key in message.get("keys", []):
+            self._memory_cache.delete(key)
+
+    def _invalidation_message(self, keys: List[str], clear: bool = False) -> bytes:
+        """失效通知內容"""
+        return dumps({"node": self.node_id, "keys": keys, "clear": clear})
+
+    async def _publish_invalidation(self, keys: List[str], clear: bool = False) -> None:
+        """發布失效通知，其他 worker 刪除對應的 L1 副本"""
+        if settings.CACHE_L1_ENABLED:
+            await self.redis_client.publish(self.channel, self._invalidation_message(keys, clear))
+
+    def _l1_ttl(self, ttl_ms: Optional[int]) -> float:
+        """L1 副本的存活時間：不超過 L2 剩餘時間與 CACHE_L1_TTL_SECONDS"""
+        if ttl_ms is None or ttl_ms < 0:
+            return settings.CACHE_L1_TTL_SECONDS
+        return min(ttl_ms / 1000, settings.CACHE_L1_TTL_SECONDS)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """獲取緩存值"""
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        批量獲取緩存值（L1 未命中的鍵以單次 pipeline 從 Redis 讀取並回填 L1）
+
+        Returns:
+            命中的鍵值字典（未命中的鍵不包含在內）
+        """
+        if not keys:
+            return {}
+        if not self._redis_available():
             # 使用內存緩存
-            if key in _memory_cache:
-                value, expire_time = _memory_cache[key]
-                import time
-                if expire_time > time.time():
-                    return value
-                else:
-                    del _memory_cache[key]
-            return None
+            results = {}
+            for key in keys:
+                value = self._memory_cache.get(key)
+                if value is not None:
+                    results[key] = value
+            return results
+
+        results = {}
+        use_l1 = self._l1_enabled()
+        if use_l1:
+            for key in keys:
+                value = self._memory_cache.get(key)
+                if value is not None:
+                    results[key] = value
+            self.l1_hits += len(results)
+        missing = [key for key in keys if key not in results]
+        if not missing:
+            return results
 
-    def set(self, key: str, value: Any, expire_seconds: int = 3600) -> bool:
-        """設置緩存值"""
         try:
-            if self.use_redis and self.redis_client:
-                self.redis_client.setex(
-                    key,
-                    expire_seconds,
-                    json.dumps(value, default=str)
-                )
-            else:
-                # 使用內存緩存
-                import time
-                _memory_cache[key] = (value, time.time() + expire_seconds)
-            return True
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in missing:
+                    pipe.get(key)
+                    if use_l1:
+                        pipe.pttl(key)
+                replies = await pipe.execute()
         except Exception as e:
-            print(f"緩存設置失敗: {str(e)}")
-            return False
+            self._redis_failed(e)
+            for key in missing:
+                value = self._memory_cache.get(key)
+                if value is not None:
+                    results[key] = value
+            return results
 
-    def delete(self, key: str) -> bool:
-        """刪除緩存值"""
-        try:
-            if self.use_redis and self.redis_client:
-                self.redis_client.delete(key)
+        step = 2 if use_l1 else 1
+        for index, key in enumerate(missing):
+            payload = replies[index * step]
+            if payload is None:
+                self.l2_misses += 1
+                continue
+            value = loads(payload)
+            results[key] = value
+            self.l2_hits += 1
+            if use_l1:
+                self._memory_cache.set(key, value, self._l1_ttl(replies[index * step + 1]))
+        return results
+
+    async def set(self, key: str, value: Any, expire_seconds: int = 3600) -> bool:
+        """設置緩存值"""
+        return await self.set_many({key: value}, expire_seconds)
+
+    async def set_many(self, mapping: Dict[str, Any], expire_seconds: int = 3600) -> bool:
+        """
+        批量設置緩存值（Redis 寫入與失效通知在同一個 pipeline 中一次往返）
+
+        Returns:
+            是否全部設置成功
+        """
+        if self._redis_available():
+            try:
+                payloads = {key: dumps(value) for key, value in mapping.items()}
+            except TypeError as e:
+                logger.error(f"緩存設置失敗: {str(e)}")
+                return False
+            use_l1 = self._l1_enabled()
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for key, payload in payloads.items():
+                        pipe.set(key, payload, ex=expire_seconds)
+                    if settings.CACHE_L1_ENABLED:
+                        pipe.publish(self.channel, self._invalidation_message(list(payloads)))
+                    await pipe.execute()
+            except Exception as e:
+                self._redis_failed(e)
             else:
-                _memory_cache.pop(key, None)
-            return True
-        except Exception:
-            return False
+                l1_ttl = min(expire_seconds, settings.CACHE_L1_TTL_SECONDS)
+                for key, value in mapping.items():
+                    if use_l1:
+                        self._memory_cache.set(key, value, l1_ttl)
+                    else:
+                        self._memory_cache.delete(key)
+                return True
+        # 使用內存緩存
+        results = [
+            self._memory_cache.set(key, value, expire_seconds)
+            for key, value in mapping.items()
+        ]
+        return all(results)
+
+    async def delete(self, key: str) -> bool:
+        """刪除緩存值"""
+        # L1 或降級期間寫入的值一併刪除
+        self._memory_cache.delete(key)
+        if self._redis_available():
+            try:
+                await self.redis_client.delete(key)
+                await self._publish_invalidation([key])
+            except Exception as e:
+                self._redis_failed(e)
+                return False
+        return True
 
-    def clear(self) -> bool:
+    async def clear(self) -> bool:
         """清空所有緩存"""
-        try:
-            if self.use_redis and self.redis_client:
-                self.redis_client.flushdb()
+        self._memory_cache.clear()
+        if self._redis_available():
+            try:
+                await self.redis_client.flushdb()
+                await self._publish_invalidation([], clear=True)
+            except Exception as e:
+                self._redis_failed(e)
+                return False
+        return True
+
+    async def close(self) -> None:
+        """停止失效通知訂閱並關閉 Redis 連接池（應用關閉時調用）"""
+        if self._listener is not None:
+            # 取消與 get_message 的讀取逾時同時發生時，取消可能被吞掉而任務繼續等待下一則訊息，
+            # 因此重複取消直到任務結束（有上限，不讓關閉流程無限等待）
+            for _ in range(LISTENER_CANCEL_ATTEMPTS):
+                self._listener.cancel()
+                await asyncio.wait({self._listener}, timeout=0.1)
+                if self._listener.done():
+                    break
             else:
-                _memory_cache.clear()
-            return True
-        except Exception:
-            return False
+                logger.warning("緩存失效通知訂閱任務未能停止")
+            self._listener = None
+        if self.redis_client is not None:
+            await self.redis_client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取緩存統計（兩層緩存時包含各層命中率）"""
+        if self.redis_client is not None:
+            lookups = self.l1_hits + self.l2_hits + self.l2_misses
+            l2_lookups = self.l2_hits + self.l2_misses
+            return {
+                "backend": "redis",
+                "redis_errors": self.redis_errors,
+                "degraded": not self._redis_available(),
+                "hit_rate": round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else 0.0,
+                "l1": {
+                    "enabled": settings.CACHE_L1_ENABLED,
+                    "subscribed": self._subscribed,
+                    "hits": self.l1_hits,
+                    "hit_rate": round(self.l1_hits / lookups, 4) if lookups else 0.0,
+                    "invalidations_received": self.invalidations_received,
+                    "memory": self._memory_cache.get_stats(),
+                },
+                "l2": {
+                    "hits": self.l2_hits,
+                    "misses": self.l2_misses,
+                    "hit_rate": round(self.l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+                },
+            }
+        return {"backend": "memory", **self._memory_cache.get_stats()}
 
     @staticmethod
     def generate_key(*args, **kwargs) -> str:
@@ -97,32 +501,123 @@ class CacheService:
         return hashlib.md5(key_data.encode()).hexdigest()
 
 
+class SingleFlight:
+    """
+    請求合併（single-flight）
+
+    相同鍵的並發調用只執行一次，其餘調用方等待同一結果。計算在獨立任務中執行，
+    發起者被取消（如客戶端斷線）不會中斷計算，也不影響其他等待者。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def start(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        啟動計算（已在進行中則返回現有任務），不等待結果
+
+        Args:
+            key: 合併鍵
+            factory: 返回協程的函數，只在沒有進行中的計算時調用
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """執行或加入相同鍵的計算並等待結果"""
+        return await asyncio.shield(self.start(key, factory))
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """加入進行中的計算（不等待結果），沒有時返回 None"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def claim(self, key: str) -> asyncio.Future:
+        """
+        登記由調用方自行完成的計算（如邊產生邊返回的流式識別），其他調用方經 do / join 等待結果
+
+        調用方必須以 set_result / set_exception 結束返回的 Future，否則等待者會一直等待
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        """計算結束：移除進行中記錄，並取回異常避免未處理警告"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"合併計算失敗 ({key}): {task.exception()}")
+
+
 # 創建全局緩存實例（默認使用內存緩存）
 cache_service = CacheService()
 
+# 緩存裝飾器共用的請求合併器
+_cached_flight = SingleFlight()
+
 
-def cached(expire_seconds: int = 3600):
+def cached(expire_seconds: int = 3600, stale_seconds: int = 0, early_refresh_beta: float = 1.0):
     """
     緩存裝飾器
 
+    - 相同鍵的並發未命中只執行一次被裝飾函數（single-flight）
+    - 過期後 stale_seconds 內仍返回舊值，同時在背景刷新（stale-while-revalidate）
+    - 臨近過期時按 XFetch 演算法以一定機率提前在背景刷新，
+      計算越慢的值越早刷新，避免熱點鍵同時過期引發驚群
+
     Args:
         expire_seconds: 緩存過期時間（秒）
+        stale_seconds: 過期後仍可返回舊值的時間（秒），0 表示不返回過期值
+        early_refresh_beta: 提前刷新係數，越大越早刷新，0 表示不提前刷新
     """
     def decorator(func):
+        async def compute(cache_key: str, args, kwargs):
+            """執行函數並緩存結果（記錄邏輯過期時間與計算耗時）"""
+            start = time.time()
+            result = await func(*args, **kwargs)
+            if result is not None:
+                now = time.time()
+                entry = {"value": result, "expires_at": now + expire_seconds, "delta": now - start}
+                await cache_service.set(cache_key, entry, expire_seconds + stale_seconds)
+            return result
+
+        def should_refresh(entry: Dict[str, Any]) -> bool:
+            """已過期（處於 stale 期間）或按 XFetch 機率提前刷新"""
+            now = time.time()
+            if now >= entry["expires_at"]:
+                return True
+            if early_refresh_beta <= 0:
+                return False
+            gap = -entry["delta"] * early_refresh_beta * math.log(1.0 - random.random())
+            return now + gap >= entry["expires_at"]
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成緩存鍵
             cache_key = f"{func.__module__}.{func.__name__}:{CacheService.generate_key(*args, **kwargs)}"
             
             # 嘗試從緩存獲取
-            cached_value = cache_service.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+            entry = await cache_service.get(cache_key)
+            if isinstance(entry, dict) and "expires_at" in entry:
+                if should_refresh(entry):
+                    # 背景刷新，本次直接返回現有值
+                    _cached_flight.start(cache_key, lambda: compute(cache_key, args, kwargs))
+                return entry["value"]
 
-            # 執行函數並緩存結果
-            result = await func(*args, **kwargs)
-            cache_service.set(cache_key, result, expire_seconds)
-            return result
+            # 未命中：相同鍵的並發調用只執行一次
+            return await _cached_flight.do(cache_key, lambda: compute(cache_key, args, kwargs))
 
         return wrapper
     return decorator
@@ -1,11 +1,14 @@
+import math
+from typing import Dict, Optional
+
 from fastapi import HTTPException, status
 
 
 class CustomException(HTTPException):
     """自訂異常基礎類別"""
 
-    def __init__(self, status_code: int, detail: str):
-        super().__init__(status_code=status_code, detail=detail)
+    def __init__(self, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(status_code=status_code, detail=detail, headers=headers)
 
 
 class NotFoundException(CustomException):
@@ -43,6 +46,24 @@ class ConflictException(CustomException):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
 
 
+class TooManyRequestsException(CustomException):
+    """請求過多異常"""
+
+    def __init__(self, detail: str = "請求過於頻繁"):
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail)
+
+
+class ServiceUnavailableException(CustomException):
+    """服務暫不可用異常"""
+
+    def __init__(self, detail: str = "服務暫不可用，請稍後重試", retry_after: Optional[float] = None):
+        # retry_after 以秒計，回應帶 Retry-After 標頭（至少 1 秒）
+        headers = {"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after is not None else None
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail, headers=headers
+        )
+
+
 class InternalServerException(CustomException):
     """伺服器內部錯誤異常"""
 
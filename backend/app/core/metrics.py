@@ -0,0 +1,67 @@
+"""指標模組 - 應用的 Prometheus 指標定義（prometheus_client）"""
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+# 請求延遲分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# AI 調用延遲分桶（秒）
+AI_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+# 圖片大小分桶（位元組，16KB ~ 16MB）
+SIZE_BUCKETS = tuple(16 * 1024 * 4 ** i for i in range(6))
+
+# 應用指標註冊表（不使用 prometheus_client 的全局預設註冊表，輸出內容只包含應用指標）；
+# 連接池、緩存等已在服務內部計數的狀態，以自訂 collector 在輸出時讀取，不在熱路徑上重複維護
+registry = CollectorRegistry()
+
+# HTTP 請求
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 請求處理耗時（秒）",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+
+# AI 調用
+AI_REQUEST_DURATION = Histogram(
+    "ai_request_duration_seconds",
+    "AI 模型調用耗時（秒）",
+    ("backend", "model", "outcome"),
+    buckets=AI_LATENCY_BUCKETS,
+    registry=registry,
+)
+AI_TOKENS = Counter(
+    "ai_tokens_total",
+    "AI 模型消耗的 token 數",
+    ("backend", "model", "type"),
+    registry=registry,
+)
+AI_PARSE_FAILURES = Counter(
+    "ai_parse_failures_total",
+    "AI 回應無法解析為發票 JSON 的次數",
+    ("reason",),
+    registry=registry,
+)
+
+# 圖片
+IMAGE_BYTES = Histogram(
+    "invoice_image_bytes",
+    "發票圖片大小（位元組），original 為上傳大小，sent 為預處理後發送給模型的大小",
+    ("stage",),
+    buckets=SIZE_BUCKETS,
+    registry=registry,
+)
+
+# 資料庫連接池（容量與溢出連接數由 app.database 的 collector 輸出）
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "從連接池取得連接的等待時間（秒）",
+    ("engine",),
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "目前已借出的資料庫連接數",
+    ("engine",),
+    registry=registry,
+)
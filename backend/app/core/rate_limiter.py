@@ -0,0 +1,438 @@
+"""限流模組 - GCRA（Generic Cell Rate Algorithm）限流器與可插拔的狀態儲存"""
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitResult:
+    """單次限流檢查結果"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # 被拒絕時需等待的秒數
+
+
+def gcra_update(
+    tat: Optional[float], now: float, emission_interval: float, period: float, cost: float
+) -> Tuple[bool, float, float]:
+    """
+    GCRA 單步計算
+
+    Args:
+        tat: 鍵目前的理論到達時間，不存在時為 None
+        now: 當前時間（秒）
+        emission_interval: 每單位配額的恢復時間（秒）
+        period: 週期長度（秒），亦即允許的最大累積量
+        cost: 本次消耗的單位數
+
+    Returns:
+        (是否放行, 更新後的理論到達時間, 需等待秒數) 元組；被拒絕時理論到達時間不變
+    """
+    tat = max(tat if tat is not None else now, now)
+    new_tat = tat + emission_interval * cost
+    allow_at = new_tat - period
+    if allow_at > now:
+        return False, tat, allow_at - now
+    return True, new_tat, 0.0
+
+
+class RateLimitStore(ABC):
+    """
+    限流狀態儲存後端
+
+    子類實現 update：以原子方式讀取、計算並寫回單個鍵的理論到達時間（TAT）。
+    """
+
+    @abstractmethod
+    async def update(
+        self, key: str, emission_interval: float, period: float, cost: float
+    ) -> Tuple[bool, float, float]:
+        """
+        原子地檢查並消耗配額
+
+        Returns:
+            (是否放行, 已累積量 TAT - now（秒）, 需等待秒數) 元組
+        """
+
+    async def close(self) -> None:
+        """釋放連接等資源（應用關閉時調用）"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取儲存後端狀態"""
+        return {"backend": self.__class__.__name__}
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    進程內存儲存（單進程部署）
+
+    每個鍵只保存一個 TAT；TAT 不晚於當前時間的鍵已完全恢復，
+    刪除後行為不變，因此定期清除閒置的鍵。
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        """
+        Args:
+            sweep_interval: 清除閒置鍵的間隔（秒）
+        """
+        self.sweep_interval = sweep_interval
+        self._tats: Dict[str, float] = {}
+        self._last_sweep = time.monotonic()
+
+    async def update(
+        self, key: str, emission_interval: float, period: float, cost: float
+    ) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        self._sweep(now)
+        allowed, tat, retry_after = gcra_update(
+            self._tats.get(key), now, emission_interval, period, cost
+        )
+        if allowed:
+            self._tats[key] = tat
+        return allowed, tat - now, retry_after
+
+    def _sweep(self, now: float) -> None:
+        """清除已完全恢復的閒置鍵（按間隔攤銷執行）"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "tracked_keys": len(self._tats)}
+
+
+class FileRateLimitStore(RateLimitStore):
+    """
+    共享記憶體儲存（單機多 worker 部署）
+
+    狀態保存在記憶體映射檔案中的固定大小雜湊表，每個槽位存放
+    (鍵雜湊, TAT)，以檔案鎖保證同一主機上各 worker 進程的讀寫原子性。
+    記憶體佔用固定為 slots × 16 位元組；已恢復的槽位可直接被其他鍵重用，
+    探測範圍內無可用槽位時淘汰最早恢復的鍵。
+    取鎖不阻塞事件循環：鎖被佔用時以 asyncio.sleep 讓出後重試。
+    """
+
+    SLOT = struct.Struct("<Qd")
+    MAX_PROBES = 16
+    LOCK_RETRY_SECONDS = 0.001  # 鎖被佔用時的重試間隔（秒）
+
+    def __init__(self, path: str, slots: int = 65536):
+        """
+        Args:
+            path: 共享狀態檔案路徑（同一主機的所有 worker 須使用同一路徑）
+            slots: 雜湊表槽位數
+        """
+        self.path = path
+        self.slots = slots
+        self._size = slots * self.SLOT.size
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+        self._thread_lock = threading.Lock()
+        self.lock_retries = 0
+
+    def _open(self) -> mmap.mmap:
+        """延遲開啟映射檔案（每個進程各自開啟，fork 後重新開啟）"""
+        if self._map is None or self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._file_lock(fd):
+                if os.fstat(fd).st_size < self._size:
+                    os.ftruncate(fd, self._size)
+            self._fd, self._map, self._pid = fd, mmap.mmap(fd, self._size), os.getpid()
+        return self._map
+
+    @classmethod
+    @contextmanager
+    def _file_lock(cls, fd: int) -> Iterator[None]:
+        """跨進程互斥鎖（阻塞等待，只用於開啟檔案時）"""
+        cls._lock_file(fd, blocking=True)
+        try:
+            yield
+        finally:
+            cls._unlock_file(fd)
+
+    @staticmethod
+    def _lock_file(fd: int, blocking: bool) -> bool:
+        """
+        取得跨進程檔案鎖（POSIX 使用 flock，Windows 使用 msvcrt.locking）
+
+        Returns:
+            是否取得鎖；非阻塞模式下鎖被其他進程持有時返回 False
+        """
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            except OSError:
+                if blocking:
+                    raise
+                return False
+            return True
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    @staticmethod
+    def _unlock_file(fd: int) -> None:
+        """釋放跨進程檔案鎖"""
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            return
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    async def update(
+        self, key: str, emission_interval: float, period: float, cost: float
+    ) -> Tuple[bool, float, float]:
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        key_hash = key_hash or 1  # 0 表示空槽位
+
+        # 以非阻塞方式取鎖，鎖被佔用時讓出事件循環後重試，避免阻塞其他請求
+        while True:
+            result = self._try_update(key_hash, emission_interval, period, cost)
+            if result is not None:
+                return result
+            self.lock_retries += 1
+            await asyncio.sleep(self.LOCK_RETRY_SECONDS)
+
+    def _try_update(
+        self, key_hash: int, emission_interval: float, period: float, cost: float
+    ) -> Optional[Tuple[bool, float, float]]:
+        """
+        嘗試在持有鎖的情況下完成一次 GCRA 更新（臨界區只有數微秒）
+
+        Returns:
+            與 update 相同的結果；鎖被其他執行緒或進程持有時返回 None
+        """
+        if not self._thread_lock.acquire(blocking=False):
+            return None
+        try:
+            table = self._open()
+            if not self._lock_file(self._fd, blocking=False):
+                return None
+            try:
+                # 跨進程共享狀態，使用系統時鐘
+                now = time.time()
+                offset, tat = self._find_slot(table, key_hash, now)
+                allowed, tat, retry_after = gcra_update(tat, now, emission_interval, period, cost)
+                if allowed:
+                    self.SLOT.pack_into(table, offset, key_hash, tat)
+            finally:
+                self._unlock_file(self._fd)
+        finally:
+            self._thread_lock.release()
+
+        return allowed, tat - now, retry_after
+
+    def _find_slot(self, table: mmap.mmap, key_hash: int, now: float) -> Tuple[int, Optional[float]]:
+        """
+        線性探測查找鍵所在槽位
+
+        Returns:
+            (槽位偏移, 鍵的 TAT) 元組；鍵不存在時返回可寫入的槽位與 None
+        """
+        start = key_hash % self.slots
+        free_offset = None
+        oldest_offset, oldest_tat = None, None
+
+        for probe in range(self.MAX_PROBES):
+            offset = ((start + probe) % self.slots) * self.SLOT.size
+            slot_hash, slot_tat = self.SLOT.unpack_from(table, offset)
+            if slot_hash == key_hash:
+                return offset, slot_tat
+            if free_offset is None and (slot_hash == 0 or slot_tat <= now):
+                free_offset = offset
+            if oldest_tat is None or slot_tat < oldest_tat:
+                oldest_offset, oldest_tat = offset, slot_tat
+
+        return (free_offset if free_offset is not None else oldest_offset), None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "file",
+            "path": self.path,
+            "slots": self.slots,
+            "lock_retries": self.lock_retries,
+        }
+
+
+# 原子 GCRA：讀取 TAT、計算並寫回在 Redis 內一次完成；使用 Redis 伺服器時鐘，
+# 各 worker 的時鐘偏差不影響結果。浮點數以字串返回，避免被 Redis 截斷為整數。
+_REDIS_GCRA_SCRIPT = """
+local emission_interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission_interval * cost
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, tostring(tat - now), tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, tostring(new_tat - now), '0'}
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Redis 儲存（多 worker / 多主機部署）
+
+    以 Lua 腳本在一次往返內原子地完成檢查與更新；鍵的過期時間設為
+    完全恢復所需時間，閒置的鍵由 Redis 自動清除。
+    Redis 不可用時退回進程內存儲存，避免限流故障導致服務中斷，
+    並在 REDIS_RETRY_SECONDS 秒內不再嘗試 Redis（避免每個請求都等待連接超時）。
+    """
+
+    def __init__(self, redis_url: str, key_prefix: str = "ratelimit:", timeout: float = 0.5):
+        """
+        Args:
+            redis_url: Redis 連接 URL
+            key_prefix: 限流鍵前綴
+            timeout: 連接與讀寫超時（秒），限流位於每個請求的關鍵路徑上，須保持短超時
+        """
+        import redis.asyncio as redis
+
+        self.key_prefix = key_prefix
+        self.redis_client = redis.from_url(
+            redis_url, socket_connect_timeout=timeout, socket_timeout=timeout
+        )
+        self._script = self.redis_client.register_script(_REDIS_GCRA_SCRIPT)
+        self._fallback = MemoryRateLimitStore()
+        self._retry_at = 0.0
+        self.fallback_count = 0
+
+    async def update(
+        self, key: str, emission_interval: float, period: float, cost: float
+    ) -> Tuple[bool, float, float]:
+        if time.monotonic() < self._retry_at:
+            self.fallback_count += 1
+            return await self._fallback.update(key, emission_interval, period, cost)
+
+        try:
+            allowed, debt, retry_after = await self._script(
+                keys=[f"{self.key_prefix}{key}"],
+                args=[emission_interval, period, cost],
+            )
+        except Exception as e:
+            self.fallback_count += 1
+            self._retry_at = time.monotonic() + settings.REDIS_RETRY_SECONDS
+            logger.warning(
+                f"Redis 限流不可用，{settings.REDIS_RETRY_SECONDS:g} 秒內使用進程內限流: {str(e)}"
+            )
+            return await self._fallback.update(key, emission_interval, period, cost)
+
+        return bool(allowed), float(debt), float(retry_after)
+
+    async def close(self) -> None:
+        await self.redis_client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "fallback_count": self.fallback_count,
+            "degraded": time.monotonic() < self._retry_at,
+        }
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """
+    根據配置建立限流儲存後端
+
+    RATE_LIMIT_STORAGE 為 "auto" 時，啟用 Redis 則使用 Redis，否則使用進程內存。
+    """
+    storage = settings.RATE_LIMIT_STORAGE.lower()
+    if storage == "auto":
+        storage = "redis" if settings.REDIS_ENABLED else "memory"
+
+    if storage == "redis":
+        try:
+            return RedisRateLimitStore(settings.REDIS_URL)
+        except ImportError:
+            print("警告: Redis 未安裝，使用內存限流")
+            return MemoryRateLimitStore()
+    if storage == "file":
+        return FileRateLimitStore(settings.RATE_LIMIT_FILE_PATH, settings.RATE_LIMIT_FILE_SLOTS)
+    return MemoryRateLimitStore()
+
+
+class GCRARateLimiter:
+    """
+    GCRA 限流器（與令牌桶等價）
+
+    每個鍵只保存一個理論到達時間（TAT），檢查與更新均為 O(1)：
+    容量為 limit 個單位，每 period 秒補充 limit 個，每次請求按 cost 消耗。
+    """
+
+    def __init__(self, limit: int, period: float = 60.0, store: Optional[RateLimitStore] = None):
+        """
+        初始化限流器
+
+        Args:
+            limit: 每個週期允許的單位數（亦為突發容量）
+            period: 週期長度（秒）
+            store: 狀態儲存後端，預設為進程內存
+        """
+        self.limit = limit
+        self.period = period
+        self.emission_interval = period / limit
+        self.store = store or MemoryRateLimitStore()
+
+    async def hit(self, key: str, cost: float = 1.0) -> RateLimitResult:
+        """
+        檢查並消耗配額
+
+        Args:
+            key: 限流鍵（如客戶端 IP）
+            cost: 本次請求消耗的單位數，超過 limit 時按 limit 計算
+                （否則該請求永遠無法放行，Retry-After 也失去意義）
+
+        Returns:
+            限流檢查結果，被拒絕時不消耗配額
+        """
+        cost = min(cost, self.limit)
+        allowed, debt, retry_after = await self.store.update(
+            key, self.emission_interval, self.period, cost
+        )
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.limit,
+            remaining=max(0, int((self.period - debt) / self.emission_interval + 1e-9)),
+            retry_after=retry_after,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取限流器狀態"""
+        return {
+            "limit": self.limit,
+            "period": self.period,
+            "storage": self.store.get_stats(),
+        }
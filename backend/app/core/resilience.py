@@ -0,0 +1,210 @@
+"""容錯模組 - 熔斷器與自適應並發限制（AIMD）"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+# 熔斷器狀態
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class ServiceUnavailableError(Exception):
+    """下游服務暫不可用（熔斷中或排隊超時），調用方應快速失敗"""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    熔斷器
+
+    - closed: 正常放行，連續失敗達到閾值後轉為 open
+    - open: 直接拒絕，經過恢復時間後轉為 half_open
+    - half_open: 只放行有限的探測請求，成功則 closed，失敗則重新 open
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        """
+        初始化熔斷器
+
+        Args:
+            failure_threshold: 連續失敗多少次後熔斷
+            recovery_seconds: 熔斷後多久嘗試半開探測（秒）
+            half_open_max_calls: 半開狀態下同時允許的探測請求數
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.total_rejected = 0
+
+    def allow_request(self) -> bool:
+        """判斷是否放行請求（放行時已佔用半開探測名額）"""
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_seconds:
+                self.total_rejected += 1
+                return False
+            self.state = CIRCUIT_HALF_OPEN
+            self.half_open_calls = 0
+
+        if self.state == CIRCUIT_HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.total_rejected += 1
+                return False
+            self.half_open_calls += 1
+
+        return True
+
+    def is_available(self) -> bool:
+        """查看當前是否可能放行請求（不佔用探測名額，用於路由選擇）"""
+        if self.state == CIRCUIT_OPEN:
+            return time.monotonic() - self.opened_at >= self.recovery_seconds
+        if self.state == CIRCUIT_HALF_OPEN:
+            return self.half_open_calls < self.half_open_max_calls
+        return True
+
+    def cancel_request(self) -> None:
+        """放行後未實際調用（如排隊超時、被取消），歸還半開探測名額"""
+        if self.state == CIRCUIT_HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_success(self) -> None:
+        """記錄成功調用"""
+        self.consecutive_failures = 0
+        if self.state == CIRCUIT_HALF_OPEN:
+            self.state = CIRCUIT_CLOSED
+            self.half_open_calls = 0
+
+    def record_failure(self) -> None:
+        """記錄失敗調用"""
+        self.consecutive_failures += 1
+        if (
+            self.state == CIRCUIT_HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+            self.half_open_calls = 0
+
+    def retry_after(self) -> float:
+        """距離下次允許探測的剩餘秒數"""
+        if self.state != CIRCUIT_OPEN:
+            return 0.0
+        return max(0.0, self.recovery_seconds - (time.monotonic() - self.opened_at))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取熔斷器狀態"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_after": round(self.retry_after(), 1),
+            "total_rejected": self.total_rejected,
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    自適應並發限制器（AIMD）
+
+    調用成功且延遲低於閾值時，限制值加性增長（每輪約 +1）；
+    調用失敗或延遲超過閾值時，限制值乘性減少。
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 20,
+        latency_threshold: float = 20.0,
+        backoff_ratio: float = 0.7,
+    ):
+        """
+        初始化限制器
+
+        Args:
+            initial_limit: 初始並發上限
+            min_limit: 並發上限下界
+            max_limit: 並發上限上界
+            latency_threshold: 延遲閾值（秒），超過視為過載訊號
+            backoff_ratio: 乘性減少係數
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def _cond(self) -> asyncio.Condition:
+        # 延遲建立，確保綁定到實際運行的事件循環
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        獲取一個並發名額
+
+        Args:
+            timeout: 最長等待時間（秒），None 表示不限
+
+        Raises:
+            ServiceUnavailableError: 等待超時
+        """
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self.in_flight < int(self.limit)),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                raise ServiceUnavailableError("AI 服務繁忙，排隊等待超時", retry_after=timeout or 0)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self, latency: float, success: bool, adjust: bool = True) -> None:
+        """
+        釋放名額並根據結果調整限制值
+
+        Args:
+            latency: 本次調用耗時（秒）
+            success: 本次調用是否成功
+            adjust: 是否根據本次結果調整限制值（調用被取消時不調整）
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            if adjust:
+                if success and latency <= self.latency_threshold:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                else:
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取限制器狀態"""
+        return {
+            "limit": int(self.limit),
+            "limit_raw": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "latency_threshold": self.latency_threshold,
+        }
@@ -15,14 +15,20 @@ class ResponseModel(BaseModel):
 class PaginatedResponse(BaseModel):
     """
     分頁回應模型
+
+    頁碼分頁返回 page；游標分頁返回 next_cursor（下一頁的游標，None 表示沒有下一頁），
+    total 只在請求時計算，可能是緩存或估算值（total_estimated）
     """
 
     code: int = 200
     message: str = "success"
     data: Optional[Any] = None
-    total: int = 0
-    page: int = 1
+    total: Optional[int] = 0
+    total_estimated: bool = False
+    page: Optional[int] = 1
     page_size: int = 10
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 
 def success(data: Any = None, message: str = "操作成功") -> ResponseModel:
@@ -78,3 +84,38 @@ def paginated_response(
         page=page,
         page_size=page_size,
     )
+
+
+def cursor_paginated_response(
+    data: Any,
+    next_cursor: Optional[str],
+    page_size: int,
+    total: Optional[int] = None,
+    total_estimated: bool = False,
+    message: str = "查詢成功",
+) -> PaginatedResponse:
+    """
+    游標分頁回應
+
+    Args:
+        data: 資料清單
+        next_cursor: 下一頁的游標，None 表示沒有下一頁
+        page_size: 每頁數量
+        total: 總數，None 表示未計算
+        total_estimated: total 是否為估算值
+        message: 回應訊息
+
+    Returns:
+        分頁回應模型
+    """
+    return PaginatedResponse(
+        code=200,
+        message=message,
+        data=data,
+        total=total,
+        total_estimated=total_estimated,
+        page=None,
+        page_size=page_size,
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None,
+    )
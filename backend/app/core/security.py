@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from typing import Any, Optional, Union
-from jose import jwt
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import settings
 
@@ -31,6 +31,23 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> Optional[str]:
+    """
+    解碼存取權杖
+
+    Args:
+        token: JWT 權杖
+
+    Returns:
+        權杖主題（sub），權杖無效或已過期時返回 None
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     驗證密碼
@@ -0,0 +1,67 @@
+"""序列化模組 - 緩存值的 orjson 序列化（保留 pydantic 模型類型）"""
+import importlib
+from decimal import Decimal
+from typing import Any
+import orjson
+from pydantic import BaseModel
+
+# pydantic 模型的序列化標記
+MODEL_TAG = "__model__"
+# 只還原本應用內定義的模型，避免反序列化時導入任意模組
+MODEL_MODULE_PREFIX = "app."
+
+
+def _default(value: Any) -> Any:
+    """orjson 不支持的類型：pydantic 模型帶類型標記序列化，其餘明確轉換或報錯"""
+    if isinstance(value, BaseModel):
+        model = type(value)
+        return {
+            MODEL_TAG: f"{model.__module__}:{model.__qualname__}",
+            "data": value.model_dump(mode="json"),
+        }
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"無法序列化類型: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    序列化為位元組
+
+    Raises:
+        TypeError: 值包含無法序列化的類型（不會靜默轉為字串）
+    """
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data: bytes) -> Any:
+    """反序列化，帶類型標記的物件還原為對應的 pydantic 模型"""
+    return _revive(orjson.loads(data))
+
+
+def _revive(value: Any) -> Any:
+    """遞迴還原帶類型標記的 pydantic 模型"""
+    if isinstance(value, dict):
+        if len(value) == 2 and MODEL_TAG in value and "data" in value:
+            model = _import_model(value[MODEL_TAG])
+            if model is not None:
+                return model.model_validate(value["data"])
+        return {key: _revive(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_revive(item) for item in value]
+    return value
+
+
+def _import_model(path: str) -> Any:
+    """根據 "模組:類名" 導入 pydantic 模型類，非本應用模型返回 None"""
+    module_name, _, qualname = path.partition(":")
+    if not module_name.startswith(MODEL_MODULE_PREFIX):
+        return None
+    target: Any = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        target = getattr(target, name, None)
+    if isinstance(target, type) and issubclass(target, BaseModel):
+        return target
+    return None
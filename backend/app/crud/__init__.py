@@ -1,3 +1,4 @@
-from app.crud.crud_user import crud_user
+from app.crud.crud_user import crud_user, async_crud_user
+from app.crud.crud_invoice import crud_invoice, async_crud_invoice
 
-__all__ = ["crud_user"]
+__all__ = ["crud_user", "async_crud_user", "crud_invoice", "async_crud_invoice"]
@@ -1,14 +1,394 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import binascii
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter
+from typing import Any, Dict, Generic, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+import orjson
 from pydantic import BaseModel
+from sqlalchemy import and_, delete, func, insert, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# 排序鍵：(欄位, 是否降序)
+OrderKey = Tuple[Any, bool]
 
-class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+
+class InvalidCursorError(ValueError):
+    """分頁游標無法解析，或與目前的排序不符"""
+
+
+def _batches(items: Sequence[Any], batch_size: Optional[int]) -> Iterator[Sequence[Any]]:
+    """按批量大小切分，未指定時使用 settings.DB_BULK_BATCH_SIZE"""
+    size = batch_size or settings.DB_BULK_BATCH_SIZE
+    if size < 1:
+        raise ValueError("批量大小必須大於 0")
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _as_row(obj_in: Union[BaseModel, Dict[str, Any]]) -> Dict[str, Any]:
+    """將建立用的 schema 或字典轉為資料列字典"""
+    return dict(obj_in) if isinstance(obj_in, dict) else obj_in.model_dump()
+
+
+def _insert_returning(dialect: Any) -> bool:
+    """資料庫是否支持 executemany INSERT 按參數順序返回記錄（SQLite 3.35+ RETURNING、MSSQL OUTPUT）"""
+    return bool(
+        dialect.insert_executemany_returning
+        and dialect.insert_executemany_returning_sort_by_parameter_order
+    )
+
+
+def bulk_insert_returning(
+    model: Any, returning: Any, dialect: Any, rows: Sequence[Dict[str, Any]]
+) -> Tuple[Any, bool]:
+    """
+    建立批量寫入並返回記錄的 INSERT ... RETURNING 語句
+
+    要求按參數順序返回時，SQLAlchemy 需要能標識每一列的 sentinel：MSSQL 以 IDENTITY 主鍵批量寫入，
+    SQLite 沒有隱式 sentinel，會退化為逐筆 INSERT。SQLite 按 VALUES 順序遞增分配自增主鍵，
+    因此資料列未指定主鍵時改為不要求順序、批量寫入，再由調用方按主鍵排序。
+
+    Args:
+        model: 模型類
+        returning: RETURNING 的模型或欄位
+        dialect: 資料庫方言
+        rows: 待寫入的資料列
+
+    Returns:
+        (INSERT 語句, 返回結果是否需按主鍵排序)
+    """
+    table = model.__table__
+    sort_by_id = (
+        dialect.name == "sqlite"
+        and table.autoincrement_column is table.c.id
+        and not any("id" in row for row in rows)
+    )
+    statement = insert(model).returning(returning, sort_by_parameter_order=not sort_by_id)
+    return statement, sort_by_id
+
+
+def _estimate_count_statement(dialect_name: str) -> Optional[Any]:
+    """讀取表列數統計資訊的查詢（參數 :table），不支持的資料庫返回 None"""
+    if dialect_name == "mssql":
+        return text(
+            "SELECT SUM(row_count) FROM sys.dm_db_partition_stats "
+            "WHERE object_id = OBJECT_ID(:table) AND index_id IN (0, 1)"
+        )
+    if dialect_name == "sqlite":
+        # stat 欄位第一個數字為表的列數，同一表的各索引記錄相同
+        return text("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = :table")
+    return None
+
+
+@dataclass
+class Page(Generic[ModelType]):
+    """游標分頁結果"""
+
+    items: List[ModelType] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+class Keyset:
+    """
+    游標（keyset）分頁
+
+    以上一頁最後一筆的排序鍵值作為下一頁的起點（WHERE 鍵 < 上一頁最後的值），
+    不使用 OFFSET，任何深度的頁面都只需在索引上定位一次。
+
+    排序鍵最後一欄必須唯一（通常是主鍵），保證順序穩定。只有第一欄可以為 NULL：
+    SQLite 與 MSSQL 都把 NULL 排在最小，可空的第一欄分為非 NULL 與 NULL 兩段依序查詢，
+    每段都能使用索引範圍掃描。
+    """
+
+    def __init__(self, order_by: Sequence[OrderKey]):
+        """
+        Args:
+            order_by: 排序鍵 [(欄位, 是否降序), ...]，最後一欄必須唯一
+        """
+        self.keys = list(order_by)
+        self.columns = [column for column, _ in self.keys]
+        signature = ",".join(f"{column.key}:{int(descending)}" for column, descending in self.keys)
+        self.signature = zlib.crc32(signature.encode()) & 0xFFFF
+        leading, descending = self.keys[0]
+        if getattr(leading, "nullable", False):
+            # 按排序順序排列的分段：降序時 NULL 在最後，升序時在最前
+            self.segments = ["value", "null"] if descending else ["null", "value"]
+        else:
+            self.segments = ["value"]
+
+    @classmethod
+    def for_model(cls, model: Any, order_by: Optional[Sequence[OrderKey]] = None) -> "Keyset":
+        """建立模型的排序鍵，未以主鍵結尾時補上主鍵（方向同最後一欄，預設升序）"""
+        keys = list(order_by or [])
+        if not keys or keys[-1][0] is not model.id:
+            keys.append((model.id, keys[-1][1] if keys else False))
+        return cls(keys)
+
+    def start(self, cursor: Optional[str]) -> Tuple[List[str], Optional[List[Any]]]:
+        """
+        從游標取得待查詢的分段與起點
+
+        Raises:
+            InvalidCursorError: 游標無法解析或與排序不符
+        """
+        if not cursor:
+            return self.segments, None
+        segment, values = self.decode(cursor)
+        return self.segments[self.segments.index(segment):], values
+
+    def order_clause(self) -> List[Any]:
+        """ORDER BY 子句"""
+        return [column.desc() if descending else column.asc() for column, descending in self.keys]
+
+    def conditions(self, segment: str, values: Optional[List[Any]]) -> List[Any]:
+        """
+        某一分段中位於游標之後的 WHERE 條件
+
+        Args:
+            segment: 分段（"value" 為第一欄非 NULL，"null" 為第一欄為 NULL）
+            values: 游標的排序鍵值，None 表示從分段開頭查詢
+        """
+        column, descending = self.keys[0]
+        conditions = []
+        if len(self.segments) > 1:
+            conditions.append(column.is_(None) if segment == "null" else column.is_not(None))
+        if values is None:
+            return conditions
+
+        if segment == "null":
+            # 第一欄都是 NULL，只比較其餘欄位
+            conditions.append(self._after(self.keys[1:], values[1:]))
+            return conditions
+
+        value = values[0]
+        if len(self.keys) == 1:
+            conditions.append(column < value if descending else column > value)
+            return conditions
+
+        # 第一欄先以範圍條件縮小到索引上的一段，其餘欄位再判斷是否在游標之後：
+        # col <= v AND (col < v OR 其餘欄位在游標之後)
+        conditions.append(column <= value if descending else column >= value)
+        conditions.append(
+            or_(
+                column < value if descending else column > value,
+                self._after(self.keys[1:], values[1:]),
+            )
+        )
+        return conditions
+
+    @staticmethod
+    def _after(keys: Sequence[OrderKey], values: Sequence[Any]) -> Any:
+        """(c1, c2, ...) 按排序方向位於 (v1, v2, ...) 之後（欄位不可為 NULL）"""
+        clauses = []
+        for index, (column, descending) in enumerate(keys):
+            equal = [keys[i][0] == values[i] for i in range(index)]
+            after = column < values[index] if descending else column > values[index]
+            clauses.append(and_(*equal, after))
+        return or_(*clauses)
+
+    def encode(self, row: Any) -> str:
+        """以一筆記錄的排序鍵值生成游標"""
+        values = [getattr(row, column.key) for column in self.columns]
+        segment = "null" if values[0] is None else "value"
+        payload = {"s": self.signature, "g": self.segments.index(segment), "v": values}
+        data = orjson.dumps(payload, default=self._default)
+        return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple[str, List[Any]]:
+        """
+        解析游標
+
+        Returns:
+            (分段, 排序鍵值) 元組
+
+        Raises:
+            InvalidCursorError: 游標格式錯誤或與目前的排序不符
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = orjson.loads(data)
+            if payload["s"] != self.signature or len(payload["v"]) != len(self.columns):
+                raise InvalidCursorError("分頁游標與目前的查詢不符")
+            segment = self.segments[payload["g"]]
+            values = [
+                self._coerce(column, value) for column, value in zip(self.columns, payload["v"])
+            ]
+            return segment, values
+        except InvalidCursorError:
+            raise
+        except (binascii.Error, orjson.JSONDecodeError, KeyError, IndexError, TypeError, ValueError):
+            raise InvalidCursorError("分頁游標格式錯誤")
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(f"無法序列化類型: {type(value).__name__}")
+
+    @staticmethod
+    def _coerce(column: Any, value: Any) -> Any:
+        """將游標中的 JSON 值還原為欄位類型"""
+        if value is None:
+            return None
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        if python_type is Decimal:
+            return Decimal(value)
+        if python_type in (int, str, float, bool) and not isinstance(value, python_type):
+            raise InvalidCursorError("分頁游標格式錯誤")
+        return value
+
+
+class PageQuery(Generic[ModelType]):
+    """
+    一次游標分頁查詢：按分段生成查詢語句，調用方執行後以 add 交回結果
+
+    同步與異步 CRUD 共用，各自只負責執行語句：
+        for statement in query.statements():
+            query.add(db.scalars(statement).all())
+        return query.page()
+    """
+
+    def __init__(
+        self,
+        model: Type[ModelType],
+        cursor: Optional[str],
+        limit: int,
+        order_by: Optional[Sequence[OrderKey]],
+        conditions: Sequence[Any],
+    ):
+        """
+        Raises:
+            InvalidCursorError: 游標無法解析或與排序不符
+        """
+        self.model = model
+        self.limit = limit
+        self.conditions = conditions
+        self.keyset = Keyset.for_model(model, order_by)
+        self.segments, self._values = self.keyset.start(cursor)
+        self.items: List[ModelType] = []
+
+    def statements(self) -> Iterator[Any]:
+        """依序生成各分段的查詢，已取得多於一頁的記錄時停止"""
+        for segment in self.segments:
+            if len(self.items) > self.limit:
+                return
+            yield (
+                select(self.model)
+                .where(*self.conditions, *self.keyset.conditions(segment, self._values))
+                .order_by(*self.keyset.order_clause())
+                .limit(self.limit + 1 - len(self.items))
+            )
+            # 之後的分段從開頭查詢
+            self._values = None
+
+    def add(self, rows: Sequence[ModelType]) -> None:
+        """交回一個分段的查詢結果"""
+        self.items.extend(rows)
+
+    def page(self) -> Page[ModelType]:
+        """本頁記錄與下一頁游標"""
+        if len(self.items) > self.limit:
+            return Page(
+                items=self.items[:self.limit],
+                next_cursor=self.keyset.encode(self.items[self.limit - 1]),
+            )
+        return Page(items=self.items)
+
+
+class CRUDQueries(Generic[ModelType]):
+    """通用查詢語句與批量分段（同步與異步 CRUD 共用，各自只負責執行語句與交易）"""
+
+    model: Type[ModelType]
+
+    def _count_statement(self, conditions: Sequence[Any]) -> Any:
+        """按條件統計記錄數的查詢"""
+        return select(func.count()).select_from(self.model).where(*conditions)
+
+    def _estimate_count_query(self, dialect: Any) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """讀取表列數統計資訊的查詢與參數，不支持的資料庫返回 None"""
+        statement = _estimate_count_statement(dialect.name)
+        if statement is None:
+            return None
+        return statement, {"table": self.model.__table__.name}
+
+    def _insert_batches(
+        self,
+        objs_in: Sequence[Union[BaseModel, Dict[str, Any]]],
+        dialect: Any,
+        batch_size: Optional[int],
+    ) -> Iterator[Tuple[Optional[Any], Sequence[Dict[str, Any]], bool]]:
+        """
+        按批生成批量建立的語句
+
+        Returns:
+            (INSERT ... RETURNING 語句, 本批資料列, 返回結果是否需按主鍵排序) 的迭代器；
+            資料庫不支持 executemany RETURNING 時語句為 None，由調用方以 add_all + flush 寫入
+        """
+        rows = [_as_row(obj_in) for obj_in in objs_in]
+        returning = _insert_returning(dialect)
+        for batch in _batches(rows, batch_size):
+            if returning:
+                statement, sort_by_id = bulk_insert_returning(self.model, self.model, dialect, batch)
+                yield statement, batch, sort_by_id
+            else:
+                yield None, batch, False
+
+    @staticmethod
+    def _in_input_order(objs: Sequence[ModelType], sort_by_id: bool) -> Sequence[ModelType]:
+        """將 RETURNING 返回的記錄排回輸入順序（見 bulk_insert_returning）"""
+        return sorted(objs, key=attrgetter("id")) if sort_by_id else objs
+
+    def _update_batches(
+        self, objs_in: Sequence[Dict[str, Any]], batch_size: Optional[int]
+    ) -> Iterator[Tuple[Any, Sequence[Dict[str, Any]]]]:
+        """按批生成按主鍵批量更新的語句與資料列（不存在的欄位忽略）"""
+        rows = [
+            {key: value for key, value in obj_in.items() if hasattr(self.model, key)}
+            for obj_in in objs_in
+        ]
+        for batch in _batches(rows, batch_size):
+            yield update(self.model), batch
+
+    def _delete_batches(
+        self, ids: Sequence[Any], dialect: Any, batch_size: Optional[int]
+    ) -> Iterator[Tuple[Any, Optional[Any]]]:
+        """
+        按批生成按主鍵批量刪除的語句
+
+        Returns:
+            (DELETE 語句, 查詢存在 ID 的語句) 的迭代器；支持 RETURNING 時 DELETE 語句
+            直接返回刪除的 ID，查詢語句為 None，否則需先執行查詢語句再刪除
+        """
+        returning = dialect.delete_returning
+        for batch in _batches(list(ids), batch_size):
+            statement = delete(self.model).where(self.model.id.in_(batch))
+            if returning:
+                # 以返回的 ID 從會話中移除對應記錄，而不是對會話中每個記錄求值 IN 條件
+                statement = statement.returning(self.model.id).execution_options(synchronize_session="fetch")
+                yield statement, None
+            else:
+                yield statement, select(self.model.id).where(self.model.id.in_(batch))
+
+
+class CRUDBase(CRUDQueries[ModelType], Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     CRUD 基礎類別
     封裝通用的增刪改查操作
@@ -37,6 +417,70 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             return 0
         return db.query(self.model).count()
 
+    def get_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: Optional[Sequence[OrderKey]] = None,
+        conditions: Sequence[Any] = (),
+    ) -> Page[ModelType]:
+        """
+        游標分頁查詢
+
+        Args:
+            db: 資料庫會話
+            cursor: 上一頁返回的 next_cursor，None 表示第一頁
+            limit: 每頁筆數
+            order_by: 排序鍵 [(欄位, 是否降序), ...]，應與索引一致；預設按主鍵升序，
+                未以主鍵結尾時自動補上主鍵
+            conditions: 額外的 WHERE 條件
+
+        Returns:
+            本頁記錄與下一頁游標
+
+        Raises:
+            InvalidCursorError: 游標無法解析或與排序不符
+        """
+        if db is None:
+            return Page()
+        query = PageQuery(self.model, cursor, limit, order_by, conditions)
+        for statement in query.statements():
+            query.add(db.scalars(statement).all())
+        return query.page()
+
+    def count(self, db: Session, *, conditions: Sequence[Any] = ()) -> int:
+        """按條件統計記錄數"""
+        if db is None:
+            return 0
+        return db.scalar(self._count_statement(conditions)) or 0
+
+    def estimate_count(self, db: Session) -> Optional[int]:
+        """
+        從資料庫統計資訊估算總記錄數，不掃描表
+
+        MSSQL 讀取 sys.dm_db_partition_stats，SQLite 讀取 ANALYZE 生成的 sqlite_stat1；
+        沒有統計資訊時返回 None
+
+        Args:
+            db: 資料庫會話
+
+        Returns:
+            估算的記錄數或 None
+        """
+        if db is None:
+            return None
+        query = self._estimate_count_query(db.get_bind().dialect)
+        if query is None:
+            return None
+        try:
+            value = db.scalar(*query)
+        except Exception:
+            db.rollback()
+            return None
+        return int(value) if value is not None else None
+
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> Optional[ModelType]:
         """建立記錄（優化：添加錯誤處理）"""
         if db is None:
@@ -93,3 +537,315 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         except Exception as e:
             db.rollback()
             raise e
+
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        batch_size: Optional[int] = None,
+    ) -> List[ModelType]:
+        """
+        批量建立記錄（單一交易）
+
+        每批以一次 executemany INSERT 寫入；資料庫支持時以 RETURNING / OUTPUT 一併取回
+        完整記錄（含 ID 與伺服器預設值，見 bulk_insert_returning），不再逐筆 commit / refresh。
+        不支持時退回 add_all + flush。
+
+        Args:
+            db: 資料庫會話
+            objs_in: 建立用的 schema 或欄位字典列表
+            batch_size: 每批筆數，預設 settings.DB_BULK_BATCH_SIZE
+
+        Returns:
+            建立的記錄，順序與 objs_in 一致；任何一批失敗時整體回滾並拋出異常
+        """
+        if db is None or not objs_in:
+            return []
+        try:
+            created: List[ModelType] = []
+            for statement, batch, sort_by_id in self._insert_batches(
+                objs_in, db.get_bind().dialect, batch_size
+            ):
+                if statement is not None:
+                    created.extend(self._in_input_order(db.scalars(statement, batch).all(), sort_by_id))
+                else:
+                    objs = [self.model(**row) for row in batch]
+                    db.add_all(objs)
+                    db.flush()
+                    created.extend(objs)
+            db.commit()
+            return created
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    def update_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """
+        按主鍵批量更新記錄（單一交易）
+
+        每筆為含主鍵 id 與待更新欄位的字典（不存在的欄位忽略），每批以 executemany
+        UPDATE ... WHERE id = ? 寫入，欄位組合不同的資料列自動分組；會話中已載入的對應記錄同步更新。
+        SQLAlchemy 的按主鍵批量 UPDATE 不支持 RETURNING，需要最新記錄時請再以 ID 查詢。
+
+        Args:
+            db: 資料庫會話
+            objs_in: [{"id": 1, "欄位": 值, ...}, ...]
+            batch_size: 每批筆數，預設 settings.DB_BULK_BATCH_SIZE
+
+        Returns:
+            更新的記錄數
+
+        Raises:
+            StaleDataError: 有 ID 不存在（整體回滾）
+        """
+        if db is None or not objs_in:
+            return 0
+        try:
+            for statement, batch in self._update_batches(objs_in, batch_size):
+                db.execute(statement, batch)
+            db.commit()
+            return len(objs_in)
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    def delete_many(
+        self,
+        db: Session,
+        *,
+        ids: Sequence[Any],
+        batch_size: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        按主鍵批量刪除記錄（單一交易）
+
+        每批以一次 DELETE ... WHERE id IN (...) 刪除，支持時以 RETURNING / OUTPUT 取回實際刪除的 ID，
+        否則先查出存在的 ID。不經 ORM 級聯，子記錄依賴資料庫外鍵的 ON DELETE CASCADE。
+        MSSQL 單一語句最多 2100 個參數，batch_size 不宜超過 2000。
+
+        Args:
+            db: 資料庫會話
+            ids: 待刪除的 ID 列表
+            batch_size: 每批筆數，預設 settings.DB_BULK_BATCH_SIZE
+
+        Returns:
+            實際刪除的 ID 列表（不存在的 ID 忽略）
+        """
+        if db is None or not ids:
+            return []
+        try:
+            deleted: List[Any] = []
+            for statement, lookup in self._delete_batches(ids, db.get_bind().dialect, batch_size):
+                if lookup is None:
+                    deleted.extend(db.scalars(statement).all())
+                else:
+                    deleted.extend(db.scalars(lookup).all())
+                    db.execute(statement)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            raise e
+
+
+class AsyncCRUDBase(CRUDQueries[ModelType], Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    異步 CRUD 基礎類別
+    與 CRUDBase 介面一致，使用 AsyncSession，不佔用執行緒池
+    """
+
+    def __init__(self, model: Type[ModelType]):
+        self.model = model
+
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        """根據 ID 獲取單一記錄"""
+        if db is None:
+            return None
+        return await db.get(self.model, id)
+
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100
+    ) -> List[ModelType]:
+        """獲取多筆記錄"""
+        if db is None:
+            return []
+        result = await db.scalars(select(self.model).offset(skip).limit(limit))
+        return list(result.all())
+
+    async def get_count(self, db: AsyncSession) -> int:
+        """獲取總記錄數"""
+        if db is None:
+            return 0
+        return await db.scalar(select(func.count()).select_from(self.model))
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: Optional[Sequence[OrderKey]] = None,
+        conditions: Sequence[Any] = (),
+    ) -> Page[ModelType]:
+        """游標分頁查詢（參數與返回值同 CRUDBase.get_page）"""
+        if db is None:
+            return Page()
+        query = PageQuery(self.model, cursor, limit, order_by, conditions)
+        for statement in query.statements():
+            query.add((await db.scalars(statement)).all())
+        return query.page()
+
+    async def count(self, db: AsyncSession, *, conditions: Sequence[Any] = ()) -> int:
+        """按條件統計記錄數"""
+        if db is None:
+            return 0
+        return await db.scalar(self._count_statement(conditions)) or 0
+
+    async def estimate_count(self, db: AsyncSession) -> Optional[int]:
+        """從資料庫統計資訊估算總記錄數，不掃描表（同 CRUDBase.estimate_count）"""
+        if db is None:
+            return None
+        query = self._estimate_count_query(db.get_bind().dialect)
+        if query is None:
+            return None
+        try:
+            value = await db.scalar(*query)
+        except Exception:
+            await db.rollback()
+            return None
+        return int(value) if value is not None else None
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> Optional[ModelType]:
+        """建立記錄"""
+        if db is None:
+            return None
+        try:
+            db_obj = self.model(**obj_in.model_dump())
+            db.add(db_obj)
+            await db.commit()
+            await db.refresh(db_obj)
+            return db_obj
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> Optional[ModelType]:
+        """更新記錄"""
+        if db is None:
+            return None
+        try:
+            if isinstance(obj_in, dict):
+                update_data = obj_in
+            else:
+                update_data = obj_in.model_dump(exclude_unset=True)
+
+            for field in update_data:
+                if hasattr(db_obj, field):
+                    setattr(db_obj, field, update_data[field])
+
+            db.add(db_obj)
+            await db.commit()
+            await db.refresh(db_obj)
+            return db_obj
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    async def delete(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+        """刪除記錄"""
+        if db is None:
+            return None
+        try:
+            obj = await db.get(self.model, id)
+            if obj:
+                await db.delete(obj)
+                await db.commit()
+            return obj
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        batch_size: Optional[int] = None,
+    ) -> List[ModelType]:
+        """批量建立記錄（參數與返回值同 CRUDBase.create_many）"""
+        if db is None or not objs_in:
+            return []
+        try:
+            created: List[ModelType] = []
+            for statement, batch, sort_by_id in self._insert_batches(
+                objs_in, db.get_bind().dialect, batch_size
+            ):
+                if statement is not None:
+                    objs = (await db.scalars(statement, batch)).all()
+                    created.extend(self._in_input_order(objs, sort_by_id))
+                else:
+                    objs = [self.model(**row) for row in batch]
+                    db.add_all(objs)
+                    await db.flush()
+                    created.extend(objs)
+            await db.commit()
+            return created
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """按主鍵批量更新記錄（參數與返回值同 CRUDBase.update_many）"""
+        if db is None or not objs_in:
+            return 0
+        try:
+            for statement, batch in self._update_batches(objs_in, batch_size):
+                await db.execute(statement, batch)
+            await db.commit()
+            return len(objs_in)
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    async def delete_many(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[Any],
+        batch_size: Optional[int] = None,
+    ) -> List[Any]:
+        """按主鍵批量刪除記錄（參數與返回值同 CRUDBase.delete_many）"""
+        if db is None or not ids:
+            return []
+        try:
+            deleted: List[Any] = []
+            for statement, lookup in self._delete_batches(ids, db.get_bind().dialect, batch_size):
+                if lookup is None:
+                    deleted.extend((await db.scalars(statement)).all())
+                else:
+                    deleted.extend((await db.scalars(lookup)).all())
+                    await db.execute(statement)
+            await db.commit()
+            return deleted
+        except Exception as e:
+            await db.rollback()
+            raise e
@@ -0,0 +1,570 @@
+import re
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import extract, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from app.crud.crud_base import AsyncCRUDBase, CRUDBase, Page, bulk_insert_returning
+from app.models.invoice import Invoice, InvoiceItem
+from app.schemas.invoice import InvoiceData, InvoiceFilter
+from app.utils.common import str_to_datetime
+
+
+# 發票唯一鍵欄位（與 uq_invoices_number_code_seller 索引一致）
+INVOICE_KEY_FIELDS = ("invoice_number", "invoice_code", "seller_tax_id")
+# 唯一鍵相同時比對的欄位：全部相同視為重複，任一不同視為衝突
+INVOICE_COMPARE_FIELDS = ("invoice_date", "amount", "tax_amount", "total_amount", "buyer_tax_id")
+# 每次查詢的發票號碼數（MSSQL 單一語句最多 2100 個參數）
+KEY_LOOKUP_CHUNK_SIZE = 1000
+
+# 發票清單的排序：開票日期、ID 降序（與 ix_invoices_date_amounts 索引一致）
+INVOICE_LIST_ORDER = ((Invoice.invoice_date, True), (Invoice.id, True))
+
+# 合計金額的精度
+AMOUNT_QUANTUM = Decimal("0.01")
+
+# 保存時的分類
+SAVE_NEW = "new"
+SAVE_DUPLICATE = "duplicate"
+SAVE_CONFLICT = "conflict"
+
+
+@dataclass
+class SaveResult:
+    """批量保存結果"""
+
+    saved: int = 0
+    duplicates: int = 0
+    conflicts: int = 0
+
+
+def parse_amount(value: str) -> Optional[Decimal]:
+    """
+    解析金額字串（移除貨幣符號與千分位）
+
+    Args:
+        value: 金額字串，例如 "¥1,234.50"
+
+    Returns:
+        金額，無法解析時返回 None
+    """
+    cleaned = re.sub(r"[^\d.\-]", "", value or "")
+    if not cleaned:
+        return None
+    try:
+        return Decimal(cleaned).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+
+
+def parse_date(value: str) -> Optional[date]:
+    """
+    解析 YYYY-MM-DD 格式的日期字串
+
+    Args:
+        value: 日期字串
+
+    Returns:
+        日期，無法解析時返回 None
+    """
+    dt = str_to_datetime(value, "%Y-%m-%d")
+    return dt.date() if dt else None
+
+
+class InvoiceQueries:
+    """發票查詢語句與結果處理（同步與異步 CRUD 共用）"""
+
+    @staticmethod
+    def to_row(invoice: InvoiceData) -> Dict[str, Any]:
+        """將 InvoiceData 轉為 invoices 表的資料列"""
+        return {
+            "invoice_number": invoice.invoiceNumber,
+            "invoice_code": invoice.invoiceCode,
+            "invoice_date": parse_date(invoice.date),
+            "amount": parse_amount(invoice.amount),
+            "tax_amount": parse_amount(invoice.taxAmount),
+            "total_amount": parse_amount(invoice.totalAmount),
+            "seller": invoice.seller,
+            "seller_tax_id": invoice.sellerTaxId,
+            "buyer": invoice.buyer,
+            "buyer_tax_id": invoice.buyerTaxId,
+            "remarks": invoice.remarks,
+        }
+
+    @staticmethod
+    def _filter_conditions(filters: InvoiceFilter) -> List[Any]:
+        """將查詢條件轉為 WHERE 條件（均可使用日期或稅號 + 日期的複合索引）"""
+        conditions = []
+        if filters.date_from is not None:
+            conditions.append(Invoice.invoice_date >= filters.date_from)
+        if filters.date_to is not None:
+            conditions.append(Invoice.invoice_date <= filters.date_to)
+        if filters.seller_tax_id:
+            conditions.append(Invoice.seller_tax_id == filters.seller_tax_id)
+        if filters.buyer_tax_id:
+            conditions.append(Invoice.buyer_tax_id == filters.buyer_tax_id)
+        if filters.min_amount is not None:
+            conditions.append(Invoice.total_amount >= filters.min_amount)
+        if filters.max_amount is not None:
+            conditions.append(Invoice.total_amount <= filters.max_amount)
+        return conditions
+
+    @staticmethod
+    def _totals_columns() -> List[Any]:
+        """合計欄位：數量與各金額總和"""
+        return [
+            func.count().label("count"),
+            func.coalesce(func.sum(Invoice.amount), 0).label("amount"),
+            func.coalesce(func.sum(Invoice.tax_amount), 0).label("tax_amount"),
+            func.coalesce(func.sum(Invoice.total_amount), 0).label("total_amount"),
+        ]
+
+    @staticmethod
+    def _totals_row(row: Any) -> Dict[str, Any]:
+        """將合計查詢的結果列轉為字典（金額統一為兩位小數）"""
+        data = dict(row._mapping)
+        for name in ("amount", "tax_amount", "total_amount"):
+            data[name] = Decimal(str(data[name] or 0)).quantize(AMOUNT_QUANTUM)
+        return data
+
+    @classmethod
+    def _seller_summary_statement(cls, filters: InvoiceFilter, limit: int) -> Any:
+        """
+        按銷售方合計的查詢
+
+        合計只讀取 ix_invoices_*_amounts 索引；銷售方名稱不在索引中，
+        只為返回的銷售方各取最近一張發票的名稱。
+        """
+        totals = cls._totals_columns()
+        grouped = (
+            select(Invoice.seller_tax_id, *totals)
+            .where(*cls._filter_conditions(filters))
+            .group_by(Invoice.seller_tax_id)
+            .order_by(totals[-1].desc(), Invoice.seller_tax_id)
+            .limit(limit)
+            .subquery()
+        )
+        latest = aliased(Invoice)
+        seller_name = (
+            select(latest.seller)
+            .where(latest.seller_tax_id == grouped.c.seller_tax_id)
+            .order_by(latest.invoice_date.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        return select(grouped, seller_name.label("seller")).order_by(
+            grouped.c.total_amount.desc(), grouped.c.seller_tax_id
+        )
+
+    @classmethod
+    def _monthly_summary_statement(cls, filters: InvoiceFilter) -> Any:
+        """
+        按開票月份合計的查詢（沒有開票日期的發票不計入）
+
+        內層按開票日期 GROUP BY，沿日期索引順序彙總、不需排序；外層再按年、月 GROUP BY，
+        只需排序每日一列的內層結果。直接按 STRFTIME / DATEPART 分組需為每張發票計算月份
+        並排序全部資料，100 萬張發票上慢 3～6 倍（見 benchmarks/bench_invoice_queries.py）。
+        """
+        daily = (
+            select(Invoice.invoice_date, *cls._totals_columns())
+            .where(Invoice.invoice_date.is_not(None), *cls._filter_conditions(filters))
+            .group_by(Invoice.invoice_date)
+            .subquery()
+        )
+        year = extract("year", daily.c.invoice_date)
+        month = extract("month", daily.c.invoice_date)
+        return (
+            select(
+                year.label("year"),
+                month.label("month"),
+                func.sum(daily.c["count"]).label("count"),
+                func.sum(daily.c.amount).label("amount"),
+                func.sum(daily.c.tax_amount).label("tax_amount"),
+                func.sum(daily.c.total_amount).label("total_amount"),
+            )
+            .group_by(year, month)
+            .order_by(year, month)
+        )
+
+    @classmethod
+    def _monthly_row(cls, row: Any) -> Dict[str, Any]:
+        """將按月合計的結果列轉為字典（month 為 YYYY-MM）"""
+        data = cls._totals_row(row)
+        data["month"] = f"{int(data.pop('year')):04d}-{int(data['month']):02d}"
+        return data
+
+    @staticmethod
+    def _key_lookup_statements(rows: Sequence[Dict[str, Any]]) -> Iterator[Any]:
+        """
+        查詢可能與資料列唯一鍵相同的已保存發票
+
+        以發票號碼集合查詢，超過 KEY_LOOKUP_CHUNK_SIZE 時分段；每列為唯一鍵欄位加比對欄位
+        """
+        columns = [getattr(Invoice, name) for name in INVOICE_KEY_FIELDS + INVOICE_COMPARE_FIELDS]
+        numbers = sorted({row["invoice_number"] for row in rows if row["invoice_number"]})
+        for start in range(0, len(numbers), KEY_LOOKUP_CHUNK_SIZE):
+            chunk = numbers[start:start + KEY_LOOKUP_CHUNK_SIZE]
+            # invoice_number <> '' 讓查詢可以使用部分唯一索引
+            yield select(*columns).where(
+                Invoice.invoice_number != "",
+                Invoice.invoice_number.in_(chunk),
+            )
+
+    @staticmethod
+    def _classify_rows(rows: Sequence[Dict[str, Any]], records: Iterable[Any]) -> List[str]:
+        """
+        按查出的已保存發票在內存中比對唯一鍵，將資料列分類
+
+        同一批內唯一鍵相同的發票與先出現的一筆比對；沒有發票號碼的發票無法判斷，一律視為新增。
+        """
+        key_size = len(INVOICE_KEY_FIELDS)
+        known: Dict[Tuple, Tuple] = {
+            tuple(record[:key_size]): tuple(record[key_size:]) for record in records
+        }
+
+        statuses = []
+        for row in rows:
+            if not row["invoice_number"]:
+                statuses.append(SAVE_NEW)
+                continue
+            key = tuple(row[name] for name in INVOICE_KEY_FIELDS)
+            values = tuple(row[name] for name in INVOICE_COMPARE_FIELDS)
+            existing = known.get(key)
+            if existing is None:
+                known[key] = values
+                statuses.append(SAVE_NEW)
+            elif existing == values:
+                statuses.append(SAVE_DUPLICATE)
+            else:
+                statuses.append(SAVE_CONFLICT)
+        return statuses
+
+    @staticmethod
+    def _save_result(statuses: List[str], saved: int) -> SaveResult:
+        """按分類統計保存結果"""
+        return SaveResult(
+            saved=saved,
+            duplicates=statuses.count(SAVE_DUPLICATE),
+            conflicts=statuses.count(SAVE_CONFLICT),
+        )
+
+    @staticmethod
+    def _new_only(
+        rows: List[Dict[str, Any]], invoices: List[InvoiceData], statuses: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[InvoiceData]]:
+        """篩選分類為新增的資料列與發票"""
+        new = [index for index, status in enumerate(statuses) if status == SAVE_NEW]
+        return [rows[index] for index in new], [invoices[index] for index in new]
+
+
+
+class InvoiceInsert:
+    """
+    寫入一批發票及其項目（不提交）：先以 INSERT ... RETURNING 寫入發票取回 ID，再寫入項目
+
+    同步與異步 CRUD 共用，各自只負責執行語句：
+        for statement, params in insert.statements():
+            insert.add(db.execute(statement, params))
+        return insert.saved
+    """
+
+    def __init__(self, dialect: Any, rows: List[Dict[str, Any]], invoices: List[InvoiceData]):
+        """
+        Args:
+            dialect: 資料庫方言
+            rows: 待寫入的發票資料列
+            invoices: 與 rows 對應的發票資料（取其項目）
+        """
+        self.dialect = dialect
+        self.rows = rows
+        self.invoices = invoices
+        self.invoice_ids: List[int] = []
+        self._expect_ids = False
+
+    @property
+    def saved(self) -> int:
+        """寫入的發票數量"""
+        return len(self.invoice_ids)
+
+    def statements(self) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+        """依序生成 (語句, executemany 參數)；寫入項目的語句在交回發票 ID 後生成"""
+        if not self.rows:
+            return
+        statement, sort_by_id = bulk_insert_returning(Invoice, Invoice.id, self.dialect, self.rows)
+        self._expect_ids = True
+        yield statement, self.rows
+        if sort_by_id:
+            self.invoice_ids.sort()
+
+        item_rows = self._item_rows()
+        if item_rows:
+            yield insert(InvoiceItem), item_rows
+
+    def add(self, result: Any) -> None:
+        """交回語句的執行結果（只有寫入發票的結果帶 ID）"""
+        if self._expect_ids:
+            self.invoice_ids = list(result.scalars().all())
+            self._expect_ids = False
+
+    def _item_rows(self) -> List[Dict[str, Any]]:
+        """按發票 ID 生成 invoice_items 表的資料列"""
+        return [
+            {
+                "invoice_id": invoice_id,
+                "name": item.name,
+                "quantity": item.quantity,
+                "price": item.price,
+            }
+            for invoice_id, invoice in zip(self.invoice_ids, self.invoices)
+            for item in invoice.items
+        ]
+
+
+class CRUDInvoice(InvoiceQueries, CRUDBase[Invoice, InvoiceData, InvoiceData]):
+    """發票 CRUD 操作"""
+
+    def search(
+        self,
+        db: Session,
+        *,
+        filters: InvoiceFilter,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Page[Invoice]:
+        """
+        按條件游標分頁查詢已保存的發票（開票日期、ID 降序，沿 ix_invoices_date_amounts 索引）
+
+        Args:
+            db: 資料庫會話
+            filters: 查詢條件
+            cursor: 上一頁返回的游標，None 表示第一頁
+            limit: 每頁筆數
+
+        Returns:
+            本頁發票（不載入項目）與下一頁游標
+
+        Raises:
+            InvalidCursorError: 游標無法解析或與排序不符
+        """
+        return self.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            order_by=INVOICE_LIST_ORDER,
+            conditions=self._filter_conditions(filters),
+        )
+
+    def count_matching(self, db: Session, *, filters: InvoiceFilter) -> int:
+        """按條件統計已保存的發票數量"""
+        return self.count(db, conditions=self._filter_conditions(filters))
+
+    def summarize_by_seller(
+        self, db: Session, *, filters: InvoiceFilter, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        按銷售方合計發票數量與金額（SQL GROUP BY）
+
+        Args:
+            db: 資料庫會話
+            filters: 查詢條件
+            limit: 返回的最大銷售方數
+
+        Returns:
+            各銷售方的合計，按價稅合計降序
+        """
+        if db is None:
+            return []
+        statement = self._seller_summary_statement(filters, limit)
+        return [self._totals_row(row) for row in db.execute(statement)]
+
+    def summarize_by_month(self, db: Session, *, filters: InvoiceFilter) -> List[Dict[str, Any]]:
+        """
+        按開票月份合計發票數量與金額（沒有開票日期的發票不計入）
+
+        Args:
+            db: 資料庫會話
+            filters: 查詢條件
+
+        Returns:
+            各月份的合計（month 為 YYYY-MM），按月份升序
+        """
+        if db is None:
+            return []
+        return [self._monthly_row(row) for row in db.execute(self._monthly_summary_statement(filters))]
+
+    def classify(self, db: Session, rows: Sequence[Dict[str, Any]]) -> List[str]:
+        """
+        將一批發票資料列分類為新增、重複或衝突
+
+        以發票號碼集合一次查出（超過 KEY_LOOKUP_CHUNK_SIZE 時分段）所有可能相同的已保存發票，
+        在內存中按唯一鍵比對，不逐筆查詢。同一批內唯一鍵相同的發票與先出現的一筆比對；
+        沒有發票號碼的發票無法判斷，一律視為新增。
+
+        Args:
+            db: 資料庫會話
+            rows: to_row 轉換後的資料列
+
+        Returns:
+            與 rows 順序一致的分類（SAVE_NEW、SAVE_DUPLICATE、SAVE_CONFLICT）
+        """
+        records = [
+            record
+            for statement in self._key_lookup_statements(rows)
+            for record in db.execute(statement)
+        ]
+        return self._classify_rows(rows, records)
+
+    def save_many_with_items(self, db: Session, *, invoices: List[InvoiceData]) -> SaveResult:
+        """
+        批量保存發票，跳過已保存的重複發票與唯一鍵衝突的發票（單一交易）
+
+        分類與寫入在同一交易中進行；其他請求並發寫入相同發票導致唯一索引衝突時，
+        回滾後重新分類一次。
+
+        Args:
+            db: 資料庫會話
+            invoices: 發票資料列表
+
+        Returns:
+            新增、重複與衝突的數量
+        """
+        if db is None or not invoices:
+            return SaveResult()
+
+        rows = [self.to_row(invoice) for invoice in invoices]
+        for attempt in range(2):
+            try:
+                statuses = self.classify(db, rows)
+                saved = self._insert_with_items(db, *self._new_only(rows, invoices, statuses))
+                db.commit()
+                return self._save_result(statuses, saved)
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+            except Exception as e:
+                db.rollback()
+                raise e
+
+    def create_many_with_items(self, db: Session, *, invoices: List[InvoiceData]) -> int:
+        """
+        批量建立發票及其項目（單一交易）
+
+        發票以一次 executemany INSERT ... RETURNING 寫入並取回 ID，
+        項目再以一次 executemany INSERT 寫入，避免逐筆 add/commit/refresh。
+
+        Args:
+            db: 資料庫會話
+            invoices: 發票資料列表
+
+        Returns:
+            寫入的發票數量
+        """
+        if db is None or not invoices:
+            return 0
+        try:
+            count = self._insert_with_items(
+                db, [self.to_row(invoice) for invoice in invoices], invoices
+            )
+            db.commit()
+            return count
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    def _insert_with_items(
+        self, db: Session, rows: List[Dict[str, Any]], invoices: List[InvoiceData]
+    ) -> int:
+        """寫入發票資料列及其項目（不提交），返回寫入的發票數量"""
+        invoice_insert = InvoiceInsert(db.get_bind().dialect, rows, invoices)
+        for statement, params in invoice_insert.statements():
+            invoice_insert.add(db.execute(statement, params))
+        return invoice_insert.saved
+
+
+class AsyncCRUDInvoice(InvoiceQueries, AsyncCRUDBase[Invoice, InvoiceData, InvoiceData]):
+    """發票異步 CRUD 操作（方法與參數同 CRUDInvoice）"""
+
+    async def search(
+        self,
+        db: AsyncSession,
+        *,
+        filters: InvoiceFilter,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Page[Invoice]:
+        """按條件游標分頁查詢已保存的發票"""
+        return await self.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            order_by=INVOICE_LIST_ORDER,
+            conditions=self._filter_conditions(filters),
+        )
+
+    async def count_matching(self, db: AsyncSession, *, filters: InvoiceFilter) -> int:
+        """按條件統計已保存的發票數量"""
+        return await self.count(db, conditions=self._filter_conditions(filters))
+
+    async def summarize_by_seller(
+        self, db: AsyncSession, *, filters: InvoiceFilter, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """按銷售方合計發票數量與金額"""
+        if db is None:
+            return []
+        result = await db.execute(self._seller_summary_statement(filters, limit))
+        return [self._totals_row(row) for row in result]
+
+    async def summarize_by_month(
+        self, db: AsyncSession, *, filters: InvoiceFilter
+    ) -> List[Dict[str, Any]]:
+        """按開票月份合計發票數量與金額"""
+        if db is None:
+            return []
+        result = await db.execute(self._monthly_summary_statement(filters))
+        return [self._monthly_row(row) for row in result]
+
+    async def classify(self, db: AsyncSession, rows: Sequence[Dict[str, Any]]) -> List[str]:
+        """將一批發票資料列分類為新增、重複或衝突"""
+        records = []
+        for statement in self._key_lookup_statements(rows):
+            records.extend(await db.execute(statement))
+        return self._classify_rows(rows, records)
+
+    async def save_many_with_items(
+        self, db: AsyncSession, *, invoices: List[InvoiceData]
+    ) -> SaveResult:
+        """批量保存發票，跳過已保存的重複發票與唯一鍵衝突的發票（單一交易）"""
+        if db is None or not invoices:
+            return SaveResult()
+
+        rows = [self.to_row(invoice) for invoice in invoices]
+        for attempt in range(2):
+            try:
+                statuses = await self.classify(db, rows)
+                saved = await self._insert_with_items(db, *self._new_only(rows, invoices, statuses))
+                await db.commit()
+                return self._save_result(statuses, saved)
+            except IntegrityError:
+                await db.rollback()
+                if attempt:
+                    raise
+            except Exception as e:
+                await db.rollback()
+                raise e
+
+    async def _insert_with_items(
+        self, db: AsyncSession, rows: List[Dict[str, Any]], invoices: List[InvoiceData]
+    ) -> int:
+        """寫入發票資料列及其項目（不提交），返回寫入的發票數量"""
+        invoice_insert = InvoiceInsert(db.get_bind().dialect, rows, invoices)
+        for statement, params in invoice_insert.statements():
+            invoice_insert.add(await db.execute(statement, params))
+        return invoice_insert.saved
+
+
+crud_invoice = CRUDInvoice(Invoice)
+async_crud_invoice = AsyncCRUDInvoice(Invoice)
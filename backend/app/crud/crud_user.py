@@ -1,11 +1,25 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.crud.crud_base import CRUDBase
+from starlette.concurrency import run_in_threadpool
+from app.crud.crud_base import AsyncCRUDBase, CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash
 
 
+def _user_row(obj_in: UserCreate, hashed_password: str) -> Dict[str, Any]:
+    """批量建立使用者的資料列"""
+    return {
+        "username": obj_in.username,
+        "email": obj_in.email,
+        "hashed_password": hashed_password,
+        "is_active": True,
+        "is_superuser": False,
+    }
+
+
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     """使用者 CRUD 操作"""
 
@@ -40,6 +54,13 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             update_data["hashed_password"] = hashed_password
         return super().update(db, db_obj=db_obj, obj_in=update_data)
 
+    def create_many(
+        self, db: Session, *, objs_in: Sequence[UserCreate], batch_size: Optional[int] = None
+    ) -> List[User]:
+        """批量建立使用者（單一交易）"""
+        rows = [_user_row(obj_in, get_password_hash(obj_in.password)) for obj_in in objs_in]
+        return super().create_many(db, objs_in=rows, batch_size=batch_size)
+
     def authenticate(self, db: Session, *, username: str, password: str) -> Optional[User]:
         """驗證使用者"""
         from app.core.security import verify_password
@@ -60,4 +81,53 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return user.is_superuser
 
 
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    """使用者異步 CRUD 操作"""
+
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        """根據電子郵件獲取使用者"""
+        return await db.scalar(select(User).where(User.email == email))
+
+    async def get_by_username(self, db: AsyncSession, *, username: str) -> Optional[User]:
+        """根據使用者名稱獲取使用者"""
+        return await db.scalar(select(User).where(User.username == username))
+
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+        """建立使用者"""
+        # bcrypt 雜湊為 CPU 密集操作，移至執行緒池避免阻塞事件循環
+        hashed_password = await run_in_threadpool(get_password_hash, obj_in.password)
+        db_obj = User(
+            username=obj_in.username,
+            email=obj_in.email,
+            hashed_password=hashed_password,
+            is_active=True,
+            is_superuser=False,
+        )
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def update(self, db: AsyncSession, *, db_obj: User, obj_in: UserUpdate) -> User:
+        """更新使用者"""
+        update_data = obj_in.model_dump(exclude_unset=True)
+        if "password" in update_data:
+            hashed_password = await run_in_threadpool(get_password_hash, update_data["password"])
+            del update_data["password"]
+            update_data["hashed_password"] = hashed_password
+        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+
+    async def create_many(
+        self, db: AsyncSession, *, objs_in: Sequence[UserCreate], batch_size: Optional[int] = None
+    ) -> List[User]:
+        """批量建立使用者（單一交易）"""
+        # 密碼雜湊一次移至執行緒池，避免逐筆阻塞事件循環
+        hashed_passwords = await run_in_threadpool(
+            lambda: [get_password_hash(obj_in.password) for obj_in in objs_in]
+        )
+        rows = [_user_row(obj_in, hashed) for obj_in, hashed in zip(objs_in, hashed_passwords)]
+        return await super().create_many(db, objs_in=rows, batch_size=batch_size)
+
+
 crud_user = CRUDUser(User)
+async_crud_user = AsyncCRUDUser(User)
@@ -1,8 +1,12 @@
+import time
+from prometheus_client.core import GaugeMetricFamily
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_IN_USE, registry
 
 # 建立基礎模型類別
 Base = declarative_base()
@@ -11,6 +15,71 @@ Base = declarative_base()
 engine = None
 SessionLocal = None
 
+# 異步資料庫引擎和會話工廠（延遲初始化）
+async_engine = None
+AsyncSessionLocal = None
+
+
+class _CheckoutTimingMixin:
+    """記錄從連接池取得連接的等待時間（含連接池耗盡時的排隊時間）"""
+
+    engine_label = ""
+
+    def _do_get(self):
+        start_time = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.engine_label).observe(time.perf_counter() - start_time)
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """記錄等待時間的同步連接池"""
+
+    engine_label = "sync"
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """記錄等待時間的異步連接池"""
+
+    engine_label = "async"
+
+
+def _instrument_pool(sync_engine, label: str) -> None:
+    """以借出 / 歸還事件統計使用中的連接數"""
+    in_use = DB_POOL_IN_USE.labels(label)
+    event.listen(sync_engine, "checkout", lambda *args: in_use.inc())
+    event.listen(sync_engine, "checkin", lambda *args: in_use.dec())
+
+
+class PoolStatsCollector:
+    """輸出指標時讀取連接池容量與溢出連接數（僅 QueuePool 提供）"""
+
+    def collect(self):
+        family = GaugeMetricFamily("db_pool_size", "連接池容量與溢出連接數", labels=("engine", "kind"))
+        for label, current in (("sync", engine), ("async", async_engine and async_engine.sync_engine)):
+            pool = getattr(current, "pool", None)
+            if isinstance(pool, QueuePool):
+                family.add_metric((label, "size"), pool.size())
+                family.add_metric((label, "overflow"), max(pool.overflow(), 0))
+        yield family
+
+
+registry.register(PoolStatsCollector())
+
+
+def _pool_options() -> dict:
+    """連接池配置（MSSQL 使用 QueuePool，SQLite 使用預設連接池）"""
+    if settings.is_sqlite:
+        return {}
+    return {
+        "pool_pre_ping": True,  # 連線池預檢查，自動重連斷開的連接
+        "pool_size": 10,  # 連線池大小
+        "max_overflow": 20,  # 超過連線池大小外最多建立的連線
+        "pool_recycle": 3600,  # 連接回收時間（秒），避免長時間連接問題
+        "pool_timeout": 30,  # 獲取連接的超時時間（秒）
+    }
+
 
 def init_database():
     """
@@ -23,22 +92,26 @@ def init_database():
         return
 
     # 建立資料庫引擎（優化配置）
-    engine = create_engine(
-        settings.database_url,
-        echo=settings.DEBUG,
-        # 連接池配置
-        poolclass=QueuePool,
-        pool_pre_ping=True,  # 連線池預檢查，自動重連斷開的連接
-        pool_size=10,  # 連線池大小
-        max_overflow=20,  # 超過連線池大小外最多建立的連線
-        pool_recycle=3600,  # 連接回收時間（秒），避免長時間連接問題
-        pool_timeout=30,  # 獲取連接的超時時間（秒）
-        # 性能優化
-        connect_args={
-            "timeout": 10,  # 連接超時
-            "autocommit": False,
-        },
-    )
+    if settings.is_sqlite:
+        engine = create_engine(
+            settings.database_url,
+            echo=settings.DEBUG,
+            connect_args={"check_same_thread": False},  # 允許執行緒池中的請求共用連接
+        )
+    else:
+        engine = create_engine(
+            settings.database_url,
+            echo=settings.DEBUG,
+            # 連接池配置
+            poolclass=InstrumentedQueuePool,
+            **_pool_options(),
+            fast_executemany=True,  # pyodbc 批量參數綁定，大幅加速 executemany 寫入
+            # 性能優化
+            connect_args={
+                "timeout": 10,  # 連接超時
+                "autocommit": False,
+            },
+        )
 
     # 建立會話工廠
     SessionLocal = sessionmaker(
@@ -49,10 +122,18 @@ def init_database():
     )
 
     # 添加連接池事件監聽
-    @event.listens_for(engine, "connect")
-    def set_sqlite_pragma(dbapi_conn, connection_record):
-        """連接時設置參數（可選）"""
-        pass
+    event.listen(engine, "connect", set_sqlite_pragma)
+    _instrument_pool(engine, "sync")
+
+
+def set_sqlite_pragma(dbapi_conn, connection_record):
+    """連接時設置參數（SQLite 啟用外鍵約束與 WAL 模式）"""
+    if not settings.is_sqlite:
+        return
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
 
 
 def get_db():
@@ -81,6 +162,64 @@ def get_db():
         db.close()
 
 
+def init_async_database():
+    """
+    初始化異步資料庫連接
+    MSSQL 使用 aioodbc，SQLite 使用 aiosqlite
+    """
+    global async_engine, AsyncSessionLocal
+
+    if async_engine is not None:
+        return
+
+    pool_options = _pool_options()
+    if pool_options:
+        pool_options["poolclass"] = InstrumentedAsyncQueuePool
+    async_engine = create_async_engine(
+        settings.async_database_url,
+        echo=settings.DEBUG,
+        **pool_options,
+    )
+
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
+    _instrument_pool(async_engine.sync_engine, "async")
+
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,  # 提交後不過期對象，避免異步環境下的隱式延遲載入
+    )
+
+
+async def get_async_db():
+    """
+    獲取異步資料庫會話
+    用於依賴注入，請求處理不佔用執行緒池
+    """
+    if AsyncSessionLocal is None:
+        try:
+            init_async_database()
+        except Exception as e:
+            # 如果資料庫連接失敗，返回 None（與 get_db 行為一致）
+            print(f"異步資料庫連接失敗: {str(e)}")
+            yield None
+            return
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def close_async_database():
+    """釋放異步資料庫連接池"""
+    global async_engine, AsyncSessionLocal
+
+    if async_engine is not None:
+        await async_engine.dispose()
+    async_engine = None
+    AsyncSessionLocal = None
+
+
 def init_db():
     """
     初始化資料庫
@@ -94,7 +233,7 @@ def init_db():
         init_database()
         if engine is None:
             return
-        from app.models import user  # noqa: F401
+        from app.models import user, invoice  # noqa: F401
         
         # 檢查表是否已存在
         from sqlalchemy import inspect
@@ -3,10 +3,16 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from app.config import settings
 from app.api.router import api_router
+from app.api.endpoints import metrics
 from app.middleware.logging import LoggingMiddleware
 from app.middleware.cors import setup_cors
 from app.middleware.rate_limit import RateLimitMiddleware
+from app.core.cache import cache_service
 from app.core.exceptions import CustomException
+from app.core.rate_limiter import create_rate_limit_store
+from app.database import close_async_database
+from app.services.ai_service import ai_service
+from app.services.job_service import job_service
 
 # 建立 FastAPI 應用程式實例
 app = FastAPI(
@@ -21,11 +27,18 @@ app = FastAPI(
 # 配置 CORS 中介軟體
 setup_cors(app)
 
-# 新增日誌中介軟體（最外層，最後執行）
-app.add_middleware(LoggingMiddleware)
+# 新增請求限流中介軟體（在日誌中介軟體之內，被拒絕的請求同樣記錄日誌與耗時指標）
+rate_limit_store = create_rate_limit_store() if settings.RATE_LIMIT_ENABLED else None
+if rate_limit_store is not None:
+    app.add_middleware(
+        RateLimitMiddleware,
+        requests_per_minute=settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+        route_costs=settings.RATE_LIMIT_ROUTE_COSTS,
+        store=rate_limit_store,
+    )
 
-# 新增請求限流中介軟體（在日誌中間件之前）
-app.add_middleware(RateLimitMiddleware, requests_per_minute=60)
+# 新增日誌中介軟體（最後註冊者位於最外層，最先接收請求）
+app.add_middleware(LoggingMiddleware)
 
 
 # 自訂異常處理
@@ -39,6 +52,7 @@ async def custom_exception_handler(request: Request, exc: CustomException):
             "message": exc.detail,
             "data": None,
         },
+        headers=exc.headers,
     )
 
 
@@ -71,6 +85,10 @@ async def global_exception_handler(request: Request, exc: Exception):
 # 註冊 API 路由
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
+# 註冊 Prometheus 指標端點（根路徑 /metrics）
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["監控"])
+
 
 # # 根路徑
 # @app.get("/", tags=["根路徑"])
@@ -96,12 +114,19 @@ async def startup_event():
     """應用啟動時執行"""
     print(f"{settings.APP_NAME} v{settings.APP_VERSION} 啟動成功！")
     print(f"Swagger 文件地址: http://localhost:{settings.PORT}{settings.API_PREFIX}/docs")
+    job_service.start()
 
 
 # 關閉事件
 @app.on_event("shutdown")
 async def shutdown_event():
     """應用關閉時執行"""
+    await job_service.stop()
+    await cache_service.close()
+    if rate_limit_store is not None:
+        await rate_limit_store.close()
+    await ai_service.recognition_cache.close()
+    await close_async_database()
     print(f"{settings.APP_NAME} 已關閉")
 
 
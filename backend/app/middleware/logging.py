@@ -1,7 +1,10 @@
 import time
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Callable, Dict
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import HTTP_REQUEST_DURATION
+from app.utils.performance import span
 
 # 配置日誌
 logging.basicConfig(
@@ -12,33 +15,82 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+class LoggingMiddleware:
     """
-    日誌中介軟體
-    記錄每個請求的詳細資訊
+    日誌中介軟體（純 ASGI）
+    記錄每個請求的詳細資訊，並按路由模板（而非實際路徑，避免標籤數量無界）
+    與狀態碼記錄請求耗時指標
+
+    直接包裝 send 在回應開始時加入 X-Process-Time 標頭，不經 BaseHTTPMiddleware 的
+    額外任務與記憶體串流轉發，流式回應逐段直達客戶端；
+    請求耗時指標與完成日誌以回應主體全部送出為準。
     """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # 端點函數 -> 路由模板（首次遇到未知端點時重建）
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _route_label(self, scope: Scope) -> str:
+        """獲取請求匹配的路由模板，未匹配任何路由時返回 unmatched"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            self._route_paths = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+            path = self._route_paths.get(endpoint, "unmatched")
+        return path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # 記錄請求開始時間
-        start_time = time.time()
+        start_time = time.perf_counter()
+        method, path = scope["method"], scope["path"]
 
         # 記錄請求資訊
-        logger.info(f"請求開始: {request.method} {request.url.path}")
-        logger.debug(f"請求標頭: {request.headers}")
+        logger.info(f"請求開始: {method} {path}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"請求標頭: {Headers(scope=scope)}")
+
+        status_code = 500
 
-        # 處理請求
-        response = await call_next(request)
+        # 處理請求（請求 span 為本次 trace 的根 span，下游的 span 自動成為其子 span）
+        with span("http.request", method=method, path=path) as request_span:
 
-        # 計算處理時間
-        process_time = time.time() - start_time
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    # 新增處理時間（至回應開始）到回應標頭
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception:
+                HTTP_REQUEST_DURATION.labels(
+                    method, self._route_label(scope), 500
+                ).observe(time.perf_counter() - start_time)
+                raise
+
+            # 計算處理時間
+            process_time = time.perf_counter() - start_time
+            route = self._route_label(scope)
+            request_span.set_attribute("route", route)
+            request_span.set_attribute("status_code", status_code)
+            HTTP_REQUEST_DURATION.labels(method, route, status_code).observe(process_time)
 
         # 記錄回應資訊
         logger.info(
-            f"請求完成: {request.method} {request.url.path} - "
-            f"狀態碼: {response.status_code} - 耗時: {process_time:.3f}s"
+            f"請求完成: {method} {path} - "
+            f"狀態碼: {status_code} - 耗時: {process_time:.3f}s"
         )
-
-        # 新增處理時間到回應標頭
-        response.headers["X-Process-Time"] = str(process_time)
-
-        return response
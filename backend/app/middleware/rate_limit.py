@@ -1,52 +1,105 @@
 """請求限流中間件"""
-import time
-from collections import defaultdict
-from typing import Dict, Tuple
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+import math
+from typing import Dict, List, Optional, Tuple
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.rate_limiter import GCRARateLimiter, RateLimitResult, RateLimitStore
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
     """
-    請求限流中間件
-    基於 IP 地址的簡單限流實現
+    請求限流中間件（純 ASGI）
+    基於 IP 地址的 GCRA 限流，不同路由按各自的消耗量計算；
+    放行的請求在回應開始時加入限流狀態標頭，不轉發回應主體
     """
 
-    def __init__(self, app, requests_per_minute: int = 60):
+    def __init__(
+        self,
+        app: ASGIApp,
+        requests_per_minute: int = 60,
+        route_costs: Optional[Dict[str, float]] = None,
+        store: Optional[RateLimitStore] = None,
+    ):
         """
         初始化限流中間件
 
         Args:
             app: FastAPI 應用
-            requests_per_minute: 每分鐘允許的請求數
+            requests_per_minute: 每分鐘允許的請求單位數
+            route_costs: 路由消耗量，鍵為路徑前綴或「方法 路徑前綴」，
+                例如 {"/api/invoice/health": 0, "POST /api/invoice/jobs": 5}；
+                未匹配的路由消耗 1，消耗 0 表示不限流
+            store: 限流狀態儲存後端，多 worker 部署時須使用共享儲存（Redis 或檔案）
         """
-        super().__init__(app)
+        self.app = app
         self.requests_per_minute = requests_per_minute
-        self.requests: Dict[str, list[float]] = defaultdict(list)
+        self.limiter = GCRARateLimiter(limit=requests_per_minute, period=60.0, store=store)
+        self.route_costs = self._parse_route_costs(route_costs or {})
 
-    async def dispatch(self, request: Request, call_next):
+    @staticmethod
+    def _parse_route_costs(route_costs: Dict[str, float]) -> List[Tuple[Optional[str], str, float]]:
+        """解析路由消耗量規則，按路徑前綴長度由長到短排序（最長匹配優先）"""
+        rules = []
+        for route, cost in route_costs.items():
+            method, _, prefix = route.strip().rpartition(" ")
+            rules.append((method.upper() or None, prefix, float(cost)))
+        return sorted(rules, key=lambda rule: (len(rule[1]), rule[0] is not None), reverse=True)
+
+    def get_cost(self, method: str, path: str) -> float:
+        """獲取請求的消耗量（前綴按路徑段匹配，/api/invoice 不匹配 /api/invoices）"""
+        for rule_method, prefix, cost in self.route_costs:
+            if rule_method not in (None, method):
+                continue
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return cost
+        return 1.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """處理請求"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cost = self.get_cost(scope["method"], scope["path"])
+        if cost <= 0:
+            await self.app(scope, receive, send)
+            return
+
         # 獲取客戶端 IP
-        client_ip = request.client.host if request.client else "unknown"
-
-        # 清理過期的請求記錄
-        current_time = time.time()
-        self.requests[client_ip] = [
-            req_time
-            for req_time in self.requests[client_ip]
-            if current_time - req_time < 60
-        ]
-
-        # 檢查是否超過限制
-        if len(self.requests[client_ip]) >= self.requests_per_minute:
-            raise HTTPException(
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+
+        result = await self.limiter.hit(client_ip, cost)
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"請求過於頻繁，每分鐘最多 {self.requests_per_minute} 次請求"
+                content={
+                    "code": status.HTTP_429_TOO_MANY_REQUESTS,
+                    "message": f"請求過於頻繁，請 {retry_after} 秒後重試",
+                    "data": None,
+                },
+                headers={"Retry-After": str(retry_after), **self._limit_headers(result)},
             )
+            await response(scope, receive, send)
+            return
+
+        limit_headers = self._limit_headers(result)
 
-        # 記錄本次請求
-        self.requests[client_ip].append(current_time)
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(limit_headers)
+            await send(message)
 
         # 處理請求
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _limit_headers(result: RateLimitResult) -> Dict[str, str]:
+        """限流狀態回應標頭"""
+        return {
+            "X-RateLimit-Limit": str(result.limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+        }
@@ -1,3 +1,4 @@
 from app.models.user import User
+from app.models.invoice import Invoice, InvoiceItem
 
-__all__ = ["User"]
+__all__ = ["User", "Invoice", "InvoiceItem"]
@@ -0,0 +1,89 @@
+from sqlalchemy import Column, Integer, String, Unicode, Numeric, Date, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Invoice(Base):
+    """發票模型"""
+
+    __tablename__ = "invoices"
+    __table_args__ = (
+        # 同一銷售方的發票代碼 + 號碼唯一；未識別出號碼的發票無法判斷是否重複，不納入索引
+        Index(
+            "uq_invoices_number_code_seller",
+            "invoice_number",
+            "invoice_code",
+            "seller_tax_id",
+            unique=True,
+            mssql_where=text("invoice_number <> ''"),
+            sqlite_where=text("invoice_number <> ''"),
+        ),
+        # 查詢與統計：按日期範圍（並按日期、ID 排序）、按銷售方或購買方稅號 + 日期範圍篩選。
+        # 日期與銷售方索引尾部帶上金額欄位，計數、金額篩選與合計只讀索引不需回表
+        Index(
+            "ix_invoices_date_amounts",
+            "invoice_date",
+            "id",
+            "seller_tax_id",
+            "amount",
+            "tax_amount",
+            "total_amount",
+        ),
+        Index(
+            "ix_invoices_seller_date_amounts",
+            "seller_tax_id",
+            "invoice_date",
+            "amount",
+            "tax_amount",
+            "total_amount",
+        ),
+        Index("ix_invoices_buyer_tax_id_invoice_date", "buyer_tax_id", "invoice_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    invoice_number = Column(String(50), nullable=False, default="", comment="發票號碼")
+    invoice_code = Column(String(50), nullable=False, default="", comment="發票代碼")
+    invoice_date = Column(Date, nullable=True, comment="開票日期")
+    amount = Column(Numeric(18, 2), nullable=True, comment="金額")
+    tax_amount = Column(Numeric(18, 2), nullable=True, comment="稅額")
+    total_amount = Column(Numeric(18, 2), nullable=True, comment="價稅合計")
+    seller = Column(Unicode(200), nullable=False, default="", comment="銷售方名稱")
+    seller_tax_id = Column(String(50), nullable=False, default="", comment="銷售方納稅人識別號")
+    buyer = Column(Unicode(200), nullable=False, default="", comment="購買方名稱")
+    buyer_tax_id = Column(String(50), nullable=False, default="", comment="購買方納稅人識別號")
+    remarks = Column(Unicode(500), nullable=False, default="", comment="備註")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="建立時間")
+
+    items = relationship(
+        "InvoiceItem",
+        back_populates="invoice",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    def __repr__(self):
+        return f"<Invoice(id={self.id}, invoice_number={self.invoice_number})>"
+
+
+class InvoiceItem(Base):
+    """發票項目模型"""
+
+    __tablename__ = "invoice_items"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    invoice_id = Column(
+        Integer,
+        ForeignKey("invoices.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+        comment="所屬發票 ID",
+    )
+    name = Column(Unicode(200), nullable=False, default="", comment="項目名稱")
+    quantity = Column(String(50), nullable=False, default="", comment="數量")
+    price = Column(String(50), nullable=False, default="", comment="價格")
+
+    invoice = relationship("Invoice", back_populates="items")
+
+    def __repr__(self):
+        return f"<InvoiceItem(id={self.id}, name={self.name})>"
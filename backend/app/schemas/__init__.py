@@ -3,8 +3,12 @@ from app.schemas.invoice import (
     InvoiceItem,
     InvoiceData,
     RecognizeRequest,
+    BatchRecognizeRequest,
     SaveInvoicesRequest,
     RecognizeResponse,
+    BatchRecognizeItem,
+    BatchRecognizeResponse,
+    RecognizeJobResponse,
     SaveResponse,
 )
 
@@ -18,7 +22,11 @@ __all__ = [
     "InvoiceItem",
     "InvoiceData",
     "RecognizeRequest",
+    "BatchRecognizeRequest",
     "SaveInvoicesRequest",
     "RecognizeResponse",
+    "BatchRecognizeItem",
+    "BatchRecognizeResponse",
+    "RecognizeJobResponse",
     "SaveResponse",
 ]
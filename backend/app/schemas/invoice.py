@@ -1,5 +1,8 @@
+from datetime import date as Date, datetime
+from decimal import Decimal
 from typing import List, Optional
 from pydantic import BaseModel, Field
+from app.core.response import PaginatedResponse
 
 
 # 發票項目模型
@@ -27,6 +30,9 @@ class InvoiceData(BaseModel):
     buyerTaxId: str = Field(..., description="購買方納稅人識別號")
     remarks: str = Field(..., description="備註")
     items: List[InvoiceItem] = Field(default_factory=list, description="項目列表")
+    duplicateOf: Optional[str] = Field(
+        None, description="疑似重複上傳：同一使用者先前相似圖片的識別結果 ID"
+    )
 
 
 # 請求模型
@@ -35,11 +41,26 @@ class RecognizeRequest(BaseModel):
     image: str = Field(..., description="Base64 編碼的圖片")
 
 
+class BatchRecognizeRequest(BaseModel):
+    """批量識別發票請求"""
+    images: List[str] = Field(..., min_length=1, description="Base64 編碼的圖片列表")
+
+
 class SaveInvoicesRequest(BaseModel):
     """保存發票請求"""
     invoices: List[InvoiceData] = Field(..., description="發票資料列表")
 
 
+class InvoiceFilter(BaseModel):
+    """已保存發票的查詢條件（均為選填，多個條件同時生效）"""
+    date_from: Optional[Date] = Field(None, description="開票日期起（含）")
+    date_to: Optional[Date] = Field(None, description="開票日期迄（含）")
+    seller_tax_id: Optional[str] = Field(None, description="銷售方納稅人識別號")
+    buyer_tax_id: Optional[str] = Field(None, description="購買方納稅人識別號")
+    min_amount: Optional[Decimal] = Field(None, description="價稅合計下限（含）")
+    max_amount: Optional[Decimal] = Field(None, description="價稅合計上限（含）")
+
+
 # 響應模型
 class RecognizeResponse(BaseModel):
     """識別發票響應"""
@@ -48,7 +69,99 @@ class RecognizeResponse(BaseModel):
     message: Optional[str] = Field(None, description="提示訊息")
 
 
+class BatchRecognizeItem(BaseModel):
+    """單張圖片的批量識別結果"""
+    index: int = Field(..., description="圖片在請求中的索引")
+    success: bool = Field(..., description="是否成功")
+    data: Optional[InvoiceData] = Field(None, description="識別的發票資料")
+    message: Optional[str] = Field(None, description="提示訊息")
+
+
+class BatchRecognizeResponse(BaseModel):
+    """批量識別發票響應"""
+    success: bool = Field(..., description="是否全部成功")
+    data: List[BatchRecognizeItem] = Field(default_factory=list, description="每張圖片的識別結果")
+    total: int = Field(0, description="圖片總數")
+    succeeded: int = Field(0, description="成功數量")
+    failed: int = Field(0, description="失敗數量")
+    message: Optional[str] = Field(None, description="提示訊息")
+
+
+class RecognizeJobResponse(BaseModel):
+    """識別任務響應"""
+    success: bool = Field(..., description="是否成功")
+    job_id: str = Field(..., description="任務 ID")
+    status: str = Field(..., description="任務狀態：pending、running、succeeded、failed")
+    data: Optional[InvoiceData] = Field(None, description="識別的發票資料（任務成功後返回）")
+    message: Optional[str] = Field(None, description="提示訊息")
+
+
 class SaveResponse(BaseModel):
     """保存發票響應"""
     success: bool = Field(..., description="是否成功")
+    saved: int = Field(0, description="新保存的發票數量")
+    duplicates: int = Field(0, description="已保存過、內容相同而略過的發票數量")
+    conflicts: int = Field(0, description="發票代碼、號碼與銷售方稅號相同但內容不同而略過的發票數量")
     message: Optional[str] = Field(None, description="提示訊息")
+
+
+# 已保存發票的查詢結果
+class InvoiceRecord(BaseModel):
+    """已保存的發票（不含項目）"""
+    id: int = Field(..., description="發票 ID")
+    invoiceNumber: str = Field(..., validation_alias="invoice_number", description="發票號碼")
+    invoiceCode: str = Field(..., validation_alias="invoice_code", description="發票代碼")
+    date: Optional[Date] = Field(None, validation_alias="invoice_date", description="開票日期")
+    amount: Optional[Decimal] = Field(None, description="金額")
+    taxAmount: Optional[Decimal] = Field(None, validation_alias="tax_amount", description="稅額")
+    totalAmount: Optional[Decimal] = Field(None, validation_alias="total_amount", description="價稅合計")
+    seller: str = Field(..., description="銷售方名稱")
+    sellerTaxId: str = Field(..., validation_alias="seller_tax_id", description="銷售方納稅人識別號")
+    buyer: str = Field(..., description="購買方名稱")
+    buyerTaxId: str = Field(..., validation_alias="buyer_tax_id", description="購買方納稅人識別號")
+    remarks: str = Field(..., description="備註")
+    createdAt: Optional[datetime] = Field(None, validation_alias="created_at", description="建立時間")
+
+    class Config:
+        from_attributes = True
+
+
+class InvoiceTotals(BaseModel):
+    """發票金額合計"""
+    count: int = Field(..., description="發票數量")
+    amount: Decimal = Field(Decimal("0"), description="金額合計")
+    taxAmount: Decimal = Field(Decimal("0"), validation_alias="tax_amount", description="稅額合計")
+    totalAmount: Decimal = Field(Decimal("0"), validation_alias="total_amount", description="價稅合計")
+
+    class Config:
+        from_attributes = True
+
+
+class SellerSummary(InvoiceTotals):
+    """單一銷售方的發票合計"""
+    sellerTaxId: str = Field(..., validation_alias="seller_tax_id", description="銷售方納稅人識別號")
+    seller: str = Field(..., description="銷售方名稱")
+
+
+class MonthlySummary(InvoiceTotals):
+    """單一月份的發票合計"""
+    month: str = Field(..., description="月份（YYYY-MM）")
+
+
+class InvoiceListResponse(PaginatedResponse):
+    """已保存發票清單響應（游標分頁）"""
+    data: List[InvoiceRecord] = Field(default_factory=list, description="發票清單")
+
+
+class SellerSummaryResponse(BaseModel):
+    """按銷售方合計響應"""
+    code: int = Field(200, description="回應代碼")
+    message: str = Field("查詢成功", description="回應訊息")
+    data: List[SellerSummary] = Field(default_factory=list, description="各銷售方合計（按價稅合計降序）")
+
+
+class MonthlySummaryResponse(BaseModel):
+    """按月合計響應"""
+    code: int = Field(200, description="回應代碼")
+    message: str = Field("查詢成功", description="回應訊息")
+    data: List[MonthlySummary] = Field(default_factory=list, description="各月份合計（按月份升序）")
@@ -1,5 +1,8 @@
 """服務層模組"""
 from app.services.invoice_service import InvoiceService
 from app.services.ai_service import AIService
+from app.services.job_service import RecognitionJobService
+from app.services.quota_service import QuotaService
+from app.services.duplicate_service import DuplicateService
 
-__all__ = ["InvoiceService", "AIService"]
+__all__ = ["InvoiceService", "AIService", "RecognitionJobService", "QuotaService", "DuplicateService"]
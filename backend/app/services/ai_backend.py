@@ -0,0 +1,274 @@
+"""AI 後端模組 - 單一 OpenAI 相容後端的客戶端、容錯與延遲統計"""
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+from openai import AsyncOpenAI
+from app.config import settings
+from app.core.metrics import AI_REQUEST_DURATION, AI_TOKENS
+from app.core.resilience import AdaptiveConcurrencyLimiter, CircuitBreaker, ServiceUnavailableError
+from app.utils.performance import span
+
+# 計算 p95 延遲時保留的最近樣本數
+LATENCY_WINDOW_SIZE = 100
+
+# 為 True 時等待並發名額不設超時（隨 contextvars 傳遞到其中建立的 asyncio 任務）
+_unbounded_queueing: ContextVar[bool] = ContextVar("ai_unbounded_queueing", default=False)
+
+
+@contextmanager
+def unbounded_queueing() -> Iterator[None]:
+    """
+    在此上下文中調用 AI 後端時，排隊等待並發名額不設超時
+
+    批量識別與後台任務一次提交的圖片數可能遠超並發上限，排隊屬正常情況，
+    不應因 AI_ACQUIRE_TIMEOUT_SECONDS 而失敗；只有熔斷時仍快速失敗。
+    """
+    token = _unbounded_queueing.set(True)
+    try:
+        yield
+    finally:
+        _unbounded_queueing.reset(token)
+
+
+class AIBackend:
+    """單一 AI 後端：OpenAI 相容客戶端 + 熔斷器 + 自適應並發限制 + 延遲統計"""
+
+    def __init__(
+        self,
+        name: str,
+        client: AsyncOpenAI,
+        model: str,
+        weight: float = 1.0,
+        high_detail: bool = False,
+    ):
+        """
+        初始化 AI 後端
+
+        Args:
+            name: 後端名稱（"openai" 或 "ollama"）
+            client: OpenAI 相容的異步客戶端
+            model: 模型名稱
+            weight: 路由權重，越大越常被選為主要後端
+            high_detail: 是否使用高解析度圖片模式與 JSON mode（OpenAI 專用參數）
+        """
+        self.name = name
+        self.client = client
+        self.model = model
+        self.weight = weight
+        self.high_detail = high_detail
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW_SIZE)
+
+        # 熔斷器：後端持續失敗時快速失敗，避免請求堆積
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=settings.AI_CIRCUIT_FAILURE_THRESHOLD,
+            recovery_seconds=settings.AI_CIRCUIT_RECOVERY_SECONDS,
+        )
+        # 自適應並發限制：延遲或錯誤升高時自動收縮該後端的並發調用數
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=settings.AI_MAX_CONCURRENCY,
+            min_limit=settings.AI_CONCURRENCY_MIN,
+            max_limit=settings.AI_CONCURRENCY_MAX,
+            latency_threshold=settings.AI_LATENCY_THRESHOLD_SECONDS,
+        )
+
+    @classmethod
+    def from_settings(cls, name: str, weight: float = 1.0) -> "AIBackend":
+        """
+        根據配置建立後端
+
+        Args:
+            name: 後端名稱（"openai" 或 "ollama"）
+            weight: 路由權重
+        """
+        name = name.lower()
+        if name == "ollama":
+            # 使用 Ollama（本地模型）
+            client = AsyncOpenAI(
+                base_url=settings.OLLAMA_BASE_URL,
+                api_key="ollama"  # Ollama 不需要真正的 API key
+            )
+            return cls(name, client, settings.OLLAMA_MODEL, weight=weight)
+
+        # 使用 OpenAI（預設）
+        client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL if settings.OPENAI_BASE_URL else None
+        )
+        return cls("openai", client, settings.OPENAI_MODEL, weight=weight, high_detail=True)
+
+    def build_params(self, prompt: str, image_url: str) -> Dict[str, Any]:
+        """
+        構建 chat completion 請求參數
+
+        改進點：
+        1. 增加 max_tokens（處理複雜發票）
+        2. 使用更低的 temperature（提高準確性）
+        3. 添加高解析度模式（GPT-4o）
+        """
+        image_content: Dict[str, Any] = {"url": image_url}
+        if self.high_detail:
+            image_content["detail"] = "high"  # 高解析度模式，提高識別準確度
+
+        params = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": image_content},
+                    ]
+                }
+            ],
+            "max_tokens": 2000,  # 增加 token 限制，處理複雜發票
+            "temperature": 0.1,  # 降低溫度，提高準確性和一致性
+        }
+
+        if self.high_detail:
+            params["timeout"] = 60.0  # 60秒超時
+            # GPT-4o 支持 JSON mode
+            if "gpt-4o" in self.model.lower():
+                params["response_format"] = {"type": "json_object"}
+
+        return params
+
+    def is_available(self) -> bool:
+        """後端是否可接受請求（熔斷器未處於拒絕狀態）"""
+        return self.circuit_breaker.is_available()
+
+    def p95_latency(self) -> Optional[float]:
+        """最近調用的 p95 延遲（秒），尚無樣本時返回 None"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.95) - 1)]
+
+    async def _acquire(self) -> None:
+        """
+        通過熔斷器並獲取並發名額
+
+        在 unbounded_queueing() 上下文中不限排隊時間，否則最多等待 AI_ACQUIRE_TIMEOUT_SECONDS
+
+        Raises:
+            ServiceUnavailableError: 熔斷中或排隊等待超時
+        """
+        if not self.circuit_breaker.allow_request():
+            retry_after = self.circuit_breaker.retry_after()
+            raise ServiceUnavailableError(
+                f"AI 服務暫時不可用（熔斷中），請 {max(1, math.ceil(retry_after))} 秒後重試",
+                retry_after=retry_after,
+            )
+
+        try:
+            timeout = None if _unbounded_queueing.get() else settings.AI_ACQUIRE_TIMEOUT_SECONDS
+            await self.limiter.acquire(timeout=timeout)
+        except BaseException:
+            self.circuit_breaker.cancel_request()
+            raise
+
+    async def create_completion(self, params: Dict[str, Any]) -> Any:
+        """
+        經熔斷器與自適應並發限制器調用後端
+
+        Raises:
+            ServiceUnavailableError: 熔斷中或排隊等待超時
+        """
+        # 包含排隊等待並發名額的時間；對沖落敗被取消時標記為 CancelledError
+        with span("ai.backend_call", backend=self.name, model=self.model):
+            await self._acquire()
+
+            start_time = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(**params)
+            except Exception:
+                elapsed = time.perf_counter() - start_time
+                self._observe("error", elapsed)
+                await self.limiter.release(elapsed, success=False)
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                # 請求被取消（如客戶端斷線或對沖請求落敗），不視為後端失敗；
+                # 已等待的時間是實際延遲的下界，仍計入延遲樣本，避免慢後端永遠沒有樣本
+                elapsed = time.perf_counter() - start_time
+                self.latencies.append(elapsed)
+                self._observe("cancelled", elapsed)
+                await self.limiter.release(elapsed, success=False, adjust=False)
+                self.circuit_breaker.cancel_request()
+                raise
+
+            latency = time.perf_counter() - start_time
+            self.latencies.append(latency)
+            self._observe("success", latency)
+            if response.usage is not None:
+                self._record_tokens(response.usage)
+            await self.limiter.release(latency, success=True)
+            self.circuit_breaker.record_success()
+            return response
+
+    async def stream_completion(self, params: Dict[str, Any]) -> AsyncIterator[Any]:
+        """
+        以流式模式調用後端，逐個返回 ChatCompletionChunk
+
+        並發名額在整個流式輸出期間佔用，延遲以完整輸出的耗時計算；
+        最後一個 chunk 帶有本次調用的 token 用量（usage）。
+
+        Raises:
+            ServiceUnavailableError: 熔斷中或排隊等待超時
+        """
+        await self._acquire()
+
+        start_time = time.perf_counter()
+        try:
+            stream = await self.client.chat.completions.create(
+                **params, stream=True, stream_options={"include_usage": True}
+            )
+            async with stream:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        self._record_tokens(chunk.usage)
+                    yield chunk
+        except Exception:
+            elapsed = time.perf_counter() - start_time
+            self._observe("error", elapsed)
+            await self.limiter.release(elapsed, success=False)
+            self.circuit_breaker.record_failure()
+            raise
+        except BaseException:
+            # 客戶端斷線或調用方提前關閉流，不視為後端失敗
+            elapsed = time.perf_counter() - start_time
+            self.latencies.append(elapsed)
+            self._observe("cancelled", elapsed)
+            await self.limiter.release(elapsed, success=False, adjust=False)
+            self.circuit_breaker.cancel_request()
+            raise
+
+        latency = time.perf_counter() - start_time
+        self.latencies.append(latency)
+        self._observe("success", latency)
+        await self.limiter.release(latency, success=True)
+        self.circuit_breaker.record_success()
+
+    def _observe(self, outcome: str, latency: float) -> None:
+        """記錄調用延遲指標"""
+        AI_REQUEST_DURATION.labels(self.name, self.model, outcome).observe(latency)
+
+    def _record_tokens(self, usage: Any) -> None:
+        """記錄 token 用量指標"""
+        AI_TOKENS.labels(self.name, self.model, "prompt").inc(usage.prompt_tokens or 0)
+        AI_TOKENS.labels(self.name, self.model, "completion").inc(usage.completion_tokens or 0)
+
+    def get_status(self) -> Dict[str, Any]:
+        """獲取後端狀態"""
+        p95 = self.p95_latency()
+        return {
+            "name": self.name,
+            "model": self.model,
+            "weight": self.weight,
+            "p95_latency": round(p95, 3) if p95 is not None else None,
+            "samples": len(self.latencies),
+            "circuit_breaker": self.circuit_breaker.get_stats(),
+            "concurrency": self.limiter.get_stats(),
+        }
@@ -1,194 +1,843 @@
 """AI 服務模組 - 異步版本（優化）"""
+import asyncio
 import base64
+import hashlib
 import json
+import math
+import random
 import uuid
 import logging
 import re
-from typing import Optional, Dict, Any
-from openai import AsyncOpenAI
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
+from starlette.concurrency import run_in_threadpool
 from app.config import settings
+from app.core.cache import CacheService, SingleFlight
+from app.core.metrics import AI_PARSE_FAILURES, IMAGE_BYTES
+from app.core.resilience import ServiceUnavailableError
+from app.services.ai_backend import AIBackend
+from app.services.duplicate_service import duplicate_service
+from app.services.quota_service import QuotaExceededError, QuotaReservation, quota_service
 from app.schemas.invoice import InvoiceData
+from app.utils.image import compute_dhash, optimize_image
+from app.utils.json_stream import StreamingJSONObjectParser
+from app.utils.performance import span
 
 logger = logging.getLogger(__name__)
 
+# 發票表頭欄位（流式識別時逐一返回）
+INVOICE_FIELDS = (
+    "invoiceNumber", "invoiceCode", "date", "amount",
+    "taxAmount", "totalAmount", "seller", "sellerTaxId",
+    "buyer", "buyerTaxId", "remarks",
+)
+
+
+@dataclass
+class PreparedImage:
+    """預處理後、調用模型前的圖片"""
+
+    image_url: str
+    image_size: int
+    image_hash: Optional[int]
+    # 同一使用者近期上傳的相似圖片的識別結果副本
+    duplicate: Optional[InvoiceData] = None
+
 
 class AIService:
     """AI 服務類，支持 OpenAI 和 Ollama（異步版本，優化）"""
 
     def __init__(self):
-        """初始化 AI 客戶端"""
-        self.service_type = settings.AI_SERVICE_TYPE.lower()
-        
-        if self.service_type == "ollama":
-            # 使用 Ollama（本地模型）
-            self.client = AsyncOpenAI(
-                base_url=settings.OLLAMA_BASE_URL,
-                api_key="ollama"  # Ollama 不需要真正的 API key
-            )
-            self.model = settings.OLLAMA_MODEL
-        else:
-            # 使用 OpenAI（預設）
-            self.client = AsyncOpenAI(
-                api_key=settings.OPENAI_API_KEY,
-                base_url=settings.OPENAI_BASE_URL if settings.OPENAI_BASE_URL else None
-            )
-            self.model = settings.OPENAI_MODEL
-
-    async def recognize_invoice(self, base64_image: str) -> Optional[InvoiceData]:
+        """初始化 AI 後端池"""
+        backend_names = settings.AI_BACKENDS or [settings.AI_SERVICE_TYPE]
+        self.backends: List[AIBackend] = [
+            AIBackend.from_settings(name, weight=settings.AI_BACKEND_WEIGHTS.get(name.lower(), 1.0))
+            for name in backend_names
+        ]
+
+        # 主要後端（用於日誌與向後兼容）
+        self.service_type = self.backends[0].name
+        self.model = self.backends[0].model
+
+        # 識別結果緩存（以圖片內容 + 模型 + 提示詞版本為鍵）
+        self.recognition_cache = CacheService(
+            use_redis=settings.REDIS_ENABLED,
+            redis_url=settings.REDIS_URL,
+            max_entries=settings.RECOGNITION_CACHE_MAX_ENTRIES,
+        )
+        # 相同圖片的並發識別只調用一次模型
+        self.recognition_flight = SingleFlight()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.hedged_requests = 0
+
+    async def recognize_invoice(
+        self, base64_image: str, quota_key: Optional[str] = None
+    ) -> Optional[InvoiceData]:
         """
         使用 AI 模型識別發票（支持 OpenAI 和 Ollama）- 異步版本（優化）
 
         Args:
             base64_image: Base64 編碼的圖片
+            quota_key: AI 用量配額鍵，None 表示不計量
 
         Returns:
             識別的發票資料，如果識別失敗則返回 None
         """
         try:
-            # 驗證和預處理圖片
-            image_url = self._preprocess_image(base64_image)
-            if not image_url:
-                logger.error("圖片預處理失敗")
+            # 解碼圖片
+            decoded = self._decode_image(base64_image)
+            if not decoded:
+                logger.error("圖片解碼失敗")
                 return None
 
-            # 構建優化的提示詞
-            prompt = self._get_invoice_prompt()
+            image_format, image_bytes = decoded
+            return await self._recognize_image(image_bytes, image_format, quota_key)
 
-            # 調用 AI API（優化參數）
-            response = await self._call_ai_api(prompt, image_url)
-            if not response:
-                return None
+        except (ServiceUnavailableError, QuotaExceededError):
+            raise
+        except Exception as e:
+            service_name = "Ollama" if self.service_type == "ollama" else "OpenAI"
+            logger.error(f"發票識別錯誤 ({service_name}): {str(e)}", exc_info=True)
+            return None
 
-            # 解析和驗證回應
-            data = self._parse_ai_response(response)
-            if not data:
+    async def recognize_invoice_bytes(
+        self,
+        image_bytes: bytes,
+        content_type: Optional[str] = None,
+        quota_key: Optional[str] = None,
+    ) -> Optional[InvoiceData]:
+        """
+        識別已上傳的圖片位元組（multipart 上傳，免去 Base64 解碼）
+
+        Args:
+            image_bytes: 原始圖片位元組
+            content_type: 上傳檔案的 MIME 類型
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Returns:
+            識別的發票資料，如果識別失敗則返回 None
+        """
+        try:
+            image_format = "jpeg"
+            if content_type and content_type.startswith("image/"):
+                image_format = content_type.split("/", 1)[1].lower()
+
+            if image_format not in ['jpeg', 'jpg', 'png', 'webp']:
+                logger.warning(f"不支持的圖片格式: {image_format}")
                 return None
 
-            # 構建 InvoiceData（帶數據清理）
-            invoice_data = self._build_invoice_data(data)
-            return invoice_data
+            return await self._recognize_image(image_bytes, image_format, quota_key)
 
+        except (ServiceUnavailableError, QuotaExceededError):
+            raise
         except Exception as e:
             service_name = "Ollama" if self.service_type == "ollama" else "OpenAI"
             logger.error(f"發票識別錯誤 ({service_name}): {str(e)}", exc_info=True)
             return None
 
-    def _preprocess_image(self, base64_image: str) -> Optional[str]:
+    async def recognize_invoice_stream(
+        self, base64_image: str, quota_key: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式識別發票：表頭欄位一完整即返回，項目逐一返回
+
+        Args:
+            base64_image: Base64 編碼的圖片
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Yields:
+            (事件, 資料) 元組：
+            - ("field", {"name": 欄位名, "value": 值})
+            - ("item", {"index": 序號, "item": 項目})
+            - ("done", InvoiceData)：最終結果，識別失敗時不返回
+        """
+        try:
+            decoded = self._decode_image(base64_image)
+            if not decoded:
+                logger.error("圖片解碼失敗")
+                return
+
+            image_format, image_bytes = decoded
+            with span(
+                "ai.recognize", image_bytes=len(image_bytes), image_format=image_format, stream=True
+            ):
+                events = self._recognize_stream(image_bytes, image_format, quota_key)
+                async with aclosing(events):
+                    async for event in events:
+                        yield event
+
+        except (ServiceUnavailableError, QuotaExceededError):
+            raise
+        except Exception as e:
+            service_name = "Ollama" if self.service_type == "ollama" else "OpenAI"
+            logger.error(f"發票流式識別錯誤 ({service_name}): {str(e)}", exc_info=True)
+
+    async def _recognize_stream(
+        self, image_bytes: bytes, image_format: str, quota_key: Optional[str]
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式識別已解碼的圖片：緩存查詢 → 合併相同圖片的並發請求 → 未命中時流式識別
+
+        同一使用者相同圖片的識別已在進行中（普通或流式請求）時，等待其結果後一次返回；
+        否則本請求登記為合併的發起者，其他請求等待本次的最終結果
+        """
+        cache_key, cached = await self._lookup_cache(image_bytes, quota_key)
+        if cached is not None:
+            for event in self._invoice_events(cached):
+                yield event
+            return
+        if cache_key is None:
+            events = self._stream_uncached(image_bytes, image_format, quota_key)
+            async with aclosing(events):
+                async for event in events:
+                    yield event
+            return
+
+        flight_key = self._flight_key(cache_key, quota_key)
+        inflight = self.recognition_flight.join(flight_key)
+        if inflight is not None:
+            invoice_data = await asyncio.shield(inflight)
+            if invoice_data is not None:
+                for event in self._invoice_events(self._with_fresh_ids(invoice_data)):
+                    yield event
+            return
+
+        flight = self.recognition_flight.claim(flight_key)
+        try:
+            events = self._stream_uncached(image_bytes, image_format, quota_key, cache_key)
+            async with aclosing(events):
+                async for event, data in events:
+                    if event == "done":
+                        # 先交出結果再返回最後一個事件，調用方收到 done 後即停止迭代也不影響等待者
+                        flight.set_result(data)
+                    yield event, data
+        except Exception as e:
+            if not flight.done():
+                flight.set_exception(e)
+            raise
+        finally:
+            # 識別失敗或客戶端中途斷線：等待者得到 None（識別失敗）
+            if not flight.done():
+                flight.set_result(None)
+
+    async def _stream_uncached(
+        self,
+        image_bytes: bytes,
+        image_format: str,
+        quota_key: Optional[str] = None,
+        cache_key: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """未命中緩存時的流式識別流程（步驟同 _recognize_uncached，模型輸出邊解析邊返回）"""
+        prepared = await self._prepare_image(image_bytes, image_format, quota_key)
+        if prepared is None:
+            return
+        if prepared.duplicate is not None and settings.DUPLICATE_ACTION == "reuse":
+            for event in self._invoice_events(prepared.duplicate):
+                yield event
+            return
+
+        fields: Dict[str, str] = {}
+        items: List[Dict[str, str]] = []
+        content_parts: List[str] = []
+        parser = StreamingJSONObjectParser(array_fields=("items",))
+
+        async with self._reserve_quota(quota_key, prepared.image_size) as reservation:
+            with span("ai.model_call", stream=True) as current:
+                chunks = self._route_stream(self._get_invoice_prompt(), prepared.image_url)
+                async with aclosing(chunks):
+                    async for chunk in chunks:
+                        if chunk.usage and reservation:
+                            reservation.record_usage(chunk.usage)
+                        content = chunk.choices[0].delta.content if chunk.choices else None
+                        if not content:
+                            continue
+
+                        content_parts.append(content)
+                        for kind, name, value in parser.feed(content):
+                            if kind == "item":
+                                if isinstance(value, dict):
+                                    items.append(self._build_item(value))
+                                    yield "item", {"index": len(items) - 1, "item": items[-1]}
+                            elif name in INVOICE_FIELDS:
+                                fields[name] = self._clean_field(name, value)
+                                yield "field", {"name": name, "value": fields[name]}
+                self._record_token_usage(current, reservation)
+
+        if parser.finished:
+            invoice_data = InvoiceData(
+                id=str(uuid.uuid4()),
+                **{name: fields.get(name, "") for name in INVOICE_FIELDS},
+                items=items,
+            )
+        else:
+            # 輸出不是完整的 JSON 物件，退回完整解析
+            response = "".join(content_parts)
+            with span("ai.parse", response_chars=len(response)):
+                data = self._parse_ai_response(response)
+            if not data:
+                return
+            invoice_data = self._build_invoice_data(data)
+
+        yield "done", await self._store_result(invoice_data, quota_key, prepared, cache_key)
+
+    async def _recognize_image(
+        self, image_bytes: bytes, image_format: str, quota_key: Optional[str] = None
+    ) -> Optional[InvoiceData]:
+        """
+        識別已解碼的圖片：緩存查詢 → 合併相同圖片的並發請求 → 未命中時識別並寫入緩存
+
+        Args:
+            image_bytes: 原始圖片位元組
+            image_format: 圖片格式（如 jpeg、png）
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Returns:
+            識別的發票資料，如果識別失敗則返回 None
+        """
+        with span("ai.recognize", image_bytes=len(image_bytes), image_format=image_format) as current:
+            cache_key, cached = await self._lookup_cache(image_bytes, quota_key)
+            if cache_key is None:
+                return await self._recognize_uncached(image_bytes, image_format, quota_key)
+            current.set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+            # 未命中：同一使用者相同圖片的並發請求合併為一次模型調用，其餘等待者取得獨立 ID 的副本
+            leader = False
+
+            def recognize():
+                nonlocal leader
+                leader = True
+                return self._recognize_uncached(image_bytes, image_format, quota_key, cache_key)
+
+            invoice_data = await self.recognition_flight.do(
+                self._flight_key(cache_key, quota_key), recognize
+            )
+            if invoice_data and not leader:
+                invoice_data = self._with_fresh_ids(invoice_data)
+            return invoice_data
+
+    async def _recognize_uncached(
+        self,
+        image_bytes: bytes,
+        image_format: str,
+        quota_key: Optional[str] = None,
+        cache_key: Optional[str] = None,
+    ) -> Optional[InvoiceData]:
+        """
+        未命中緩存時的識別流程：預處理 → 近似重複檢測 → 配額預留 → AI 調用 → 解析 → 構建 → 寫入緩存
+
+        同一使用者近期上傳過相似圖片時，按 DUPLICATE_ACTION 直接返回先前的結果，
+        或照常識別並以 duplicateOf 標記
+
+        Args:
+            image_bytes: 原始圖片位元組
+            image_format: 圖片格式（如 jpeg、png）
+            quota_key: AI 用量配額鍵，None 表示不計量
+            cache_key: 識別結果緩存鍵，None 表示不寫入緩存
+
+        Returns:
+            識別的發票資料，如果識別失敗則返回 None
+        """
+        prepared = await self._prepare_image(image_bytes, image_format, quota_key)
+        if prepared is None:
+            return None
+        if prepared.duplicate is not None and settings.DUPLICATE_ACTION == "reuse":
+            return prepared.duplicate
+
+        # 構建優化的提示詞
+        prompt = self._get_invoice_prompt()
+
+        async with self._reserve_quota(quota_key, prepared.image_size) as reservation:
+            # 調用 AI API（優化參數）
+            with span("ai.model_call") as current:
+                response = await self._call_ai_api(prompt, prepared.image_url, reservation)
+                self._record_token_usage(current, reservation)
+        if not response:
+            return None
+
+        # 解析和驗證回應
+        with span("ai.parse", response_chars=len(response)):
+            data = self._parse_ai_response(response)
+        if not data:
+            return None
+
+        # 構建 InvoiceData（帶數據清理）
+        with span("ai.build", items=len(data["items"])):
+            invoice_data = self._build_invoice_data(data)
+
+        return await self._store_result(invoice_data, quota_key, prepared, cache_key)
+
+    async def _lookup_cache(
+        self, image_bytes: bytes, quota_key: Optional[str]
+    ) -> Tuple[Optional[str], Optional[InvoiceData]]:
+        """
+        查詢識別結果緩存，命中時同樣進行近似重複檢測
+
+        Returns:
+            (緩存鍵, 命中的結果副本（新 ID）)；未啟用緩存時緩存鍵為 None，未命中時結果為 None
+        """
+        if not settings.RECOGNITION_CACHE_ENABLED:
+            return None, None
+        with span("ai.cache_lookup") as current:
+            cache_key = self._get_cache_key(image_bytes)
+            cached_data = await self.recognition_cache.get(cache_key)
+            current.set_attribute("cache_hit", cached_data is not None)
+        if cached_data is None:
+            self.cache_misses += 1
+            return cache_key, None
+        self.cache_hits += 1
+        invoice_data = self._with_fresh_ids(InvoiceData.model_validate(cached_data["invoice"]))
+        return cache_key, await self._check_cached_duplicate(
+            invoice_data, image_bytes, cached_data.get("image_hash"), quota_key
+        )
+
+    async def _check_cached_duplicate(
+        self,
+        invoice_data: InvoiceData,
+        image_bytes: bytes,
+        image_hash: Optional[int],
+        quota_key: Optional[str],
+    ) -> InvoiceData:
+        """
+        緩存命中時的近似重複檢測，按 DUPLICATE_ACTION 處理的方式與未命中時相同
+
+        感知雜湊隨識別結果一併緩存；寫入緩存時未啟用檢測（沒有雜湊）才重新計算。
+
+        Returns:
+            返回給本次請求的結果（疑似重複時為先前結果的副本或帶 duplicateOf 標記）
+        """
+        if not duplicate_service.enabled or quota_key is None:
+            return invoice_data
+        if image_hash is None:
+            try:
+                image_hash = await run_in_threadpool(compute_dhash, image_bytes)
+            except Exception as e:
+                logger.warning(f"感知雜湊計算失敗，跳過近似重複檢測: {str(e)}")
+                return invoice_data
+
+        duplicate = self._find_duplicate(quota_key, image_hash)
+        if duplicate is not None and settings.DUPLICATE_ACTION == "reuse":
+            return duplicate
+        duplicate_service.add(quota_key, image_hash, invoice_data)
+        if duplicate is not None:
+            return invoice_data.model_copy(update={"duplicateOf": duplicate.duplicateOf})
+        return invoice_data
+
+    async def _prepare_image(
+        self, image_bytes: bytes, image_format: str, quota_key: Optional[str]
+    ) -> Optional[PreparedImage]:
+        """
+        預處理圖片（縮放、重新編碼）並查詢同一使用者近期上傳的相似圖片
+
+        Returns:
+            預處理結果，失敗返回 None
+        """
+        with span("ai.preprocess") as current:
+            preprocessed = await self._preprocess_image(image_bytes, image_format)
+            if preprocessed:
+                current.set_attribute("sent_bytes", preprocessed[1])
+        if not preprocessed:
+            logger.error("圖片預處理失敗")
+            return None
+
+        image_url, image_size, image_hash = preprocessed
+        return PreparedImage(
+            image_url=image_url,
+            image_size=image_size,
+            image_hash=image_hash,
+            duplicate=self._find_duplicate(quota_key, image_hash),
+        )
+
+    @asynccontextmanager
+    async def _reserve_quota(
+        self, quota_key: Optional[str], image_size: int
+    ) -> AsyncIterator[Optional[QuotaReservation]]:
+        """
+        調用模型前預留配額，結束後按實際用量結算
+
+        Raises:
+            QuotaExceededError: 配額不足，直接拒絕
+        """
+        with span("ai.quota_reserve"):
+            reservation = await quota_service.reserve(quota_key, image_size)
+        try:
+            yield reservation
+        finally:
+            await quota_service.settle(reservation)
+
+    @staticmethod
+    def _record_token_usage(current: Any, reservation: Optional[QuotaReservation]) -> None:
+        """將模型回應的 token 用量記錄到 span"""
+        if reservation is not None and reservation.prompt_tokens is not None:
+            current.set_attribute("prompt_tokens", reservation.prompt_tokens)
+            current.set_attribute("completion_tokens", reservation.completion_tokens)
+
+    async def _store_result(
+        self,
+        invoice_data: InvoiceData,
+        quota_key: Optional[str],
+        prepared: PreparedImage,
+        cache_key: Optional[str],
+    ) -> InvoiceData:
+        """
+        記錄識別結果：加入近似重複索引並寫入緩存
+
+        Returns:
+            返回給本次請求的結果（疑似重複時帶 duplicateOf 標記）
+        """
+        duplicate_service.add(quota_key, prepared.image_hash, invoice_data)
+        if cache_key:
+            with span("ai.cache_store"):
+                # 感知雜湊一併緩存，命中時無需重新解碼圖片即可檢測近似重複
+                await self.recognition_cache.set(
+                    cache_key,
+                    {"invoice": invoice_data, "image_hash": prepared.image_hash},
+                    settings.RECOGNITION_CACHE_EXPIRE_SECONDS,
+                )
+        if prepared.duplicate is not None:
+            # 標記只加在返回給本次請求的副本上，緩存與索引中保留未標記的結果
+            invoice_data = invoice_data.model_copy(update={"duplicateOf": prepared.duplicate.duplicateOf})
+        return invoice_data
+
+    def _decode_image(self, base64_image: str) -> Optional[Tuple[str, bytes]]:
         """
-        預處理圖片：驗證格式、大小等
+        解碼 Base64 圖片：驗證格式並轉為位元組
 
         Returns:
-            處理後的圖片 URL，失敗返回 None
+            (圖片格式, 圖片位元組) 元組，失敗返回 None
         """
         try:
             # 移除 data URL 前綴（如果存在）
             if base64_image.startswith('data:'):
                 # 提取 MIME 類型和 base64 數據
-                match = re.match(r'data:image/(\w+);base64,(.+)', base64_image)
-                if match:
-                    image_format = match.group(1).lower()
-                    base64_data = match.group(2)
-                    
-                    # 驗證圖片格式
-                    if image_format not in ['jpeg', 'jpg', 'png', 'webp']:
-                        logger.warning(f"不支持的圖片格式: {image_format}")
-                        return None
-                    
-                    # 檢查圖片大小（base64 編碼後的大小）
-                    if len(base64_data) > 20 * 1024 * 1024:  # 約 15MB 原始圖片
-                        logger.warning("圖片過大，可能影響識別性能")
-                    
-                    return f"data:image/{image_format};base64,{base64_data}"
-                else:
-                    return base64_image
+                match = re.match(r'data:image/(\w+);base64,', base64_image)
+                if not match:
+                    logger.warning("無法解析圖片 data URL")
+                    return None
+
+                image_format = match.group(1).lower()
+                base64_data = base64_image[match.end():]
             else:
                 # 假設是 JPEG（向後兼容）
-                return f"data:image/jpeg;base64,{base64_image}"
+                image_format = "jpeg"
+                base64_data = base64_image
+
+            # 驗證圖片格式
+            if image_format not in ['jpeg', 'jpg', 'png', 'webp']:
+                logger.warning(f"不支持的圖片格式: {image_format}")
+                return None
+
+            return image_format, base64.b64decode(base64_data)
+
+        except Exception as e:
+            logger.error(f"圖片解碼錯誤: {str(e)}")
+            return None
+
+    async def _preprocess_image(
+        self, image_bytes: bytes, image_format: str
+    ) -> Optional[Tuple[str, int, Optional[int]]]:
+        """
+        預處理圖片：校正方向、縮放、重新編碼，並計算感知雜湊（啟用近似重複檢測時）
+
+        Pillow 解碼、縮放與編碼為 CPU 密集操作，移至執行緒池執行，避免阻塞事件循環
+        （批量識別時多張圖片也能並行預處理）
+
+        Returns:
+            (處理後的圖片 URL, 發送的圖片位元組數, 感知雜湊) 元組，失敗返回 None
+        """
+        try:
+            # 檢查圖片大小
+            IMAGE_BYTES.labels("original").observe(len(image_bytes))
+            if len(image_bytes) > 15 * 1024 * 1024:
+                logger.warning("圖片過大，可能影響識別性能")
+
+            image_bytes, image_format, image_hash = await run_in_threadpool(
+                self._transform_image, image_bytes, image_format
+            )
+
+            IMAGE_BYTES.labels("sent").observe(len(image_bytes))
+            base64_data = base64.b64encode(image_bytes).decode("ascii")
+            return f"data:image/{image_format};base64,{base64_data}", len(image_bytes), image_hash
 
         except Exception as e:
             logger.error(f"圖片預處理錯誤: {str(e)}")
             return None
 
-    async def _call_ai_api(self, prompt: str, image_url: str) -> Optional[str]:
+    def _transform_image(
+        self, image_bytes: bytes, image_format: str
+    ) -> Tuple[bytes, str, Optional[int]]:
         """
-        調用 AI API（優化版本）
-        
-        改進點：
-        1. 增加 max_tokens（處理複雜發票）
-        2. 使用更低的 temperature（提高準確性）
-        3. 添加高解析度模式（GPT-4o）
+        縮放、重新編碼圖片並計算感知雜湊（同步，於執行緒池中調用）
+
+        Returns:
+            (圖片位元組, 圖片格式, 感知雜湊) 元組
+        """
+        image_hash = None
+        if settings.IMAGE_OPTIMIZE_ENABLED:
+            optimized = optimize_image(
+                image_bytes,
+                max_edge=settings.IMAGE_MAX_EDGE,
+                output_format=settings.IMAGE_OUTPUT_FORMAT,
+                quality=settings.IMAGE_OUTPUT_QUALITY,
+                with_dhash=duplicate_service.enabled,
+            )
+            logger.info(
+                f"圖片預處理: {optimized.original_size} -> {optimized.optimized_size} bytes "
+                f"({optimized.width}x{optimized.height}, {optimized.format})"
+            )
+            return optimized.data, optimized.format, optimized.dhash
+
+        if duplicate_service.enabled:
+            try:
+                image_hash = compute_dhash(image_bytes)
+            except Exception as e:
+                logger.warning(f"感知雜湊計算失敗，跳過近似重複檢測: {str(e)}")
+        return image_bytes, image_format, image_hash
+
+    def _get_cache_key(self, image_bytes: bytes) -> str:
+        """
+        生成識別結果緩存鍵
+
+        以原始圖片位元組計算雜湊，避免同一張圖片因 data URL 前綴不同而重複識別；
+        預處理參數也納入鍵中，調整後不會命中舊結果；
+        緩存值為 {"invoice": 識別結果, "image_hash": 感知雜湊}，格式變更時同步更新鍵前綴。
+        """
+        digest = hashlib.sha256(image_bytes)
+        models = ",".join(backend.model for backend in self.backends)
+        digest.update(f"|{models}|{settings.AI_PROMPT_VERSION}".encode())
+        if settings.IMAGE_OPTIMIZE_ENABLED:
+            digest.update(
+                f"|{settings.IMAGE_MAX_EDGE}|{settings.IMAGE_OUTPUT_FORMAT}"
+                f"|{settings.IMAGE_OUTPUT_QUALITY}".encode()
+            )
+        return f"recognition:v2:{digest.hexdigest()}"
+
+    def _flight_key(self, cache_key: str, quota_key: Optional[str]) -> str:
+        """
+        生成識別請求的合併鍵
+
+        配額預留與扣減、近似重複檢測都按使用者進行，合併鍵包含配額鍵：
+        不同使用者的相同圖片各自調用模型，不會繼承他人的配額錯誤或重複檢測結果
+        """
+        return f"{cache_key}|{quota_key}" if quota_key is not None else cache_key
+
+    def _with_fresh_ids(self, invoice_data: InvoiceData) -> InvoiceData:
+        """為緩存命中的發票資料重新生成 ID，避免不同請求共用同一 ID"""
+        items = [
+            item.model_copy(update={"id": str(uuid.uuid4())})
+            for item in invoice_data.items
+        ]
+        return invoice_data.model_copy(update={"id": str(uuid.uuid4()), "items": items})
+
+    def _find_duplicate(self, quota_key: Optional[str], image_hash: Optional[int]) -> Optional[InvoiceData]:
+        """
+        查詢同一使用者近期上傳的相似圖片
+
+        Returns:
+            先前識別結果的副本（新 ID，duplicateOf 為先前結果的 ID），沒有相似圖片時返回 None
+        """
+        match = duplicate_service.find(quota_key, image_hash)
+        if match is None:
+            return None
+        previous, distance = match
+        logger.info(f"疑似重複上傳 ({quota_key}): 與先前結果 {previous.id} 的雜湊距離為 {distance}")
+        return self._with_fresh_ids(previous).model_copy(update={"duplicateOf": previous.id})
+
+    def _invoice_events(self, invoice_data: InvoiceData) -> List[Tuple[str, Any]]:
+        """將完整的識別結果轉為流式事件（緩存命中或重用先前結果時一次返回）"""
+        events: List[Tuple[str, Any]] = [
+            ("field", {"name": name, "value": getattr(invoice_data, name)})
+            for name in INVOICE_FIELDS
+        ]
+        events.extend(
+            ("item", {"index": index, "item": item.model_dump()})
+            for index, item in enumerate(invoice_data.items)
+        )
+        events.append(("done", invoice_data))
+        return events
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """獲取識別結果緩存統計"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "enabled": settings.RECOGNITION_CACHE_ENABLED,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+            "coalesced": self.recognition_flight.coalesced,
+            "storage": self.recognition_cache.get_stats(),
+            "duplicates": duplicate_service.get_stats(),
+        }
+
+    async def _call_ai_api(
+        self, prompt: str, image_url: str, reservation: Optional[QuotaReservation] = None
+    ) -> Optional[str]:
+        """
+        調用 AI API（經後端路由與對沖），返回模型輸出的文字內容
+
+        Args:
+            prompt: 提示詞
+            image_url: 圖片 data URL
+            reservation: 配額預留記錄，用於記錄回應中的 token 用量
         """
         try:
-            is_openai = self.service_type != "ollama"
-            
-            # OpenAI 模型參數
-            if is_openai:
-                params = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": prompt},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": image_url,
-                                        "detail": "high"  # 高解析度模式，提高識別準確度
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    "max_tokens": 2000,  # 增加 token 限制，處理複雜發票
-                    "temperature": 0.1,  # 降低溫度，提高準確性和一致性
-                    "timeout": 60.0,  # 60秒超時
-                }
-                
-                # GPT-4o 支持 JSON mode（如果可用）
-                if "gpt-4o" in self.model.lower():
-                    try:
-                        # 嘗試使用 JSON mode（需要 OpenAI API 支持）
-                        params["response_format"] = {"type": "json_object"}
-                    except:
-                        pass  # 如果不支持，使用普通模式
-            else:
-                # Ollama 模型參數
-                params = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": prompt},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": image_url}
-                                }
-                            ]
-                        }
-                    ],
-                    "max_tokens": 2000,
-                    "temperature": 0.1,
-                }
-
-            response = await self.client.chat.completions.create(**params)
-            
+            response, backend = await self._route_completion(prompt, image_url)
+
+            if response and response.usage and reservation:
+                reservation.record_usage(response.usage)
+
             if not response or not response.choices:
-                logger.error("AI API 返回空回應")
+                logger.error(f"AI API 返回空回應 ({backend.name})")
                 return None
 
             content = response.choices[0].message.content
             if not content:
-                logger.error("AI API 返回的內容為空")
+                logger.error(f"AI API 返回的內容為空 ({backend.name})")
                 return None
 
             return content
 
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"調用 AI API 錯誤: {str(e)}", exc_info=True)
             return None
 
+    def _select_backends(self) -> List[AIBackend]:
+        """
+        選擇主要與備用後端
+
+        在可用後端中按 權重 / p95 延遲 加權隨機選出主要後端（尚無延遲樣本的後端
+        以最高優先級參與，便於收集樣本），其餘按同一分數由高到低作為備用。
+
+        Returns:
+            按優先順序排列的可用後端列表
+        """
+        available = [backend for backend in self.backends if backend.is_available()]
+        if len(available) <= 1:
+            return available
+
+        def score(backend: AIBackend) -> float:
+            p95 = backend.p95_latency()
+            return backend.weight / max(p95, 0.001) if p95 is not None else math.inf
+
+        unexplored = [backend for backend in available if backend.p95_latency() is None]
+        if unexplored:
+            primary = unexplored[0]
+        else:
+            primary = random.choices(available, weights=[score(b) for b in available])[0]
+
+        others = sorted((b for b in available if b is not primary), key=score, reverse=True)
+        return [primary, *others]
+
+    async def _route_completion(self, prompt: str, image_url: str) -> Tuple[Any, AIBackend]:
+        """
+        將請求路由到後端，必要時對沖或故障轉移
+
+        主要後端在 AI_HEDGE_DELAY_SECONDS 內未返回時（啟用對沖），或調用失敗時，
+        將同一請求發送到下一個後端，取最先成功的結果並取消其餘請求。
+
+        Returns:
+            (回應, 返回該回應的後端) 元組
+
+        Raises:
+            ServiceUnavailableError: 所有後端均不可用
+        """
+        candidates = self._select_backends()
+        if not candidates:
+            raise self._unavailable_error()
+
+        pending: Dict[asyncio.Task, AIBackend] = {}
+
+        def launch(backend: AIBackend) -> None:
+            params = backend.build_params(prompt, image_url)
+            pending[asyncio.create_task(backend.create_completion(params))] = backend
+
+        launch(candidates.pop(0))
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                hedge_delay = (
+                    settings.AI_HEDGE_DELAY_SECONDS
+                    if settings.AI_HEDGE_ENABLED and candidates
+                    else None
+                )
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # 主要後端回應過慢，發出對沖請求
+                    self.hedged_requests += 1
+                    launch(candidates.pop(0))
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result(), backend
+                    last_error = task.exception()
+                    logger.warning(f"AI 後端 {backend.name} 調用失敗: {str(last_error)}")
+
+                # 全部失敗且無進行中的請求時，故障轉移到下一個後端
+                if not pending and candidates:
+                    launch(candidates.pop(0))
+
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _route_stream(self, prompt: str, image_url: str) -> AsyncIterator[Any]:
+        """
+        以流式模式將請求路由到後端
+
+        流式輸出無法對沖；後端在輸出任何內容前失敗時，故障轉移到下一個後端。
+
+        Yields:
+            ChatCompletionChunk
+
+        Raises:
+            ServiceUnavailableError: 所有後端均不可用
+        """
+        candidates = self._select_backends()
+        if not candidates:
+            raise self._unavailable_error()
+
+        for index, backend in enumerate(candidates):
+            started = False
+            chunks = backend.stream_completion(backend.build_params(prompt, image_url))
+            try:
+                async with aclosing(chunks):
+                    async for chunk in chunks:
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or index == len(candidates) - 1:
+                    raise
+                logger.warning(f"AI 後端 {backend.name} 流式調用失敗: {str(e)}")
+
+    def _unavailable_error(self) -> ServiceUnavailableError:
+        """所有後端均熔斷時的錯誤"""
+        retry_after = min(b.circuit_breaker.retry_after() for b in self.backends)
+        return ServiceUnavailableError(
+            f"AI 服務暫時不可用（熔斷中），請 {max(1, math.ceil(retry_after))} 秒後重試",
+            retry_after=retry_after,
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        """獲取 AI 後端池狀態（熔斷器、並發限制與延遲）"""
+        return {
+            "hedge_enabled": settings.AI_HEDGE_ENABLED,
+            "hedge_delay": settings.AI_HEDGE_DELAY_SECONDS,
+            "hedged_requests": self.hedged_requests,
+            "backends": [backend.get_status() for backend in self.backends],
+        }
+
     def _get_invoice_prompt(self) -> str:
         """獲取發票識別提示詞（優化版本）"""
         return """你是一個專業的發票識別系統。請仔細分析這張發票圖片，準確提取以下資訊：
@@ -280,14 +929,11 @@ class AIService:
             # 基本驗證
             if not isinstance(data, dict):
                 logger.error("解析的數據不是字典格式")
+                AI_PARSE_FAILURES.labels("not_object").inc()
                 return None
             
             # 確保必要欄位存在
-            required_fields = [
-                "invoiceNumber", "invoiceCode", "date", "amount",
-                "taxAmount", "totalAmount", "seller", "sellerTaxId",
-                "buyer", "buyerTaxId", "remarks", "items"
-            ]
+            required_fields = [*INVOICE_FIELDS, "items"]
             
             for field in required_fields:
                 if field not in data:
@@ -302,9 +948,11 @@ class AIService:
         except json.JSONDecodeError as e:
             logger.error(f"JSON 解析錯誤: {str(e)}")
             logger.debug(f"原始內容: {content[:500]}")
+            AI_PARSE_FAILURES.labels("invalid_json").inc()
             return None
         except Exception as e:
             logger.error(f"回應驗證錯誤: {str(e)}")
+            AI_PARSE_FAILURES.labels("error").inc()
             return None
 
     def _build_invoice_data(self, data: Dict[str, Any]) -> InvoiceData:
@@ -320,41 +968,39 @@ class AIService:
         invoice_id = str(uuid.uuid4())
 
         # 清理和處理項目
-        items = []
-        for item in data.get("items", []):
-            if isinstance(item, dict):
-                items.append({
-                    "id": str(uuid.uuid4()),
-                    "name": str(item.get("name", "")).strip(),
-                    "quantity": str(item.get("quantity", "")).strip(),
-                    "price": str(item.get("price", "")).strip()
-                })
-
-        # 清理日期格式
-        date = str(data.get("date", "")).strip()
-        # 嘗試標準化日期格式
-        date_match = re.search(r'(\d{4})[-\/](\d{1,2})[-\/](\d{1,2})', date)
-        if date_match:
-            year, month, day = date_match.groups()
-            date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+        items = [
+            self._build_item(item)
+            for item in data.get("items", [])
+            if isinstance(item, dict)
+        ]
 
         # 構建 InvoiceData
         return InvoiceData(
             id=invoice_id,
-            invoiceNumber=str(data.get("invoiceNumber", "")).strip(),
-            invoiceCode=str(data.get("invoiceCode", "")).strip(),
-            date=date,
-            amount=str(data.get("amount", "")).strip(),
-            taxAmount=str(data.get("taxAmount", "")).strip(),
-            totalAmount=str(data.get("totalAmount", "")).strip(),
-            seller=str(data.get("seller", "")).strip(),
-            sellerTaxId=str(data.get("sellerTaxId", "")).strip(),
-            buyer=str(data.get("buyer", "")).strip(),
-            buyerTaxId=str(data.get("buyerTaxId", "")).strip(),
-            remarks=str(data.get("remarks", "")).strip(),
+            **{name: self._clean_field(name, data.get(name, "")) for name in INVOICE_FIELDS},
             items=items
         )
 
+    def _build_item(self, item: Dict[str, Any]) -> Dict[str, str]:
+        """清理單個發票項目並生成 ID"""
+        return {
+            "id": str(uuid.uuid4()),
+            "name": str(item.get("name", "")).strip(),
+            "quantity": str(item.get("quantity", "")).strip(),
+            "price": str(item.get("price", "")).strip()
+        }
+
+    def _clean_field(self, name: str, value: Any) -> str:
+        """清理單個表頭欄位（日期標準化為 YYYY-MM-DD）"""
+        value = str(value).strip()
+        if name == "date":
+            # 嘗試標準化日期格式
+            date_match = re.search(r'(\d{4})[-\/](\d{1,2})[-\/](\d{1,2})', value)
+            if date_match:
+                year, month, day = date_match.groups()
+                value = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+        return value
+
 
 # 創建全局實例
 ai_service = AIService()
@@ -0,0 +1,144 @@
+"""近似重複檢測服務 - 以感知雜湊找出同一使用者近期上傳的相似發票圖片"""
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+from app.config import settings
+from app.schemas.invoice import InvoiceData
+from app.utils.bktree import BKTree
+
+
+class RecentHashIndex:
+    """
+    單一使用者近期圖片雜湊的索引
+
+    以 BK 樹查詢 Hamming 距離相近的雜湊；只保留時間窗口內最近的 max_entries 筆，
+    過期或超出數量的記錄從樹中惰性刪除，失效節點多於有效節點時重建。
+    """
+
+    def __init__(self, max_entries: int, window_seconds: float):
+        self.max_entries = max_entries
+        self.window_seconds = window_seconds
+        self._tree = BKTree()
+        # (加入時間, 雜湊, 識別結果, 樹節點)，由舊到新
+        self._entries: deque = deque()
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, image_hash: int, invoice_data: InvoiceData, now: float) -> None:
+        """加入一張已識別的圖片"""
+        node = self._tree.add(image_hash, invoice_data)
+        self._entries.append((now, image_hash, invoice_data, node))
+        self._expire(now)
+
+    def find(self, image_hash: int, max_distance: int, now: float) -> Optional[Tuple[InvoiceData, int]]:
+        """
+        查詢最相近的圖片
+
+        Returns:
+            (先前的識別結果, Hamming 距離)，沒有相近圖片時返回 None
+        """
+        self._expire(now)
+        matches = self._tree.search(image_hash, max_distance)
+        if not matches:
+            return None
+        distance, invoice_data = matches[0]
+        return invoice_data, distance
+
+    def _expire(self, now: float) -> None:
+        """移除窗口外與超出數量的記錄"""
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or now - self._entries[0][0] > self.window_seconds
+        ):
+            node = self._entries.popleft()[3]
+            self._tree.remove(node)
+            self._dead += 1
+
+        if self._dead > len(self._entries):
+            self._tree = BKTree()
+            self._entries = deque(
+                (added_at, image_hash, invoice_data, self._tree.add(image_hash, invoice_data))
+                for added_at, image_hash, invoice_data, _ in self._entries
+            )
+            self._dead = 0
+
+
+class DuplicateService:
+    """
+    近似重複檢測服務
+
+    每個使用者（配額鍵）一個近期雜湊索引，使用者數以 LRU 限制；索引保存在進程內存，
+    多 worker 部署時各 worker 只能檢出自己處理過的圖片。
+    """
+
+    def __init__(self):
+        self._indexes: "OrderedDict[str, RecentHashIndex]" = OrderedDict()
+        self.checks = 0
+        self.matches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.DUPLICATE_DETECTION_ENABLED
+
+    def find(self, key: Optional[str], image_hash: Optional[int]) -> Optional[Tuple[InvoiceData, int]]:
+        """
+        查詢使用者近期是否上傳過相似圖片
+
+        Args:
+            key: 使用者（配額鍵），None 表示不檢測
+            image_hash: 圖片的感知雜湊
+
+        Returns:
+            (先前的識別結果, Hamming 距離)，沒有相似圖片時返回 None
+        """
+        if not self.enabled or key is None or image_hash is None:
+            return None
+        self.checks += 1
+        index = self._indexes.get(key)
+        if index is None:
+            return None
+        self._indexes.move_to_end(key)
+        match = index.find(image_hash, settings.DUPLICATE_MAX_DISTANCE, time.monotonic())
+        if match is not None:
+            self.matches += 1
+        return match
+
+    def add(self, key: Optional[str], image_hash: Optional[int], invoice_data: InvoiceData) -> None:
+        """
+        記錄使用者已識別的圖片
+
+        Args:
+            key: 使用者（配額鍵），None 表示不記錄
+            image_hash: 圖片的感知雜湊
+            invoice_data: 識別結果
+        """
+        if not self.enabled or key is None or image_hash is None:
+            return
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = RecentHashIndex(
+                settings.DUPLICATE_MAX_PER_USER, settings.DUPLICATE_WINDOW_SECONDS
+            )
+            while len(self._indexes) > settings.DUPLICATE_MAX_USERS:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(key)
+        index.add(image_hash, invoice_data, time.monotonic())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取檢測統計"""
+        return {
+            "enabled": self.enabled,
+            "action": settings.DUPLICATE_ACTION,
+            "max_distance": settings.DUPLICATE_MAX_DISTANCE,
+            "users": len(self._indexes),
+            "entries": sum(len(index) for index in self._indexes.values()),
+            "checks": self.checks,
+            "matches": self.matches,
+        }
+
+
+# 創建全局實例
+duplicate_service = DuplicateService()
@@ -1,7 +1,25 @@
 """發票服務層"""
-from typing import List, Optional
-from app.schemas.invoice import InvoiceData, SaveInvoicesRequest
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.core.cache import cache_service
+from app.core.exceptions import ServiceUnavailableException
+from app.core.resilience import ServiceUnavailableError
+from app.crud.crud_invoice import SaveResult, async_crud_invoice
+from app.schemas.invoice import (
+    BatchRecognizeItem,
+    InvoiceData,
+    InvoiceFilter,
+    InvoiceRecord,
+    MonthlySummary,
+    RecognizeResponse,
+    SaveInvoicesRequest,
+    SellerSummary,
+)
+from app.services.ai_backend import unbounded_queueing
 from app.services.ai_service import ai_service
+from app.services.quota_service import QuotaExceededError
 
 
 class InvoiceService:
@@ -10,57 +28,268 @@ class InvoiceService:
     def __init__(self):
         self.ai_service = ai_service
 
-    async def recognize_invoice(self, base64_image: str) -> tuple[bool, Optional[InvoiceData], str]:
+    @staticmethod
+    def _success_message(invoice_data: InvoiceData) -> str:
+        """識別成功的提示訊息，疑似重複上傳時提醒使用者"""
+        if invoice_data.duplicateOf:
+            return "發票識別成功（疑似與先前上傳的發票重複）"
+        return "發票識別成功"
+
+    async def recognize_invoice(
+        self, base64_image: str, quota_key: Optional[str] = None
+    ) -> tuple[bool, Optional[InvoiceData], str]:
         """
         識別發票圖片
 
         Args:
             base64_image: Base64 編碼的圖片
+            quota_key: AI 用量配額鍵，None 表示不計量
 
         Returns:
             (success, data, message) 元組
+
+        Raises:
+            ServiceUnavailableException: AI 服務熔斷中或排隊等待超時（503，帶 Retry-After）
         """
         try:
-            invoice_data = await self.ai_service.recognize_invoice(base64_image)
+            invoice_data = await self.ai_service.recognize_invoice(base64_image, quota_key)
 
             if invoice_data:
-                return True, invoice_data, "發票識別成功"
+                return True, invoice_data, self._success_message(invoice_data)
             else:
                 return False, None, "無法識別發票，請確認圖片清晰度或重新上傳"
 
+        except ServiceUnavailableError as e:
+            raise ServiceUnavailableException(detail=str(e), retry_after=e.retry_after)
+        except QuotaExceededError as e:
+            return False, None, str(e)
         except Exception as e:
             return False, None, f"發票識別失敗: {str(e)}"
 
-    async def save_invoices(self, request: SaveInvoicesRequest) -> tuple[bool, str]:
+    async def recognize_invoice_bytes(
+        self,
+        image_bytes: bytes,
+        content_type: Optional[str] = None,
+        quota_key: Optional[str] = None,
+    ) -> tuple[bool, Optional[InvoiceData], str]:
+        """
+        識別上傳的發票圖片檔案
+
+        Args:
+            image_bytes: 原始圖片位元組
+            content_type: 上傳檔案的 MIME 類型
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Returns:
+            (success, data, message) 元組
+
+        Raises:
+            ServiceUnavailableException: AI 服務熔斷中或排隊等待超時（503，帶 Retry-After）
+        """
+        try:
+            invoice_data = await self.ai_service.recognize_invoice_bytes(
+                image_bytes, content_type, quota_key
+            )
+
+            if invoice_data:
+                return True, invoice_data, self._success_message(invoice_data)
+            else:
+                return False, None, "無法識別發票，請確認圖片清晰度或重新上傳"
+
+        except ServiceUnavailableError as e:
+            raise ServiceUnavailableException(detail=str(e), retry_after=e.retry_after)
+        except QuotaExceededError as e:
+            return False, None, str(e)
+        except Exception as e:
+            return False, None, f"發票識別失敗: {str(e)}"
+
+    async def try_recognize_invoice(
+        self, base64_image: str, quota_key: Optional[str] = None
+    ) -> tuple[bool, Optional[InvoiceData], str]:
+        """
+        識別發票圖片，AI 服務暫不可用時也以失敗結果返回
+
+        供批量識別與後台任務逐張記錄結果，單張失敗不中斷整批。
+
+        Args:
+            base64_image: Base64 編碼的圖片
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Returns:
+            (success, data, message) 元組
+        """
+        try:
+            return await self.recognize_invoice(base64_image, quota_key)
+        except ServiceUnavailableException as e:
+            return False, None, e.detail
+
+    async def recognize_invoice_stream(
+        self, base64_image: str, quota_key: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        流式識別發票圖片
+
+        Args:
+            base64_image: Base64 編碼的圖片
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Yields:
+            (事件, 資料) 元組：field、item 事件轉發識別進度，
+            最後以 done（成功）或 error（失敗）事件返回與 RecognizeResponse 相同格式的結果
+        """
+        try:
+            async for event, data in self.ai_service.recognize_invoice_stream(
+                base64_image, quota_key
+            ):
+                if event == "done":
+                    response = RecognizeResponse(
+                        success=True, data=data, message=self._success_message(data)
+                    )
+                    yield "done", response.model_dump()
+                    return
+                yield event, data
+
+            message = "無法識別發票，請確認圖片清晰度或重新上傳"
+        except (ServiceUnavailableError, QuotaExceededError) as e:
+            message = str(e)
+        except Exception as e:
+            message = f"發票識別失敗: {str(e)}"
+
+        yield "error", RecognizeResponse(success=False, data=None, message=message).model_dump()
+
+    async def recognize_invoices(
+        self, base64_images: List[str], quota_key: Optional[str] = None
+    ) -> List[BatchRecognizeItem]:
+        """
+        批量識別發票圖片
+
+        所有圖片並發識別，實際 AI 調用數受自適應並發上限限制，超出的圖片排隊等待
+        （不受 AI_ACQUIRE_TIMEOUT_SECONDS 限制），單張失敗不影響其他圖片。
+
+        Args:
+            base64_images: Base64 編碼的圖片列表
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Returns:
+            與輸入順序一致的識別結果列表
+        """
+        with unbounded_queueing():
+            results = await asyncio.gather(
+                *(self.try_recognize_invoice(image, quota_key) for image in base64_images)
+            )
+        return [
+            BatchRecognizeItem(index=index, success=success, data=data, message=message)
+            for index, (success, data, message) in enumerate(results)
+        ]
+
+    async def save_invoices(
+        self, request: SaveInvoicesRequest, db: Optional[AsyncSession]
+    ) -> tuple[bool, SaveResult, str]:
         """
         保存發票資料
 
+        整批發票先以一次集合查詢分類為新增、重複或衝突，只有新增的發票及項目
+        在同一交易中以批量 INSERT 寫入；使用異步會話，不佔用執行緒池。
+
         Args:
             request: 包含發票資料列表的請求
+            db: 資料庫會話
 
         Returns:
-            (success, message) 元組
+            (success, result, message) 元組
         """
+        if db is None:
+            return False, SaveResult(), "發票保存失敗: 資料庫未連線"
+
         try:
-            invoices = request.invoices
-            count = len(invoices)
+            result = await async_crud_invoice.save_many_with_items(db, invoices=request.invoices)
+            message = f"成功保存 {result.saved} 張發票"
+            if result.duplicates:
+                message += f"，略過 {result.duplicates} 張已保存的發票"
+            if result.conflicts:
+                message += f"，{result.conflicts} 張發票與已保存的同號發票內容不同，未保存"
+            return True, result, message
 
-            # TODO: 實作將發票資料保存到資料庫的邏輯
-            # 目前只是簡單地記錄資料
-            print(f"收到 {count} 張發票資料:")
-            for invoice in invoices:
-                print(f"  - 發票號碼: {invoice.invoiceNumber}, 金額: {invoice.totalAmount}")
+        except Exception as e:
+            return False, SaveResult(), f"發票保存失敗: {str(e)}"
 
-            # 這裡可以添加資料庫保存邏輯
-            # 例如：
-            # for invoice in invoices:
-            #     db.add(invoice)
-            # db.commit()
+    async def search_invoices(
+        self, filters: InvoiceFilter, cursor: Optional[str], page_size: int, db: AsyncSession
+    ) -> Tuple[List[InvoiceRecord], Optional[str]]:
+        """
+        游標分頁查詢已保存的發票
 
-            return True, f"成功保存 {count} 張發票"
+        Args:
+            filters: 查詢條件
+            cursor: 上一頁返回的游標，None 表示第一頁
+            page_size: 每頁數量
+            db: 資料庫會話
 
-        except Exception as e:
-            return False, f"發票保存失敗: {str(e)}"
+        Returns:
+            (發票列表, 下一頁游標) 元組，沒有下一頁時游標為 None
+
+        Raises:
+            InvalidCursorError: 游標無法解析或與排序不符
+        """
+        page = await async_crud_invoice.search(db, filters=filters, cursor=cursor, limit=page_size)
+        return [InvoiceRecord.model_validate(invoice) for invoice in page.items], page.next_cursor
+
+    async def count_invoices(self, filters: InvoiceFilter, db: AsyncSession) -> Tuple[int, bool]:
+        """
+        統計符合條件的已保存發票數量
+
+        沒有查詢條件時優先使用資料庫統計資訊的估算值；精確計數按查詢條件緩存
+        PAGINATION_COUNT_CACHE_SECONDS 秒，翻頁時不重複執行 COUNT(*)
+
+        Args:
+            filters: 查詢條件
+            db: 資料庫會話
+
+        Returns:
+            (數量, 是否為估算值) 元組
+        """
+        if not filters.model_dump(exclude_none=True):
+            estimate = await async_crud_invoice.estimate_count(db)
+            if estimate is not None:
+                return estimate, True
+
+        cache_key = f"invoice:count:{filters.model_dump_json(exclude_none=True)}"
+        total = await cache_service.get(cache_key)
+        if total is None:
+            total = await async_crud_invoice.count_matching(db, filters=filters)
+            await cache_service.set(cache_key, total, settings.PAGINATION_COUNT_CACHE_SECONDS)
+        return total, False
+
+    async def summarize_by_seller(
+        self, filters: InvoiceFilter, limit: int, db: AsyncSession
+    ) -> List[SellerSummary]:
+        """
+        按銷售方合計已保存的發票
+
+        Args:
+            filters: 查詢條件
+            limit: 返回的最大銷售方數
+            db: 資料庫會話
+
+        Returns:
+            各銷售方的合計，按價稅合計降序
+        """
+        rows = await async_crud_invoice.summarize_by_seller(db, filters=filters, limit=limit)
+        return [SellerSummary.model_validate(row) for row in rows]
+
+    async def summarize_by_month(self, filters: InvoiceFilter, db: AsyncSession) -> List[MonthlySummary]:
+        """
+        按開票月份合計已保存的發票
+
+        Args:
+            filters: 查詢條件
+            db: 資料庫會話
+
+        Returns:
+            各月份的合計，按月份升序
+        """
+        rows = await async_crud_invoice.summarize_by_month(db, filters=filters)
+        return [MonthlySummary.model_validate(row) for row in rows]
 
 
 # 創建全局實例
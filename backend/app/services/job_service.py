@@ -0,0 +1,207 @@
+"""識別任務隊列服務 - 進程內異步任務隊列"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.schemas.invoice import InvoiceData
+from app.services.ai_backend import unbounded_queueing
+from app.services.invoice_service import invoice_service
+
+logger = logging.getLogger(__name__)
+
+# 任務狀態
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class RecognitionJob:
+    """識別任務"""
+
+    id: str
+    image: Optional[str]
+    quota_key: Optional[str] = None
+    status: str = JOB_PENDING
+    data: Optional[InvoiceData] = None
+    message: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class RecognitionJobService:
+    """識別任務服務：提交後立即返回任務 ID，由背景 worker 池處理"""
+
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        worker_count: int = 4,
+        ttl_seconds: int = 600,
+    ):
+        """
+        初始化任務服務
+
+        Args:
+            max_queue_size: 等待中任務數上限
+            worker_count: 背景 worker 數
+            ttl_seconds: 任務完成後結果保留時間（秒）
+        """
+        self.max_queue_size = max_queue_size
+        self.worker_count = worker_count
+        self.ttl_seconds = ttl_seconds
+        self.jobs: Dict[str, RecognitionJob] = {}
+        # 已完成任務按完成時間排列（先完成先過期），清理時只需檢查隊首
+        self._finished: Deque[Tuple[float, str]] = deque()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """啟動背景 worker（需在事件循環中調用，重複調用無副作用）"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(index))
+            for index in range(self.worker_count)
+        ]
+        logger.info(f"識別任務隊列已啟動，worker 數: {self.worker_count}")
+
+    async def stop(self) -> None:
+        """停止所有背景 worker"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def submit(self, base64_image: str, quota_key: Optional[str] = None) -> RecognitionJob:
+        """
+        提交識別任務
+
+        Args:
+            base64_image: Base64 編碼的圖片
+            quota_key: AI 用量配額鍵，None 表示不計量
+
+        Returns:
+            新建的任務
+
+        Raises:
+            ServiceUnavailableException: 隊列已滿
+        """
+        self.start()
+        self._purge_expired()
+
+        job = RecognitionJob(id=str(uuid.uuid4()), image=base64_image, quota_key=quota_key)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ServiceUnavailableException(detail="識別任務隊列已滿，請稍後重試")
+
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, quota_key: Optional[str] = None) -> Optional[RecognitionJob]:
+        """
+        根據 ID 獲取任務
+
+        Args:
+            job_id: 任務 ID
+            quota_key: 查詢者的配額鍵，指定時只返回由同一配額鍵提交的任務
+
+        Returns:
+            任務，不存在、已過期或不屬於查詢者時返回 None
+        """
+        job = self.jobs.get(job_id)
+        if job and self._is_expired(job, time.time()):
+            self.jobs.pop(job_id, None)
+            return None
+        if job and quota_key is not None and job.quota_key != quota_key:
+            return None
+        return job
+
+    async def wait(
+        self, job_id: str, timeout: float, quota_key: Optional[str] = None
+    ) -> Optional[RecognitionJob]:
+        """
+        長輪詢：等待任務完成或超時
+
+        Args:
+            job_id: 任務 ID
+            timeout: 最長等待時間（秒）
+            quota_key: 查詢者的配額鍵，指定時只返回由同一配額鍵提交的任務
+
+        Returns:
+            任務（可能仍未完成），不存在或不屬於查詢者時返回 None
+        """
+        job = self.get(job_id, quota_key)
+        if job and timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取隊列統計"""
+        counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {
+            "queue_size": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "workers": len(self._workers),
+            "jobs": counts,
+        }
+
+    async def _worker(self, index: int) -> None:
+        """背景 worker：持續從隊列取出任務並執行識別"""
+        while True:
+            job = await self._queue.get()
+            try:
+                job.status = JOB_RUNNING
+                # 任務已在隊列中排隊，等待 AI 並發名額不再設超時
+                with unbounded_queueing():
+                    success, data, message = await invoice_service.try_recognize_invoice(
+                        job.image, job.quota_key
+                    )
+                job.status = JOB_SUCCEEDED if success else JOB_FAILED
+                job.data = data
+                job.message = message
+            except Exception as e:
+                logger.error(f"識別任務 {job.id} 執行錯誤 (worker {index}): {str(e)}")
+                job.status = JOB_FAILED
+                job.message = f"發票識別失敗: {str(e)}"
+            finally:
+                # 釋放圖片資料，避免已完成任務佔用記憶體
+                job.image = None
+                job.finished_at = time.time()
+                self._finished.append((job.finished_at, job.id))
+                job.done.set()
+                self._queue.task_done()
+
+    def _is_expired(self, job: RecognitionJob, now: float) -> bool:
+        """判斷已完成任務是否超過保留時間"""
+        return job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+
+    def _purge_expired(self) -> None:
+        """清理過期任務（在提交時攤還執行，只檢查已過期的任務，不掃描全部任務）"""
+        now = time.time()
+        while self._finished and now - self._finished[0][0] > self.ttl_seconds:
+            _, job_id = self._finished.popleft()
+            self.jobs.pop(job_id, None)
+
+
+# 創建全局實例
+job_service = RecognitionJobService(
+    max_queue_size=settings.JOB_QUEUE_MAX_SIZE,
+    worker_count=settings.JOB_WORKER_COUNT,
+    ttl_seconds=settings.JOB_TTL_SECONDS,
+)
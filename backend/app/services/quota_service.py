@@ -0,0 +1,296 @@
+"""AI 用量配額服務 - 按使用者統計 token 與圖片流量，滾動日/月窗口限額"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 滾動窗口：名稱 -> (分桶秒數, 分桶數)；日窗口為最近 24 小時，月窗口為最近 30 天
+QUOTA_WINDOWS = {
+    "daily": (3600, 24),
+    "monthly": (86400, 30),
+}
+
+# 統計指標
+USAGE_METRICS = ("tokens", "prompt_tokens", "completion_tokens", "image_bytes", "requests")
+
+
+class QuotaExceededError(Exception):
+    """使用者的 AI 用量已達配額上限，調用方應在調用模型前拒絕"""
+
+
+@dataclass
+class QuotaReservation:
+    """調用模型前預留的用量，調用結束後以實際 token 數結算"""
+
+    key: str
+    estimated_tokens: int
+    image_bytes: int
+    created_at: float = field(default_factory=time.time)
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+    def record_usage(self, usage: Any) -> None:
+        """
+        記錄模型回應中的 token 用量
+
+        Args:
+            usage: OpenAI 相容回應的 usage 物件
+        """
+        self.prompt_tokens = usage.prompt_tokens or 0
+        self.completion_tokens = usage.completion_tokens or 0
+
+
+class MemoryUsageStore:
+    """
+    進程內用量儲存
+
+    每個使用者每個窗口最多保存「分桶數」個計數桶，寫入時清除窗口外的桶；
+    定期清除整個窗口內都沒有用量的使用者。
+    """
+
+    def __init__(self, sweep_interval: float = 3600.0):
+        """
+        Args:
+            sweep_interval: 清除閒置使用者的間隔（秒）
+        """
+        self.sweep_interval = sweep_interval
+        self._buckets: Dict[str, Dict[str, Dict[int, Dict[str, int]]]] = {}
+        self._last_sweep = time.time()
+
+    async def add(self, key: str, values: Dict[str, int], now: float) -> None:
+        """累加用量到 now 所在的各窗口分桶"""
+        self._sweep(now)
+        windows = self._buckets.setdefault(key, {name: {} for name in QUOTA_WINDOWS})
+        for name, (bucket_seconds, bucket_count) in QUOTA_WINDOWS.items():
+            index = int(now // bucket_seconds)
+            buckets = windows[name]
+            bucket = buckets.setdefault(index, {})
+            for metric, amount in values.items():
+                bucket[metric] = bucket.get(metric, 0) + amount
+            for stale in [i for i in buckets if i <= index - bucket_count]:
+                del buckets[stale]
+
+    async def get_usage(self, key: str, now: float) -> Dict[str, Dict[str, int]]:
+        """獲取各窗口內的用量合計"""
+        windows = self._buckets.get(key, {})
+        usage = {}
+        for name, (bucket_seconds, bucket_count) in QUOTA_WINDOWS.items():
+            index = int(now // bucket_seconds)
+            totals = dict.fromkeys(USAGE_METRICS, 0)
+            for bucket_index, bucket in windows.get(name, {}).items():
+                if index - bucket_count < bucket_index <= index:
+                    for metric, amount in bucket.items():
+                        totals[metric] = totals.get(metric, 0) + amount
+            usage[name] = totals
+        return usage
+
+    def _sweep(self, now: float) -> None:
+        """清除最長窗口內沒有任何用量的使用者（按間隔攤銷執行）"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        bucket_seconds, bucket_count = QUOTA_WINDOWS["monthly"]
+        oldest = int(now // bucket_seconds) - bucket_count
+        self._buckets = {
+            key: windows
+            for key, windows in self._buckets.items()
+            if any(index > oldest for index in windows["monthly"])
+        }
+
+
+class RedisUsageStore:
+    """
+    Redis 用量儲存（多 worker / 多主機共享）
+
+    每個分桶是一個 Hash（quota:{使用者}:{窗口}:{分桶序號}），以 HINCRBY 累加並設定
+    過期時間；讀取時以 pipeline 一次往返取回窗口內所有分桶。
+    """
+
+    def __init__(self, redis_url: str, key_prefix: str = "quota:"):
+        """
+        Args:
+            redis_url: Redis 連接 URL
+            key_prefix: 用量鍵前綴
+        """
+        import redis.asyncio as redis
+
+        self.key_prefix = key_prefix
+        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+
+    def _bucket_key(self, key: str, window: str, index: int) -> str:
+        return f"{self.key_prefix}{key}:{window}:{index}"
+
+    async def add(self, key: str, values: Dict[str, int], now: float) -> None:
+        """累加用量到 now 所在的各窗口分桶"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for name, (bucket_seconds, bucket_count) in QUOTA_WINDOWS.items():
+                index = int(now // bucket_seconds)
+                bucket_key = self._bucket_key(key, name, index)
+                for metric, amount in values.items():
+                    pipe.hincrby(bucket_key, metric, amount)
+                pipe.expireat(bucket_key, (index + bucket_count + 1) * bucket_seconds)
+            await pipe.execute()
+
+    async def get_usage(self, key: str, now: float) -> Dict[str, Dict[str, int]]:
+        """獲取各窗口內的用量合計"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for name, (bucket_seconds, bucket_count) in QUOTA_WINDOWS.items():
+                index = int(now // bucket_seconds)
+                for bucket_index in range(index - bucket_count + 1, index + 1):
+                    pipe.hgetall(self._bucket_key(key, name, bucket_index))
+            buckets = iter(await pipe.execute())
+
+        usage = {}
+        for name, (_, bucket_count) in QUOTA_WINDOWS.items():
+            totals = dict.fromkeys(USAGE_METRICS, 0)
+            for _ in range(bucket_count):
+                for metric, amount in next(buckets).items():
+                    totals[metric] = totals.get(metric, 0) + int(amount)
+            usage[name] = totals
+        return usage
+
+
+class QuotaService:
+    """
+    AI 用量配額服務
+
+    調用模型前先按預估 token 數與實際圖片大小預留用量，超過任一配額即回滾並拒絕；
+    調用結束後以回應中的 usage 結算實際 token 數（失敗時退還預估的 token）。
+    """
+
+    def __init__(self, store: Optional[Any] = None):
+        """
+        初始化配額服務
+
+        Args:
+            store: 用量儲存後端，預設啟用 Redis 時使用 Redis，否則使用進程內存
+        """
+        self.store = store or self._create_store()
+        self.rejected = 0
+
+    @staticmethod
+    def _create_store() -> Any:
+        """根據配置建立用量儲存後端"""
+        if settings.REDIS_ENABLED:
+            try:
+                return RedisUsageStore(settings.REDIS_URL)
+            except ImportError:
+                print("警告: Redis 未安裝，AI 用量使用內存統計")
+        return MemoryUsageStore()
+
+    @staticmethod
+    def get_limits() -> Dict[str, Dict[str, int]]:
+        """各窗口的配額上限（0 表示不限制）"""
+        return {
+            "daily": {
+                "tokens": settings.AI_QUOTA_DAILY_TOKENS,
+                "image_bytes": settings.AI_QUOTA_DAILY_IMAGE_BYTES,
+            },
+            "monthly": {
+                "tokens": settings.AI_QUOTA_MONTHLY_TOKENS,
+                "image_bytes": settings.AI_QUOTA_MONTHLY_IMAGE_BYTES,
+            },
+        }
+
+    async def reserve(self, key: Optional[str], image_bytes: int) -> Optional[QuotaReservation]:
+        """
+        調用模型前預留用量
+
+        Args:
+            key: 配額鍵（使用者或客戶端），None 表示不計量
+            image_bytes: 本次發送給模型的圖片位元組數
+
+        Returns:
+            預留記錄，未啟用配額時返回 None
+
+        Raises:
+            QuotaExceededError: 預留後超過任一配額
+        """
+        if not settings.AI_QUOTA_ENABLED or key is None:
+            return None
+
+        reservation = QuotaReservation(
+            key=key,
+            estimated_tokens=settings.AI_QUOTA_TOKEN_ESTIMATE,
+            image_bytes=image_bytes,
+        )
+        values = {
+            "tokens": reservation.estimated_tokens,
+            "image_bytes": image_bytes,
+            "requests": 1,
+        }
+        # 先累加再檢查，多個 worker 並發預留時不會超發
+        try:
+            await self.store.add(key, values, reservation.created_at)
+            usage = await self.store.get_usage(key, reservation.created_at)
+        except Exception as e:
+            # 用量儲存不可用時放行，不因計量故障中斷識別
+            logger.error(f"AI 用量預留失敗 ({key}): {str(e)}")
+            return None
+
+        for window, limits in self.get_limits().items():
+            for metric, limit in limits.items():
+                if limit and usage[window][metric] > limit:
+                    await self.store.add(
+                        key, {name: -amount for name, amount in values.items()}, reservation.created_at
+                    )
+                    self.rejected += 1
+                    window_name = "今日" if window == "daily" else "本月"
+                    metric_name = "token 用量" if metric == "tokens" else "圖片流量"
+                    raise QuotaExceededError(f"{window_name} AI {metric_name}已達上限，請稍後再試")
+
+        return reservation
+
+    async def settle(self, reservation: Optional[QuotaReservation]) -> None:
+        """
+        以實際 token 用量結算預留記錄（計入預留時的分桶）
+
+        Args:
+            reservation: reserve 返回的預留記錄
+        """
+        if reservation is None:
+            return
+
+        if reservation.prompt_tokens is None:
+            # 未取得用量（調用失敗），退還預估的 token
+            values = {"tokens": -reservation.estimated_tokens}
+        else:
+            actual_tokens = reservation.prompt_tokens + reservation.completion_tokens
+            values = {
+                "tokens": actual_tokens - reservation.estimated_tokens,
+                "prompt_tokens": reservation.prompt_tokens,
+                "completion_tokens": reservation.completion_tokens,
+            }
+
+        try:
+            await self.store.add(reservation.key, values, reservation.created_at)
+        except Exception as e:
+            logger.error(f"AI 用量結算失敗 ({reservation.key}): {str(e)}")
+
+    async def get_usage(self, key: str) -> Dict[str, Any]:
+        """
+        獲取使用者目前的用量與配額
+
+        Args:
+            key: 配額鍵
+
+        Returns:
+            各窗口的用量合計與上限
+        """
+        usage = await self.store.get_usage(key, time.time())
+        limits = self.get_limits()
+        return {
+            "key": key,
+            "enabled": settings.AI_QUOTA_ENABLED,
+            **{
+                window: {**usage[window], "limits": limits[window]}
+                for window in QUOTA_WINDOWS
+            },
+        }
+
+
+# 創建全局實例
+quota_service = QuotaService()
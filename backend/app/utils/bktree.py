@@ -0,0 +1,85 @@
+"""BK 樹 - 按 Hamming 距離查詢相近的整數雜湊"""
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _Node:
+    """BK 樹節點"""
+
+    __slots__ = ("key", "value", "children", "alive")
+
+    def __init__(self, key: int, value: Any):
+        self.key = key
+        self.value = value
+        self.children: Dict[int, "_Node"] = {}
+        self.alive = True
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """兩個雜湊的 Hamming 距離"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Hamming 距離的 BK 樹
+
+    查詢距離不超過 d 的鍵時，利用三角不等式只走訪距離在 [dist - d, dist + d] 的子樹。
+    刪除為惰性刪除（標記節點），由調用方在失效節點過多時重建。
+
+    Usage:
+        tree = BKTree()
+        node = tree.add(image_hash, result)
+        matches = tree.search(other_hash, max_distance=8)
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self.size = 0
+
+    def add(self, key: int, value: Any) -> _Node:
+        """
+        添加鍵值
+
+        Returns:
+            新節點（可傳給 remove 刪除）
+        """
+        node = _Node(key, value)
+        self.size += 1
+        if self._root is None:
+            self._root = node
+            return node
+
+        current = self._root
+        while True:
+            distance = hamming_distance(key, current.key)
+            child = current.children.get(distance)
+            if child is None:
+                current.children[distance] = node
+                return node
+            current = child
+
+    def remove(self, node: _Node) -> None:
+        """惰性刪除節點"""
+        if node.alive:
+            node.alive = False
+            self.size -= 1
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """
+        查詢距離不超過 max_distance 的所有值
+
+        Returns:
+            (距離, 值) 列表，按距離由近到遠排序
+        """
+        results: List[Tuple[int, Any]] = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(key, node.key)
+            if node.alive and distance <= max_distance:
+                results.append((distance, node.value))
+            for child_distance, child in node.children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda match: match[0])
+        return results
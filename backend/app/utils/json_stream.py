@@ -0,0 +1,139 @@
+"""增量 JSON 解析工具"""
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+# 頂層狀態
+_EXPECT_KEY = "key"
+_EXPECT_COLON = "colon"
+_EXPECT_VALUE = "value"
+_AFTER_VALUE = "after_value"
+
+
+class StreamingJSONObjectParser:
+    """
+    增量解析流式輸出的 JSON 物件
+
+    每次 feed 一段文字，返回本段內完成的事件：
+    - ("field", 欄位名, 值)：頂層欄位的值已完整
+    - ("item", 欄位名, 元素)：array_fields 中的陣列每完成一個元素即返回
+
+    物件開始前的任意文字（如 markdown 代碼塊標記）會被忽略。
+
+    Usage:
+        parser = StreamingJSONObjectParser(array_fields=("items",))
+        for chunk in chunks:
+            for event, key, value in parser.feed(chunk):
+                ...
+    """
+
+    def __init__(self, array_fields: Sequence[str] = ()):
+        self.array_fields = set(array_fields)
+        self.finished = False
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._state = _EXPECT_KEY
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        """
+        輸入一段文字
+
+        Args:
+            chunk: 新收到的文字
+
+        Returns:
+            本段內完成的事件列表
+        """
+        events: List[Tuple[str, str, Any]] = []
+        self._text += chunk
+        text = self._text
+
+        while self._pos < len(text) and not self.finished:
+            pos = self._pos
+            ch = text[pos]
+            self._pos += 1
+
+            if not self._stack:
+                if ch == "{":
+                    self._stack.append(ch)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._end_top_level_string(pos, events)
+                continue
+
+            depth = len(self._stack)
+            if ch == '"':
+                self._in_string = True
+                if depth == 1 and self._state in (_EXPECT_KEY, _EXPECT_VALUE):
+                    self._token_start = pos
+            elif ch in "{[":
+                if depth == 1 and self._state == _EXPECT_VALUE:
+                    self._token_start = pos
+                elif depth == 2 and ch == "{" and self._in_array_field():
+                    self._element_start = pos
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                depth = len(self._stack)
+                if depth == 2 and ch == "}" and self._element_start is not None:
+                    events.append(("item", self._key, self._loads(self._element_start, pos + 1)))
+                    self._element_start = None
+                elif depth == 1 and self._state == _EXPECT_VALUE:
+                    if self._key not in self.array_fields:
+                        events.append(("field", self._key, self._loads(self._token_start, pos + 1)))
+                    self._state = _AFTER_VALUE
+                elif depth == 0:
+                    self._end_primitive(pos, events)
+                    self.finished = True
+            elif depth == 1:
+                if ch == ":" and self._state == _EXPECT_COLON:
+                    self._state = _EXPECT_VALUE
+                    self._token_start = None
+                elif ch == ",":
+                    self._end_primitive(pos, events)
+                    self._state = _EXPECT_KEY
+                elif not ch.isspace() and self._state == _EXPECT_VALUE and self._token_start is None:
+                    # 數字、布林或 null
+                    self._token_start = pos
+
+        return events
+
+    def _in_array_field(self) -> bool:
+        """目前是否位於需逐一返回元素的陣列欄位中"""
+        return self._stack[1] == "[" and self._key in self.array_fields
+
+    def _end_top_level_string(self, pos: int, events: List[Tuple[str, str, Any]]) -> None:
+        """頂層字串結束：可能是欄位名或字串值"""
+        if self._state == _EXPECT_KEY:
+            self._key = self._loads(self._token_start, pos + 1)
+            self._state = _EXPECT_COLON
+        elif self._state == _EXPECT_VALUE:
+            events.append(("field", self._key, self._loads(self._token_start, pos + 1)))
+            self._state = _AFTER_VALUE
+
+    def _end_primitive(self, pos: int, events: List[Tuple[str, str, Any]]) -> None:
+        """結束尚未完成的頂層數字、布林或 null 值"""
+        if self._state == _EXPECT_VALUE and self._token_start is not None:
+            events.append(("field", self._key, self._loads(self._token_start, pos)))
+            self._state = _AFTER_VALUE
+
+    def _loads(self, start: Optional[int], end: int) -> Any:
+        """解析片段，無法解析時返回原始文字"""
+        raw = self._text[start:end].strip()
+        try:
+            return json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return raw
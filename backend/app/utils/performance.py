@@ -1,39 +1,260 @@
 """性能優化工具"""
+import random
 import time
+from collections import deque
+from contextvars import ContextVar
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Dict, List, Optional
 import logging
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class Span:
+    """
+    一段被追蹤的操作
+
+    時間以 perf_counter_ns 計量（單調、納秒精度），另記錄開始時的 Unix 時間以便導出；
+    trace_id / span_id 與 OpenTelemetry 相同為 128 / 64 位元隨機數。
+    """
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "attributes",
+        "start_ns", "end_ns", "start_unix_ns", "status",
+    )
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: int, parent_id: Optional[int], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.end_ns: Optional[int] = None
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """設置屬性"""
+        self.attributes[key] = value
+
+    @property
+    def duration_ns(self) -> Optional[int]:
+        """耗時（納秒），未結束時為 None"""
+        return self.end_ns - self.start_ns if self.end_ns is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """轉為字典（調試端點輸出）"""
+        duration = self.duration_ns
+        return {
+            "name": self.name,
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id is not None else None,
+            "start_unix_ns": self.start_unix_ns,
+            "duration_ms": round(duration / 1e6, 3) if duration is not None else None,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """轉為 OpenTelemetry OTLP/JSON 格式的 span"""
+        data = {
+            "traceId": f"{self.trace_id:032x}",
+            "spanId": f"{self.span_id:016x}",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_unix_ns),
+            "endTimeUnixNano": str(self.start_unix_ns + (self.duration_ns or 0)),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2 if self.status == "error" else 1},
+        }
+        if self.parent_id is not None:
+            data["parentSpanId"] = f"{self.parent_id:016x}"
+        return data
+
+
+class _NonRecordingSpan:
+    """未被採樣的 span：不計時也不記錄，其子 span 同樣不記錄"""
+
+    __slots__ = ()
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOT_SAMPLED = _NonRecordingSpan()
+
+# 目前所在的 span（隨 contextvars 在 await 與 asyncio 任務間傳遞）
+_current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """轉為 OTLP 屬性格式"""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class SpanRecorder:
+    """已結束 span 的環形緩衝區（只保留最近的 N 個）"""
+
+    def __init__(self, max_spans: int = 2048):
+        self._spans: deque = deque(maxlen=max_spans)
+
+    def record(self, span: Span) -> None:
+        """記錄已結束的 span"""
+        self._spans.append(span)
+
+    def get_spans(self, limit: Optional[int] = None, trace_id: Optional[str] = None) -> List[Span]:
+        """
+        獲取最近的 span（由舊到新）
+
+        Args:
+            limit: 最多返回的數量
+            trace_id: 只返回指定 trace 的 span（十六進位字串）
+        """
+        spans = list(self._spans)
+        if trace_id:
+            spans = [item for item in spans if f"{item.trace_id:032x}" == trace_id.lower()]
+        if limit is not None:
+            spans = spans[-limit:] if limit > 0 else []
+        return spans
+
+    def clear(self) -> None:
+        """清空緩衝區"""
+        self._spans.clear()
+
+    @staticmethod
+    def export_otlp(spans: List[Span]) -> Dict[str, Any]:
+        """
+        導出為 OpenTelemetry OTLP/JSON（ExportTraceServiceRequest）格式，
+        可直接 POST 到 OTLP collector 的 /v1/traces
+        """
+        return {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [_otlp_attribute("service.name", settings.APP_NAME)],
+                },
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [item.to_otlp() for item in spans],
+                }],
+            }],
+        }
+
+
+# 全局 span 緩衝區
+span_recorder = SpanRecorder(settings.TRACE_BUFFER_SIZE)
+
+
+class _SpanScope:
+    """span() 返回的上下文管理器"""
+
+    __slots__ = ("name", "attributes", "_span", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self._span = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is None:
+            if not settings.TRACE_ENABLED or random.random() >= settings.TRACE_SAMPLE_RATE:
+                self._token = _current_span.set(_NOT_SAMPLED)
+                return _NOT_SAMPLED
+            self._span = Span(self.name, random.getrandbits(128), None, self.attributes)
+        elif not parent.recording:
+            return parent
+        else:
+            self._span = Span(self.name, parent.trace_id, parent.span_id, self.attributes)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        current = self._span
+        if current is not None:
+            current.end_ns = time.perf_counter_ns()
+            if exc_type is not None:
+                current.status = "error"
+                current.attributes["exception.type"] = exc_type.__name__
+            span_recorder.record(current)
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # 在不同的上下文中結束（如異步生成器被其他任務關閉），不影響該上下文
+                pass
+
+
+def span(name: str, **attributes: Any) -> _SpanScope:
+    """
+    追蹤一段操作
+
+    根 span 按 TRACE_SAMPLE_RATE 採樣，未採樣的整條 trace 不計時也不記錄；
+    子 span 透過 contextvars 取得父 span，跨 await 與新建的 asyncio 任務均有效。
+    結束的 span 寫入 span_recorder，拋出異常時標記為 error。
+
+    Args:
+        name: span 名稱
+        attributes: 初始屬性
+
+    Usage:
+        with span("ai.preprocess", image_bytes=len(data)) as current:
+            ...
+            current.set_attribute("sent_bytes", size)
+    """
+    return _SpanScope(name, attributes)
+
+
+def current_span() -> Optional[Span]:
+    """獲取目前記錄中的 span，未採樣或不在 span 中時返回 None"""
+    current = _current_span.get()
+    return current if current is not None and current.recording else None
+
+
 def measure_time(func: Callable) -> Callable:
     """
     測量函數執行時間的裝飾器
 
+    以函數名建立 span（寫入 span_recorder，可經調試端點導出），並記錄日誌
+
     Usage:
         @measure_time
         async def my_function():
             ...
     """
+    name = f"{func.__module__}.{func.__qualname__}"
+
     @wraps(func)
     async def async_wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         try:
-            result = await func(*args, **kwargs)
-            return result
+            with span(name):
+                return await func(*args, **kwargs)
         finally:
-            elapsed = time.time() - start_time
+            elapsed = (time.perf_counter_ns() - start_time) / 1e9
             logger.info(f"{func.__name__} 執行時間: {elapsed:.3f}s")
 
     @wraps(func)
     def sync_wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         try:
-            result = func(*args, **kwargs)
-            return result
+            with span(name):
+                return func(*args, **kwargs)
         finally:
-            elapsed = time.time() - start_time
+            elapsed = (time.perf_counter_ns() - start_time) / 1e9
             logger.info(f"{func.__name__} 執行時間: {elapsed:.3f}s")
 
     # 根據函數是否為協程返回對應的包裝器
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+批量 CRUD 基準測試
+
+在 SQLite 檔案資料庫（WAL、外鍵約束，與應用設定一致）上比較：
+- 逐筆 CRUDBase.create / update / delete（每筆各自 commit，create / update 另 refresh）
+- CRUDBase.create_many / update_many / delete_many（按批 executemany，單一交易）
+
+輸出每秒處理筆數、執行的 SQL 語句數與提交次數。本機 SQLite 沒有網路往返，
+--latency-ms 可為每個語句與提交加上固定延遲，近似遠端 MSSQL 的往返開銷。
+以 users 表測試，密碼直接寫入固定雜湊，結果只反映資料庫寫入開銷。
+
+用法:
+    python benchmarks/bench_bulk_crud.py [--rows 5000] [--batch-sizes 100,1000,5000] [--latency-ms 0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pydantic import BaseModel  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.crud.crud_base import CRUDBase  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+HASHED_PASSWORD = "$2b$12$" + "x" * 53
+
+
+class UserRow(BaseModel):
+    """逐筆建立用的 schema（對應 users 表欄位）"""
+
+    username: str
+    email: str
+    hashed_password: str
+
+
+class Counter:
+    """統計語句數與提交次數，並按需加上模擬的往返延遲"""
+
+    def __init__(self, engine, latency: float):
+        self.statements = 0
+        self.commits = 0
+        self.latency = latency
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _on_commit(self, *args):
+        self.commits += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+def build_engine(db_path: str):
+    """建立 SQLite 引擎（外鍵約束、WAL）"""
+    engine = create_engine(f"sqlite:///{db_path}")
+
+    @event.listens_for(engine, "connect")
+    def set_pragma(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def user_rows(prefix: str, count: int):
+    """生成使用者資料列"""
+    return [
+        {
+            "username": f"{prefix}{index}",
+            "email": f"{prefix}{index}@example.com",
+            "hashed_password": HASHED_PASSWORD,
+        }
+        for index in range(count)
+    ]
+
+
+def run(Session, crud: CRUDBase, counter: Counter, rows, batch_size):
+    """
+    依序建立、更新、刪除同一批使用者
+
+    Args:
+        batch_size: 批量大小，None 表示逐筆調用 create / update / delete
+
+    Returns:
+        {操作: (耗時秒數, 語句數, 提交數)}
+    """
+    results = {}
+
+    def record(operation, start):
+        results[operation] = (time.perf_counter() - start, counter.statements, counter.commits)
+        counter.reset()
+
+    counter.reset()
+    with Session() as db:
+        start = time.perf_counter()
+        if batch_size is None:
+            users = [crud.create(db, obj_in=UserRow(**row)) for row in rows]
+        else:
+            users = crud.create_many(db, objs_in=rows, batch_size=batch_size)
+        record("create", start)
+        assert len(users) == len(rows) and all(user.id for user in users)
+
+        start = time.perf_counter()
+        if batch_size is None:
+            for user in users:
+                crud.update(db, db_obj=user, obj_in={"is_active": False})
+        else:
+            updates = [{"id": user.id, "is_active": False} for user in users]
+            crud.update_many(db, objs_in=updates, batch_size=batch_size)
+        record("update", start)
+
+        start = time.perf_counter()
+        if batch_size is None:
+            for user in users:
+                crud.delete(db, id=user.id)
+        else:
+            deleted = crud.delete_many(db, ids=[user.id for user in users], batch_size=batch_size)
+            assert len(deleted) == len(rows)
+        record("delete", start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量 CRUD 基準測試")
+    parser.add_argument("--rows", type=int, default=5000, help="每組測試的筆數")
+    parser.add_argument("--batch-sizes", default="100,1000,5000", help="批量大小，逗號分隔")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每個語句與提交的模擬往返延遲（毫秒）")
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(os.path.join(tmp, "bench.db"))
+        counter = Counter(engine, args.latency_ms / 1000)
+        Session = sessionmaker(bind=engine, expire_on_commit=False)
+        crud = CRUDBase(User)
+
+        cases = [("逐筆", None)] + [(f"批量 {size}", size) for size in batch_sizes]
+        print(f"筆數: {args.rows}，模擬延遲: {args.latency_ms} ms\n")
+        print(f"{'方式':<12} {'操作':<8} {'筆/秒':>10} {'耗時 s':>9} {'語句數':>8} {'提交數':>8}")
+        for index, (name, batch_size) in enumerate(cases):
+            results = run(Session, crud, counter, user_rows(f"r{index}_", args.rows), batch_size)
+            for operation, (elapsed, statements, commits) in results.items():
+                print(
+                    f"{name:<12} {operation:<8} {args.rows / elapsed:>10.0f} "
+                    f"{elapsed:>9.2f} {statements:>8} {commits:>8}"
+                )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
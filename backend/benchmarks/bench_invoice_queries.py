@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+發票查詢與統計基準測試
+
+在合成的 SQLite 發票資料集（預設 100 萬張）上比較：
+- 無查詢索引 vs 有複合索引（ix_invoices_date_amounts 等）時 crud_invoice 的
+  分頁查詢、計數與 GROUP BY 統計耗時
+- 將符合條件的發票全部載入 Python 後再以 paginate / 字典累加處理的耗時
+- OFFSET 分頁與游標分頁在不同頁深的耗時，以及 COUNT(*) 與統計資訊估算總數的耗時
+- 按月合計的三種 SQL 寫法（兩層 GROUP BY、月份運算式 GROUP BY、按日 GROUP BY 後在 Python 合併）
+
+資料庫檔案預設建立在臨時目錄；以 --db 指定路徑時會重用已存在的資料集，
+便於重複測試（首次生成 100 萬張約需半分鐘）。
+
+用法:
+    python benchmarks/bench_invoice_queries.py [--invoices 1000000] [--repeat 5] [--db /tmp/invoices.db]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, func, select, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.crud.crud_base import Keyset  # noqa: E402
+from app.crud.crud_invoice import INVOICE_LIST_ORDER, crud_invoice  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models.invoice import Invoice  # noqa: E402
+from app.schemas.invoice import InvoiceFilter  # noqa: E402
+from app.utils.common import paginate  # noqa: E402
+
+# 查詢用的索引（唯一索引保存時需要，不參與比較）
+QUERY_INDEXES = [
+    index for index in Invoice.__table__.indexes if index.name.startswith("ix_invoices_") and len(index.columns) > 1
+]
+
+START_DATE = date(2022, 1, 1)
+DAYS = 3 * 365
+SELLERS = 5000
+BUYERS = 2000
+BATCH_SIZE = 50000
+
+
+def generate(engine, count: int) -> None:
+    """生成合成資料集（先寫入資料再建立索引；銷售方按 Zipf 分佈，最大銷售方約佔 11%）"""
+    rng = random.Random(42)
+    sellers = range(SELLERS)
+    seller_weights = list(itertools.accumulate(1 / (rank + 1) for rank in sellers))
+    with engine.begin() as conn:
+        for index in QUERY_INDEXES:
+            index.drop(conn, checkfirst=True)
+
+    statement = text(
+        "INSERT INTO invoices (invoice_number, invoice_code, invoice_date, amount, tax_amount, "
+        "total_amount, seller, seller_tax_id, buyer, buyer_tax_id, remarks) "
+        "VALUES (:number, :code, :date, :amount, :tax, :total, :seller, :seller_id, :buyer, :buyer_id, '')"
+    )
+    start = time.perf_counter()
+    for offset in range(0, count, BATCH_SIZE):
+        rows = []
+        for number in range(offset, min(offset + BATCH_SIZE, count)):
+            seller = rng.choices(sellers, cum_weights=seller_weights)[0]
+            buyer = rng.randrange(BUYERS)
+            amount = Decimal(rng.randrange(1000, 10000000)) / 100
+            tax = (amount * Decimal("0.13")).quantize(Decimal("0.01"))
+            rows.append({
+                "number": f"{number:08d}",
+                "code": f"{number % 1000:012d}",
+                "date": (START_DATE + timedelta(days=rng.randrange(DAYS))).isoformat(),
+                "amount": str(amount),
+                "tax": str(tax),
+                "total": str(amount + tax),
+                "seller": f"銷售方 {seller}",
+                "seller_id": f"9131{seller:014d}",
+                "buyer": f"購買方 {buyer}",
+                "buyer_id": f"9144{buyer:014d}",
+            })
+        with engine.begin() as conn:
+            conn.execute(statement, rows)
+        print(f"\r生成資料: {min(offset + BATCH_SIZE, count)}/{count}", end="", flush=True)
+    print(f"\r生成 {count} 張發票: {time.perf_counter() - start:.1f}s" + " " * 20)
+
+
+def set_indexes(engine, enabled: bool) -> float:
+    """建立或刪除查詢索引，返回耗時"""
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for index in QUERY_INDEXES:
+            if enabled:
+                index.create(conn, checkfirst=True)
+            else:
+                index.drop(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+    return time.perf_counter() - start
+
+
+def python_side(db, filters: InvoiceFilter, page: int, page_size: int):
+    """反例：載入所有符合條件的發票，在 Python 中分頁並按銷售方與月份累加"""
+    invoices = db.scalars(select(Invoice).where(*crud_invoice._filter_conditions(filters))).all()
+    invoices = sorted(invoices, key=lambda item: (item.invoice_date, item.id), reverse=True)
+    page_data = paginate(invoices, page, page_size)
+    sellers = defaultdict(lambda: [0, Decimal(0)])
+    months = defaultdict(lambda: [0, Decimal(0)])
+    for invoice in invoices:
+        sellers[invoice.seller_tax_id][0] += 1
+        sellers[invoice.seller_tax_id][1] += invoice.total_amount or 0
+        month = invoice.invoice_date.strftime("%Y-%m")
+        months[month][0] += 1
+        months[month][1] += invoice.total_amount or 0
+    db.expunge_all()
+    return page_data, sellers, months
+
+
+def build_cases(db):
+    """測試案例：(名稱, 查詢函數)"""
+    # 最大銷售方（約 11% 的發票）、中等銷售方（約 0.2%）、任一購買方（約 0.05%）
+    top_seller = f"9131{0:014d}"
+    mid_seller = f"9131{50:014d}"
+    buyer = f"9144{7:014d}"
+    month = InvoiceFilter(date_from=date(2023, 6, 1), date_to=date(2023, 6, 30))
+    quarter = InvoiceFilter(date_from=date(2023, 4, 1), date_to=date(2023, 6, 30))
+    year = InvoiceFilter(date_from=date(2023, 1, 1), date_to=date(2023, 12, 31))
+
+    def listing(filters: InvoiceFilter):
+        return lambda: (
+            crud_invoice.search(db, filters=filters, limit=20),
+            crud_invoice.count_matching(db, filters=filters),
+        )
+
+    return [
+        ("清單: 單月第 1 頁 + 計數", listing(month)),
+        ("清單: 中等銷售方 + 一年", listing(InvoiceFilter(seller_tax_id=mid_seller, **year.model_dump(exclude_none=True)))),
+        ("清單: 購買方 + 單季", listing(InvoiceFilter(buyer_tax_id=buyer, **quarter.model_dump(exclude_none=True)))),
+        ("清單: 單季 + 金額 > 90000", listing(InvoiceFilter(min_amount=Decimal(90000), **quarter.model_dump(exclude_none=True)))),
+        ("統計: 按銷售方（單季）", lambda: crud_invoice.summarize_by_seller(db, filters=quarter, limit=100)),
+        ("統計: 按月（最大銷售方，全部）", lambda: crud_invoice.summarize_by_month(db, filters=InvoiceFilter(seller_tax_id=top_seller))),
+        ("統計: 按月（全部發票）", lambda: crud_invoice.summarize_by_month(db, filters=InvoiceFilter())),
+        ("Python 端: 單季載入後分頁 + 統計", lambda: python_side(db, quarter, 1, 20)),
+    ]
+
+
+def compare_pagination(db, repeat: int) -> None:
+    """比較 OFFSET 分頁與游標分頁在不同深度的耗時（全部發票，按開票日期降序，每頁 20 筆）"""
+    total = crud_invoice.count(db)
+    order = [column.desc() for column, _ in INVOICE_LIST_ORDER]
+    keyset = Keyset.for_model(Invoice, INVOICE_LIST_ORDER)
+    print(f"\n{'頁碼':>8} {'OFFSET ms':>11} {'游標 ms':>9}")
+    for page in (1, 100, 1000, 10000, total // 20 - 1):
+        offset = (page - 1) * 20
+
+        def by_offset():
+            return db.scalars(select(Invoice).order_by(*order).offset(offset).limit(20)).all()
+
+        # 上一頁最後一筆的游標
+        cursor = None
+        if offset:
+            previous = db.scalars(select(Invoice).order_by(*order).offset(offset - 1).limit(1)).one()
+            cursor = keyset.encode(previous)
+
+        def by_cursor():
+            return crud_invoice.search(db, filters=InvoiceFilter(), cursor=cursor, limit=20).items
+
+        assert [item.id for item in by_offset()] == [item.id for item in by_cursor()]
+        print(f"{page:>8} {measure(by_offset, repeat):>11.2f} {measure(by_cursor, repeat):>9.2f}")
+        db.expunge_all()
+
+    exact = measure(lambda: crud_invoice.count(db), repeat)
+    estimate = measure(lambda: crud_invoice.estimate_count(db), repeat)
+    print(f"\n總數: COUNT(*) {exact:.1f} ms，統計資訊估算 {estimate:.2f} ms（{crud_invoice.estimate_count(db)}）")
+
+
+def compare_monthly(db, repeat: int) -> None:
+    """
+    比較按月合計的三種做法（結果須一致）：
+    - 兩層 GROUP BY：內層按日期沿索引彙總，外層按年、月合併（crud_invoice.summarize_by_month）
+    - 直接按 STRFTIME('%Y-%m', invoice_date) GROUP BY（需為每列計算月份並排序）
+    - SQL 按日期 GROUP BY，在 Python 中合併為月份
+    """
+    totals = crud_invoice._totals_columns()
+
+    def by_expression(filters: InvoiceFilter):
+        month = func.strftime("%Y-%m", Invoice.invoice_date)
+        statement = (
+            select(month.label("month"), *totals)
+            .where(Invoice.invoice_date.is_not(None), *crud_invoice._filter_conditions(filters))
+            .group_by(month)
+            .order_by(month)
+        )
+        return [crud_invoice._totals_row(row) for row in db.execute(statement)]
+
+    def by_day_in_python(filters: InvoiceFilter):
+        statement = (
+            select(Invoice.invoice_date, *totals)
+            .where(Invoice.invoice_date.is_not(None), *crud_invoice._filter_conditions(filters))
+            .group_by(Invoice.invoice_date)
+            .order_by(Invoice.invoice_date)
+        )
+        months = {}
+        for row in db.execute(statement):
+            day = crud_invoice._totals_row(row)
+            key = day.pop("invoice_date").strftime("%Y-%m")
+            if key in months:
+                for name, value in day.items():
+                    months[key][name] += value
+            else:
+                months[key] = {**day, "month": key}
+        return list(months.values())
+
+    cases = [
+        ("全部發票", InvoiceFilter()),
+        ("最大銷售方", InvoiceFilter(seller_tax_id=f"9131{0:014d}")),
+        ("一年", InvoiceFilter(date_from=date(2023, 1, 1), date_to=date(2023, 12, 31))),
+    ]
+    print(f"\n{'按月合計':<12} {'兩層 GROUP BY ms':>17} {'月份運算式 ms':>14} {'按日 + Python ms':>17}")
+    for name, filters in cases:
+        def nested():
+            return crud_invoice.summarize_by_month(db, filters=filters)
+
+        expected = nested()
+        assert expected == by_expression(filters) == by_day_in_python(filters)
+        print(
+            f"{name:<12} {measure(nested, repeat):>17.1f} "
+            f"{measure(lambda: by_expression(filters), repeat):>14.1f} "
+            f"{measure(lambda: by_day_in_python(filters), repeat):>17.1f}"
+        )
+
+
+def measure(query, repeat: int) -> float:
+    """執行多次，返回耗時中位數（毫秒）"""
+    query()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="發票查詢與統計基準測試")
+    parser.add_argument("--invoices", type=int, default=1_000_000, help="合成發票數量")
+    parser.add_argument("--repeat", type=int, default=5, help="每個案例的重複次數（取中位數）")
+    parser.add_argument("--db", help="SQLite 資料庫路徑（已存在時重用資料集）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        with engine.begin() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            existing = db.scalar(select(func.count()).select_from(Invoice))
+        if existing == 0:
+            generate(engine, args.invoices)
+        else:
+            print(f"重用資料集: {existing} 張發票")
+
+        results = {}
+        for enabled in (False, True):
+            elapsed = set_indexes(engine, enabled)
+            if enabled:
+                print(f"建立查詢索引: {elapsed:.1f}s")
+            with Session() as db:
+                for name, query in build_cases(db):
+                    results.setdefault(name, {})[enabled] = measure(query, args.repeat)
+
+        print(f"\n{'案例':<34} {'無索引 ms':>11} {'有索引 ms':>11} {'加速比':>8}")
+        for name, timing in results.items():
+            print(
+                f"{name:<34} {timing[False]:>11.1f} {timing[True]:>11.1f} "
+                f"{timing[False] / timing[True]:>7.1f}x"
+            )
+
+        with Session() as db:
+            compare_pagination(db, args.repeat)
+            compare_monthly(db, args.repeat)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+中間件開銷基準測試
+
+比較純 ASGI 的 LoggingMiddleware / RateLimitMiddleware 與舊版
+BaseHTTPMiddleware 實作（每個請求多一個任務與記憶體串流轉發）的
+吞吐量與延遲。直接以 ASGI 介面調用應用，不經網路，結果只反映框架與中間件開銷。
+
+測試兩個端點：
+- /ping：返回小 JSON
+- /stream：StreamingResponse 逐段輸出（另統計首段到達時間）
+
+用法:
+    python benchmarks/bench_middleware.py [--requests 5000] [--concurrency 50] [--chunks 20]
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEBUG", "false")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from app.core.metrics import HTTP_REQUEST_DURATION  # noqa: E402
+from app.core.rate_limiter import MemoryRateLimitStore  # noqa: E402
+from app.middleware.logging import LoggingMiddleware, logger  # noqa: E402
+from app.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.utils.performance import span  # noqa: E402
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """舊版日誌中間件（BaseHTTPMiddleware），記錄的日誌、指標與 span 與純 ASGI 版本相同"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.inner = LoggingMiddleware(app)
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        logger.info(f"請求開始: {request.method} {request.url.path}")
+        with span("http.request", method=request.method, path=request.url.path) as request_span:
+            response = await call_next(request)
+            route = self.inner._route_label(request.scope)
+            request_span.set_attribute("route", route)
+            request_span.set_attribute("status_code", response.status_code)
+        process_time = time.perf_counter() - start_time
+        HTTP_REQUEST_DURATION.labels(request.method, route, response.status_code).observe(process_time)
+        logger.info(f"請求完成: {request.method} {request.url.path} - 狀態碼: {response.status_code}")
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """舊版限流中間件（BaseHTTPMiddleware），重用純 ASGI 版本的規則與限流器"""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(app)
+        self.inner = RateLimitMiddleware(app, **kwargs)
+
+    async def dispatch(self, request: Request, call_next):
+        cost = self.inner.get_cost(request.method, request.url.path)
+        result = await self.inner.limiter.hit(request.client.host, cost)
+        response = await call_next(request)
+        response.headers.update(self.inner._limit_headers(result))
+        return response
+
+
+def build_app(legacy: bool, chunks: int) -> FastAPI:
+    """建立測試應用"""
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def generate():
+            for index in range(chunks):
+                yield f"data: {index}\n\n".encode()
+                await asyncio.sleep(0)
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    limit_options = {"requests_per_minute": 10 ** 9, "store": MemoryRateLimitStore()}
+    if legacy:
+        app.add_middleware(LegacyLoggingMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware, **limit_options)
+    else:
+        app.add_middleware(LoggingMiddleware)
+        app.add_middleware(RateLimitMiddleware, **limit_options)
+    return app
+
+
+async def call(app: FastAPI, path: str, index: int):
+    """以 ASGI 介面發出一個 GET 請求，返回 (首段到達耗時, 總耗時)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        # 每個請求使用不同的客戶端位址，避免限流狀態互相影響
+        "client": (f"10.0.{index // 256 % 256}.{index % 256}", 40000),
+        "server": ("bench", 80),
+        "app": app,
+    }
+    done = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    first_byte = None
+    start = time.perf_counter()
+
+    async def send(message):
+        nonlocal first_byte
+        if message["type"] == "http.response.body":
+            if first_byte is None and message.get("body"):
+                first_byte = time.perf_counter() - start
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    total = time.perf_counter() - start
+    return first_byte if first_byte is not None else total, total
+
+
+def percentile(values, p: float) -> float:
+    """計算百分位數"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)]
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int):
+    """以固定並發數發出請求，返回 (每秒請求數, 首段延遲列表, 總延遲列表)"""
+    # 預熱
+    for index in range(50):
+        await call(app, path, index)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def worker(index: int):
+        async with semaphore:
+            results.append(await call(app, path, index))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, [item[0] for item in results], [item[1] for item in results]
+
+
+async def main_async(args):
+    print(f"請求數: {args.requests}, 並發: {args.concurrency}, 流式段數: {args.chunks}\n")
+    print(f"{'端點':<8} {'實作':<20} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'首段 p99 ms':>12}")
+    for path in ("/ping", "/stream"):
+        for legacy in (True, False):
+            app = build_app(legacy, args.chunks)
+            rps, first, total = await run(app, path, args.requests, args.concurrency)
+            name = "BaseHTTPMiddleware" if legacy else "純 ASGI"
+            print(
+                f"{path:<8} {name:<20} {rps:>10.0f} "
+                f"{percentile(total, 0.5) * 1000:>9.2f} {percentile(total, 0.99) * 1000:>9.2f} "
+                f"{percentile(first, 0.99) * 1000:>12.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中間件開銷基準測試")
+    parser.add_argument("--requests", type=int, default=5000, help="每組測試的請求數")
+    parser.add_argument("--concurrency", type=int, default=50, help="並發請求數")
+    parser.add_argument("--chunks", type=int, default=20, help="流式端點輸出的段數")
+    args = parser.parse_args()
+
+    # 關閉請求日誌輸出，避免終端 I/O 掩蓋中間件本身的開銷
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
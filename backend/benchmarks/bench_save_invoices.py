@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+發票批量保存基準測試
+
+比較逐筆 add/commit/refresh（CRUDBase.create 的寫法）與
+crud_invoice.create_many_with_items 批量寫入的吞吐量。
+
+用法:
+    python benchmarks/bench_save_invoices.py [--invoices 1000] [--items 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models.invoice import Invoice, InvoiceItem  # noqa: E402
+from app.crud.crud_invoice import crud_invoice  # noqa: E402
+from app.schemas.invoice import InvoiceData, InvoiceItem as InvoiceItemSchema  # noqa: E402
+
+
+def make_invoices(count: int, items_per_invoice: int) -> list[InvoiceData]:
+    """生成測試發票資料"""
+    return [
+        InvoiceData(
+            id=str(uuid.uuid4()),
+            invoiceNumber=f"{index:08d}",
+            invoiceCode=f"{index % 1000:012d}",
+            date="2024-01-15",
+            amount="1,000.00",
+            taxAmount="130.00",
+            totalAmount="¥1,130.00",
+            seller=f"銷售方 {index % 50}",
+            sellerTaxId=f"91310000{index % 50:010d}",
+            buyer="購買方股份有限公司",
+            buyerTaxId="913100001234567890",
+            remarks="",
+            items=[
+                InvoiceItemSchema(id=str(uuid.uuid4()), name=f"項目 {n}", quantity="1", price="200.00")
+                for n in range(items_per_invoice)
+            ],
+        )
+        for index in range(count)
+    ]
+
+
+def save_row_by_row(db, invoices: list[InvoiceData]) -> None:
+    """逐筆寫入（每張發票與每個項目各自 add/commit/refresh）"""
+    for invoice in invoices:
+        db_invoice = Invoice(**crud_invoice.to_row(invoice))
+        db.add(db_invoice)
+        db.commit()
+        db.refresh(db_invoice)
+        for item in invoice.items:
+            db_item = InvoiceItem(
+                invoice_id=db_invoice.id, name=item.name, quantity=item.quantity, price=item.price
+            )
+            db.add(db_item)
+            db.commit()
+            db.refresh(db_item)
+
+
+def save_bulk(db, invoices: list[InvoiceData]) -> None:
+    """批量寫入（單一交易）"""
+    crud_invoice.create_many_with_items(db, invoices=invoices)
+
+
+def run(name: str, save, invoices: list[InvoiceData]) -> float:
+    """在全新的 SQLite 檔案資料庫上執行一次寫入並返回耗時"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        with Session() as db:
+            start = time.perf_counter()
+            save(db, invoices)
+            elapsed = time.perf_counter() - start
+            saved = db.query(Invoice).count()
+            items = db.query(InvoiceItem).count()
+        engine.dispose()
+
+    print(
+        f"{name:<12} {elapsed:8.3f}s  {len(invoices) / elapsed:10.1f} 張/秒  "
+        f"(發票 {saved}，項目 {items})"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="發票批量保存基準測試")
+    parser.add_argument("--invoices", type=int, default=1000, help="發票數量")
+    parser.add_argument("--items", type=int, default=5, help="每張發票的項目數")
+    args = parser.parse_args()
+
+    invoices = make_invoices(args.invoices, args.items)
+    print(f"保存 {args.invoices} 張發票（每張 {args.items} 個項目），SQLite 檔案資料庫")
+    row_by_row = run("逐筆寫入", save_row_by_row, invoices)
+    bulk = run("批量寫入", save_bulk, invoices)
+    print(f"加速比: {row_by_row / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
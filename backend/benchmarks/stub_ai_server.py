@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+OpenAI 相容的 AI 後端樁服務（用於本地測試多後端路由、對沖與熔斷）
+
+回應 POST /v1/chat/completions，返回固定的發票 JSON，可配置延遲與失敗率；
+請求帶 stream=true 時以 SSE 逐段輸出（每段間隔 --chunk-delay 秒）。
+
+用法:
+    python benchmarks/stub_ai_server.py --port 9001 --delay 0.2
+    python benchmarks/stub_ai_server.py --port 9002 --delay 3 --fail-rate 0.3
+
+    AI_BACKENDS='["openai", "ollama"]' AI_HEDGE_ENABLED=True AI_HEDGE_DELAY_SECONDS=1 \\
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:9001/v1 \\
+    OLLAMA_BASE_URL=http://127.0.0.1:9002/v1 python run.py
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INVOICE = {
+    "invoiceNumber": "12345678",
+    "invoiceCode": "144031900111",
+    "date": "2024-01-15",
+    "amount": "1000.00",
+    "taxAmount": "130.00",
+    "totalAmount": "1130.00",
+    "seller": "樁服務銷售方",
+    "sellerTaxId": "91310000000000000X",
+    "buyer": "樁服務購買方",
+    "buyerTaxId": "91310000000000001X",
+    "remarks": "",
+    "items": [{"name": "測試項目", "quantity": "1", "price": "1000.00"}],
+}
+
+USAGE = {"prompt_tokens": 800, "completion_tokens": 200, "total_tokens": 1000}
+
+
+def make_handler(name: str, delay: float, fail_rate: float, chunk_delay: float):
+    """建立請求處理類別"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(delay)
+
+            if random.random() < fail_rate:
+                self._send(503, {"error": {"message": f"{name} 暫不可用", "type": "server_error"}})
+                return
+
+            content = json.dumps({**INVOICE, "remarks": f"served by {name}"}, ensure_ascii=False)
+            if request.get("stream"):
+                include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+                self._send_stream(request.get("model", name), content, include_usage)
+                return
+
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", name),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": USAGE,
+            })
+
+        def _send(self, status: int, body: dict):
+            payload = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_stream(self, model: str, content: str, include_usage: bool, chunk_size: int = 16):
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for start in range(0, len(content), chunk_size):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": content[start:start + chunk_size]},
+                        "finish_reason": None,
+                    }],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(chunk_delay)
+            if include_usage:
+                usage_chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": USAGE,
+                }
+                self.wfile.write(f"data: {json.dumps(usage_chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            print(f"[{name}] {format % args}")
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 相容的 AI 後端樁服務")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--name", default=None, help="後端名稱（顯示在回應的 remarks）")
+    parser.add_argument("--delay", type=float, default=0.2, help="每個請求的延遲（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="返回 503 的機率（0-1）")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="流式輸出每段的間隔（秒）")
+    args = parser.parse_args()
+
+    name = args.name or f"stub:{args.port}"
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(name, args.delay, args.fail_rate, args.chunk_delay)
+    )
+    print(f"{name} 監聽於 http://{args.host}:{args.port}/v1 (delay={args.delay}s, fail_rate={args.fail_rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""測試共用設定與 fixture"""
+import asyncio
+import os
+
+# 載入 app 模組前提供必要設定，測試不連接外部服務
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("REDIS_ENABLED", "false")
+os.environ.setdefault("DEBUG", "false")
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+import redis.asyncio  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models import invoice, user  # noqa: E402,F401
+
+
+@pytest.fixture
+def db():
+    """內存 SQLite 資料庫會話（已建立所有資料表，啟用外鍵約束）"""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def set_pragma(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def async_db():
+    """
+    內存 SQLite 異步會話工廠（aiosqlite），返回 (事件循環, 會話工廠)
+
+    測試以 loop.run_until_complete 執行協程，同一測試內的會話共用一個連接
+    """
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    loop.run_until_complete(create_tables())
+    try:
+        yield loop, async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        loop.run_until_complete(engine.dispose())
+        loop.close()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    以 fakeredis（含 Lua 腳本支援）替代 redis.asyncio.from_url，返回共享的 FakeServer
+
+    同一測試內建立的所有客戶端連接同一個伺服器；設定 server.connected = False 可模擬 Redis 不可用
+    """
+    server = fakeredis.FakeServer()
+
+    def from_url(url, decode_responses=False, **kwargs):
+        return fakeredis.FakeAsyncRedis(server=server, decode_responses=decode_responses)
+
+    monkeypatch.setattr(redis.asyncio, "from_url", from_url)
+    return server
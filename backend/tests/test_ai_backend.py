@@ -0,0 +1,134 @@
+"""AI 後端排隊與熔斷測試"""
+import asyncio
+import base64
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.resilience import AdaptiveConcurrencyLimiter, ServiceUnavailableError
+from app.services.ai_backend import AIBackend, unbounded_queueing
+from app.services.invoice_service import invoice_service
+from tests.test_recognition_cache import AI_RESPONSE, make_image
+
+
+class FakeCompletions:
+    """模擬 chat.completions：每次調用耗時 delay 秒，calls 記錄調用次數"""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.calls = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content=AI_RESPONSE)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """並發上限固定為 1、單張排隊超時極短的後端"""
+    monkeypatch.setattr(settings, "AI_ACQUIRE_TIMEOUT_SECONDS", 0.01)
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    backend = AIBackend("openai", client, "gpt-4o-mini")
+    backend.limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+    return backend
+
+
+def call_concurrently(backend: AIBackend, count: int, unbounded: bool):
+    async def main():
+        calls = (backend.create_completion({}) for _ in range(count))
+        if unbounded:
+            with unbounded_queueing():
+                return await asyncio.gather(*calls, return_exceptions=True)
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def open_circuit(backend: AIBackend) -> None:
+    for _ in range(backend.circuit_breaker.failure_threshold):
+        backend.circuit_breaker.record_failure()
+
+
+def encode(image: bytes) -> str:
+    return base64.b64encode(image).decode()
+
+
+def test_single_calls_time_out_in_queue(backend):
+    results = call_concurrently(backend, 3, unbounded=False)
+    errors = [result for result in results if isinstance(result, ServiceUnavailableError)]
+    assert len(errors) == 2
+    # 排隊超時不計為後端失敗
+    assert backend.circuit_breaker.consecutive_failures == 0
+
+
+def test_unbounded_queueing_waits_for_slot(backend):
+    results = call_concurrently(backend, 12, unbounded=True)
+    assert not any(isinstance(result, BaseException) for result in results)
+    assert backend.client.chat.completions.calls == 12
+    assert backend.limiter.waiting == 0 and backend.limiter.in_flight == 0
+
+
+def test_open_circuit_still_fails_fast(backend):
+    open_circuit(backend)
+    results = call_concurrently(backend, 2, unbounded=True)
+    assert all(isinstance(result, ServiceUnavailableError) for result in results)
+    assert backend.client.chat.completions.calls == 0
+
+
+@pytest.fixture
+def use_backend(backend, monkeypatch):
+    """讓全局識別服務只使用測試後端，關閉緩存、查重與配額"""
+    monkeypatch.setattr(settings, "RECOGNITION_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", False)
+    monkeypatch.setattr(settings, "AI_QUOTA_ENABLED", False)
+    monkeypatch.setattr(invoice_service.ai_service, "backends", [backend])
+    return backend
+
+
+def test_batch_of_twelve_queues_without_timeout(use_backend):
+    backend = use_backend
+    images = [encode(make_image((index * 20, 0, 0))) for index in range(12)]
+
+    items = asyncio.run(invoice_service.recognize_invoices(images))
+
+    assert [item.success for item in items] == [True] * 12
+    assert backend.client.chat.completions.calls == 12
+
+
+def test_single_image_raises_503_with_retry_after(use_backend):
+    open_circuit(use_backend)
+
+    async def main():
+        with pytest.raises(ServiceUnavailableException) as single:
+            await invoice_service.recognize_invoice(encode(make_image()))
+        with pytest.raises(ServiceUnavailableException) as upload:
+            await invoice_service.recognize_invoice_bytes(make_image(), "image/png")
+        return single.value, upload.value
+
+    for error in asyncio.run(main()):
+        assert error.status_code == 503
+        assert "熔斷" in error.detail
+        retry_after = int(error.headers["Retry-After"])
+        assert 1 <= retry_after <= settings.AI_CIRCUIT_RECOVERY_SECONDS
+
+
+def test_batch_reports_unavailable_per_item(use_backend):
+    open_circuit(use_backend)
+    items = asyncio.run(invoice_service.recognize_invoices([encode(make_image())] * 2))
+    assert [item.success for item in items] == [False, False]
+    assert all("熔斷" in item.message for item in items)
+
+
+def test_exception_handler_sends_retry_after():
+    from app.main import custom_exception_handler
+
+    response = asyncio.run(
+        custom_exception_handler(None, ServiceUnavailableException(detail="忙碌", retry_after=2.2))
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,155 @@
+"""兩層緩存（L1 + Redis）與 pub/sub 失效通知測試"""
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.config import settings
+from app.core.cache import CacheService
+
+
+def make_service(server) -> CacheService:
+    """建立連接 fakeredis 的兩層緩存（模擬一個 worker）"""
+    service = CacheService(use_redis=True, redis_url="redis://fake", max_entries=100)
+    service.redis_client = fakeredis.FakeAsyncRedis(server=server)
+    return service
+
+
+async def wait_for(condition, timeout: float = 3.0) -> None:
+    """等待條件成立（訂閱與通知在背景任務中進行）"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("等待逾時")
+        await asyncio.sleep(0.01)
+
+
+async def set_and_propagate(writer: CacheService, reader: CacheService, mapping, expire_seconds=60):
+    """寫入並等待另一個 worker 收到失效通知（避免遲到的通知刪除其後回填的 L1 副本）"""
+    received = reader.invalidations_received
+    await writer.set_many(mapping, expire_seconds)
+    await wait_for(lambda: reader.invalidations_received > received)
+
+
+@pytest.fixture
+def workers(fake_redis, monkeypatch):
+    """兩個共用同一 Redis 的緩存服務，已訂閱失效通知"""
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", True)
+    monkeypatch.setattr(settings, "REDIS_RETRY_SECONDS", 0.05)
+    services = [make_service(fake_redis), make_service(fake_redis)]
+
+    async def start():
+        for service in services:
+            await service.get("warmup")
+            await wait_for(lambda: service._subscribed)
+
+    async def stop():
+        for service in services:
+            await service.close()
+
+    return services, start, stop
+
+
+def run(workers, scenario):
+    services, start, stop = workers
+
+    async def main():
+        await start()
+        try:
+            return await scenario(*services)
+        finally:
+            await stop()
+
+    return asyncio.run(main())
+
+
+def test_l2_hit_fills_l1(workers):
+    async def scenario(a, b):
+        await set_and_propagate(a, b, {"k": {"v": 1}})
+        assert await b.get("k") == {"v": 1}
+        assert await b.get("k") == {"v": 1}
+        return b.get_stats()
+
+    stats = run(workers, scenario)
+    assert (stats["l2"]["hits"], stats["l1"]["hits"]) == (1, 1)
+    assert stats["l1"]["subscribed"]
+
+
+def test_write_invalidates_other_workers_l1(workers):
+    async def scenario(a, b):
+        await set_and_propagate(a, b, {"k": {"v": 1}})
+        assert await b.get("k") == {"v": 1}
+        await set_and_propagate(a, b, {"k": {"v": 2}})
+        return await b.get("k"), a.invalidations_received
+
+    value, own_received = run(workers, scenario)
+    assert value == {"v": 2}
+    # 自己發布的通知不處理
+    assert own_received == 0
+
+
+def test_delete_and_clear_invalidate_l1(workers):
+    async def scenario(a, b):
+        await set_and_propagate(a, b, {"x": 1, "y": 2})
+        assert await b.get_many(["x", "y"]) == {"x": 1, "y": 2}
+        received = b.invalidations_received
+        await a.delete("x")
+        await wait_for(lambda: b.invalidations_received == received + 1)
+        after_delete = await b.get_many(["x", "y"])
+        await a.clear()
+        await wait_for(lambda: b.invalidations_received == received + 2)
+        return after_delete, await b.get_many(["x", "y"]), b._memory_cache.get_stats()["entries"]
+
+    after_delete, after_clear, entries = run(workers, scenario)
+    assert after_delete == {"y": 2}
+    assert after_clear == {}
+    assert entries == 0
+
+
+def test_l1_ttl_is_capped(workers, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_L1_TTL_SECONDS", 0.05)
+
+    async def scenario(a, b):
+        await set_and_propagate(a, b, {"k": "old"})
+        assert await b.get("k") == "old"
+        # 直接改寫 Redis（不發通知），L1 副本在 CACHE_L1_TTL_SECONDS 後失效
+        await a.redis_client.set("k", b'"new"')
+        assert await b.get("k") == "old"
+        await asyncio.sleep(0.06)
+        return await b.get("k")
+
+    assert run(workers, scenario) == "new"
+
+
+def test_unsubscribed_worker_does_not_use_l1(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", True)
+    service = make_service(fake_redis)
+
+    async def main():
+        try:
+            # 首次讀取時才啟動訂閱，訂閱完成前的讀寫都直接走 Redis
+            await service.set("k", 1, 60)
+            hit = await service.get("k")
+            return hit, service._memory_cache.get_stats()["entries"]
+        finally:
+            await service.close()
+
+    assert asyncio.run(main()) == (1, 0)
+
+
+def test_redis_outage_falls_back_to_memory(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_RETRY_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", False)
+    service = make_service(fake_redis)
+    fake_redis.connected = False
+
+    async def main():
+        try:
+            await service.set("k", {"v": 1}, 60)
+            return await service.get("k")
+        finally:
+            await service.close()
+
+    assert asyncio.run(main()) == {"v": 1}
+    stats = service.get_stats()
+    assert stats["redis_errors"] == 1 and stats["degraded"]
@@ -0,0 +1,191 @@
+"""游標（keyset）分頁測試"""
+import base64
+from datetime import date
+
+import orjson
+import pytest
+from sqlalchemy import select
+
+from app.crud import crud_base as crud_base_module
+from app.crud.crud_base import AsyncCRUDBase, CRUDBase, InvalidCursorError, Keyset
+from app.crud.crud_invoice import INVOICE_LIST_ORDER
+from app.models.invoice import Invoice
+from app.models.user import User
+
+
+def add_invoices(db, dates):
+    """按順序寫入指定開票日期的發票，返回 ID 列表"""
+    invoices = [Invoice(invoice_number=f"{n:03d}", invoice_date=day) for n, day in enumerate(dates)]
+    db.add_all(invoices)
+    db.commit()
+    return [invoice.id for invoice in invoices]
+
+
+def walk(db, crud, order_by, limit):
+    """依序取完所有頁面，返回 ID 列表"""
+    ids, cursor = [], None
+    while True:
+        page = crud.get_page(db, cursor=cursor, limit=limit, order_by=order_by)
+        assert len(page.items) <= limit
+        ids.extend(row.id for row in page.items)
+        if not page.has_more:
+            return ids
+        cursor = page.next_cursor
+
+
+class TestKeyset:
+    def test_for_model_appends_primary_key(self):
+        assert Keyset.for_model(Invoice).keys == [(Invoice.id, False)]
+        keyset = Keyset.for_model(Invoice, [(Invoice.invoice_date, True)])
+        assert keyset.keys == [(Invoice.invoice_date, True), (Invoice.id, True)]
+        assert Keyset.for_model(Invoice, INVOICE_LIST_ORDER).keys == list(INVOICE_LIST_ORDER)
+
+    def test_nullable_leading_column_has_two_segments(self):
+        assert Keyset.for_model(Invoice, INVOICE_LIST_ORDER).segments == ["value", "null"]
+        assert Keyset.for_model(Invoice, [(Invoice.invoice_date, False)]).segments == ["null", "value"]
+        assert Keyset.for_model(Invoice).segments == ["value"]
+
+    @pytest.mark.parametrize("invoice_date", [date(2024, 1, 15), None])
+    def test_encode_decode_round_trip(self, invoice_date):
+        keyset = Keyset.for_model(Invoice, INVOICE_LIST_ORDER)
+        cursor = keyset.encode(Invoice(id=42, invoice_date=invoice_date))
+        assert "=" not in cursor
+        segment, values = keyset.decode(cursor)
+        assert segment == ("value" if invoice_date else "null")
+        assert values == [invoice_date, 42]
+        # 從游標所在的分段繼續，NULL 段之後沒有其他分段
+        assert keyset.start(cursor) == (["value", "null"] if invoice_date else ["null"], values)
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not base64!",
+            base64.urlsafe_b64encode(b"[1, 2]").decode(),
+            base64.urlsafe_b64encode(b"{}").decode(),
+        ],
+    )
+    def test_malformed_cursor(self, cursor):
+        keyset = Keyset.for_model(Invoice, INVOICE_LIST_ORDER)
+        with pytest.raises(InvalidCursorError):
+            keyset.decode(cursor)
+
+    def test_cursor_from_other_ordering_is_rejected(self):
+        cursor = Keyset.for_model(Invoice).encode(Invoice(id=1))
+        with pytest.raises(InvalidCursorError, match="不符"):
+            Keyset.for_model(Invoice, INVOICE_LIST_ORDER).decode(cursor)
+
+    def test_cursor_with_wrong_value_type_is_rejected(self):
+        keyset = Keyset.for_model(Invoice, INVOICE_LIST_ORDER)
+        payload = {"s": keyset.signature, "g": 0, "v": ["2024-01-15", "42"]}
+        cursor = base64.urlsafe_b64encode(orjson.dumps(payload)).decode()
+        with pytest.raises(InvalidCursorError):
+            keyset.decode(cursor)
+
+    def test_conditions_select_rows_after_cursor(self, db):
+        dates = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 2), None, date(2024, 1, 3), None]
+        add_invoices(db, dates)
+        keyset = Keyset.for_model(Invoice, INVOICE_LIST_ORDER)
+        ordered = db.scalars(select(Invoice).order_by(*keyset.order_clause())).all()
+
+        for position, row in enumerate(ordered):
+            segment, values = keyset.decode(keyset.encode(row))
+            after = []
+            for current in keyset.segments[keyset.segments.index(segment):]:
+                statement = (
+                    select(Invoice.id)
+                    .where(*keyset.conditions(current, values))
+                    .order_by(*keyset.order_clause())
+                )
+                after.extend(db.scalars(statement).all())
+                values = None
+            assert after == [invoice.id for invoice in ordered[position + 1:]]
+
+
+class TestGetPage:
+    @pytest.mark.parametrize("limit", [1, 2, 4, 100])
+    def test_walks_rows_in_order(self, db, limit):
+        dates = [date(2024, 1, 1), None, date(2024, 1, 3), date(2024, 1, 1), None, date(2024, 1, 2)]
+        add_invoices(db, dates)
+        crud = CRUDBase(Invoice)
+        for order_by in (INVOICE_LIST_ORDER, [(Invoice.invoice_date, False)], None):
+            keyset = Keyset.for_model(Invoice, order_by)
+            expected = db.scalars(select(Invoice.id).order_by(*keyset.order_clause())).all()
+            assert walk(db, crud, order_by, limit) == expected
+
+    def test_non_nullable_ordering(self, db):
+        db.add_all(User(username=f"u{n % 3}{n}", email=f"{n}@example.com", hashed_password="x") for n in range(7))
+        db.commit()
+        crud = CRUDBase(User)
+        order_by = [(User.username, False)]
+        expected = db.scalars(select(User.id).order_by(User.username, User.id)).all()
+        assert walk(db, crud, order_by, 3) == expected
+
+    def test_conditions_and_empty_result(self, db):
+        add_invoices(db, [date(2024, 1, 1), date(2024, 2, 1)])
+        crud = CRUDBase(Invoice)
+        page = crud.get_page(db, limit=10, conditions=[Invoice.invoice_date > date(2024, 1, 15)])
+        assert [invoice.invoice_number for invoice in page.items] == ["001"]
+        assert not page.has_more
+        assert crud.get_page(db, conditions=[Invoice.id < 0]).items == []
+
+
+def users(count, start=0):
+    return [
+        {"username": f"user{n}", "email": f"{n}@example.com", "hashed_password": "x"}
+        for n in range(start, start + count)
+    ]
+
+
+class TestBulk:
+    @pytest.fixture(params=[True, False], ids=["returning", "fallback"])
+    def crud(self, request, db, monkeypatch):
+        """按 RETURNING 支持與否分別測試兩種寫入方式"""
+        if not request.param:
+            monkeypatch.setattr(crud_base_module, "_insert_returning", lambda dialect: False)
+            monkeypatch.setattr(db.get_bind().dialect, "delete_returning", False)
+        return CRUDBase(User)
+
+    def test_create_many_keeps_input_order(self, crud, db):
+        created = crud.create_many(db, objs_in=users(5), batch_size=2)
+        assert [user.username for user in created] == [f"user{n}" for n in range(5)]
+        assert [user.id for user in created] == sorted(user.id for user in created)
+        assert all(user.is_active for user in created)
+        assert crud.count(db) == 5
+
+    def test_update_many_ignores_unknown_fields(self, crud, db):
+        created = crud.create_many(db, objs_in=users(3))
+        updated = crud.update_many(
+            db,
+            objs_in=[{"id": user.id, "is_active": False, "unknown": 1} for user in created[:2]],
+            batch_size=1,
+        )
+        assert updated == 2
+        assert crud.count(db, conditions=[User.is_active.is_(False)]) == 2
+
+    def test_delete_many_returns_existing_ids(self, crud, db):
+        ids = [user.id for user in crud.create_many(db, objs_in=users(4))]
+        deleted = crud.delete_many(db, ids=ids[:3] + [9999], batch_size=2)
+        assert sorted(deleted) == ids[:3]
+        assert [user.id for user in crud.get_page(db).items] == ids[3:]
+
+
+def test_async_crud_base(async_db):
+    loop, session_factory = async_db
+    crud = AsyncCRUDBase(User)
+
+    async def main():
+        async with session_factory() as db:
+            created = await crud.create_many(db, objs_in=users(5), batch_size=2)
+            ids = [user.id for user in created]
+            await crud.update_many(db, objs_in=[{"id": ids[0], "is_active": False}])
+            deleted = await crud.delete_many(db, ids=ids[3:])
+            first = await crud.get_page(db, limit=2)
+            second = await crud.get_page(db, cursor=first.next_cursor, limit=2)
+            inactive = await crud.count(db, conditions=[User.is_active.is_(False)])
+            return ids, deleted, first, second, inactive, await crud.count(db)
+
+    ids, deleted, first, second, inactive, total = loop.run_until_complete(main())
+    assert sorted(deleted) == ids[3:]
+    assert [user.id for user in first.items + second.items] == ids[:3]
+    assert first.has_more and not second.has_more
+    assert (inactive, total) == (1, 3)
@@ -0,0 +1,167 @@
+"""發票唯一鍵分類、批量保存與統計測試"""
+import importlib
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.crud import async_crud_invoice, crud_invoice
+from app.crud.crud_invoice import SAVE_CONFLICT, SAVE_DUPLICATE, SAVE_NEW, parse_amount, parse_date
+from app.models.invoice import Invoice, InvoiceItem
+from app.schemas.invoice import InvoiceData, InvoiceFilter, InvoiceItem as InvoiceItemData
+
+# app.crud 重新導出的 crud_invoice 實例與模組同名，以 importlib 取得模組本身
+crud_invoice_module = importlib.import_module("app.crud.crud_invoice")
+
+
+def make_invoice(number: str, total: str = "113.00", day: str = "2024-01-15", **fields) -> InvoiceData:
+    """建立測試用發票資料"""
+    data = {
+        "id": number or "blank",
+        "invoiceNumber": number,
+        "invoiceCode": "044001",
+        "date": day,
+        "amount": "100.00",
+        "taxAmount": "13.00",
+        "totalAmount": total,
+        "seller": "測試商店",
+        "sellerTaxId": "91440000TEST",
+        "buyer": "",
+        "buyerTaxId": "",
+        "remarks": "",
+        "items": [InvoiceItemData(id="1", name="咖啡", quantity="1", price="100.00")],
+    }
+    data.update(fields)
+    return InvoiceData(**data)
+
+
+def rows(*invoices: InvoiceData):
+    return [crud_invoice.to_row(invoice) for invoice in invoices]
+
+
+def test_to_row_parses_amounts_and_dates():
+    row = crud_invoice.to_row(make_invoice("001", total="¥1,234.5", day="2024-02-29"))
+    assert row["total_amount"] == Decimal("1234.50")
+    assert row["invoice_date"] == date(2024, 2, 29)
+    assert parse_amount("") is None and parse_amount("--") is None
+    assert parse_date("2024/02/29") is None
+
+
+class TestClassify:
+    def test_against_saved_invoices(self, db):
+        crud_invoice.save_many_with_items(db, invoices=[make_invoice("001"), make_invoice("002")])
+        statuses = crud_invoice.classify(
+            db,
+            rows(
+                make_invoice("001"),
+                make_invoice("002", total="999.00"),
+                make_invoice("003"),
+                make_invoice("001", sellerTaxId="OTHER"),
+            ),
+        )
+        assert statuses == [SAVE_DUPLICATE, SAVE_CONFLICT, SAVE_NEW, SAVE_NEW]
+
+    def test_within_batch(self, db):
+        statuses = crud_invoice.classify(
+            db,
+            rows(make_invoice("001"), make_invoice("001"), make_invoice("001", total="1.00")),
+        )
+        assert statuses == [SAVE_NEW, SAVE_DUPLICATE, SAVE_CONFLICT]
+
+    def test_blank_number_is_always_new(self, db):
+        crud_invoice.save_many_with_items(db, invoices=[make_invoice("")])
+        assert crud_invoice.classify(db, rows(make_invoice(""), make_invoice(""))) == [SAVE_NEW, SAVE_NEW]
+
+    def test_lookup_is_chunked(self, db, monkeypatch):
+        monkeypatch.setattr(crud_invoice_module, "KEY_LOOKUP_CHUNK_SIZE", 2)
+        invoices = [make_invoice(f"{n:03d}") for n in range(5)]
+        crud_invoice.save_many_with_items(db, invoices=invoices)
+        statements = list(crud_invoice._key_lookup_statements(rows(*invoices)))
+        assert len(statements) == 3
+        assert crud_invoice.classify(db, rows(*invoices)) == [SAVE_DUPLICATE] * 5
+
+
+def test_save_many_with_items_skips_duplicates_and_conflicts(db):
+    first = crud_invoice.save_many_with_items(
+        db, invoices=[make_invoice("001"), make_invoice("002"), make_invoice("001")]
+    )
+    assert (first.saved, first.duplicates, first.conflicts) == (2, 1, 0)
+
+    second = crud_invoice.save_many_with_items(
+        db, invoices=[make_invoice("001"), make_invoice("002", total="1.00"), make_invoice("003")]
+    )
+    assert (second.saved, second.duplicates, second.conflicts) == (1, 1, 1)
+    assert db.query(Invoice).count() == 3
+    assert db.query(InvoiceItem).count() == 3
+    for invoice in db.query(Invoice):
+        assert [item.name for item in invoice.items] == ["咖啡"]
+
+
+
+def test_summarize_by_month(db):
+    crud_invoice.save_many_with_items(
+        db,
+        invoices=[
+            make_invoice("001", day="2024-01-05"),
+            make_invoice("002", day="2024-01-31"),
+            make_invoice("003", day="2024-03-01", total="50.00"),
+            make_invoice("004", day=""),
+        ],
+    )
+    months = crud_invoice.summarize_by_month(db, filters=InvoiceFilter())
+    assert [(row["month"], row["count"]) for row in months] == [("2024-01", 2), ("2024-03", 1)]
+    assert Decimal(str(months[0]["total_amount"])) == Decimal("226.00")
+
+    filtered = crud_invoice.summarize_by_month(db, filters=InvoiceFilter(date_from=date(2024, 2, 1)))
+    assert [row["month"] for row in filtered] == ["2024-03"]
+
+
+
+def test_async_save_and_stats(async_db):
+    loop, Session = async_db
+
+    async def run():
+        async with Session() as db:
+            first = await async_crud_invoice.save_many_with_items(
+                db, invoices=[make_invoice("001", day="2024-01-05"), make_invoice("002", day="2024-02-01")]
+            )
+            second = await async_crud_invoice.save_many_with_items(
+                db, invoices=[make_invoice("001", day="2024-01-05"), make_invoice("002", total="1.00")]
+            )
+            filters = InvoiceFilter(seller_tax_id="91440000TEST")
+            count = await async_crud_invoice.count_matching(db, filters=filters)
+            months = await async_crud_invoice.summarize_by_month(db, filters=filters)
+            sellers = await async_crud_invoice.summarize_by_seller(db, filters=filters)
+            return first, second, count, months, sellers
+
+    first, second, count, months, sellers = loop.run_until_complete(run())
+    assert (first.saved, second.saved, second.duplicates, second.conflicts) == (2, 0, 1, 1)
+    assert count == 2
+    assert [row["month"] for row in months] == ["2024-01", "2024-02"]
+    assert sellers[0]["count"] == 2
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_search_pages_cover_all_rows(db, limit):
+    days = ["2024-01-01", "", "2024-01-02", "2024-01-01", "", "2024-01-03"]
+    crud_invoice.save_many_with_items(
+        db, invoices=[make_invoice(f"{n:03d}", day=day) for n, day in enumerate(days)]
+    )
+    seen, cursor = [], None
+    while True:
+        page = crud_invoice.search(db, filters=InvoiceFilter(), cursor=cursor, limit=limit)
+        seen.extend(invoice.id for invoice in page.items)
+        if not page.has_more:
+            break
+        cursor = page.next_cursor
+
+    # 日期降序、ID 降序，沒有日期的發票排在最後
+    expected = [
+        invoice.id
+        for invoice in sorted(
+            db.query(Invoice),
+            key=lambda invoice: (invoice.invoice_date is not None, invoice.invoice_date or date.min, invoice.id),
+            reverse=True,
+        )
+    ]
+    assert seen == expected
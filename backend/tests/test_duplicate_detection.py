@@ -0,0 +1,194 @@
+"""BK 樹與近似重複檢測測試"""
+import asyncio
+import base64
+import random
+
+import pytest
+
+from app.config import settings
+from app.services import ai_service as ai_service_module
+from app.services.ai_service import AIService
+from app.services.duplicate_service import DuplicateService, RecentHashIndex
+from app.utils.bktree import BKTree, hamming_distance
+from tests.test_recognition_cache import AI_RESPONSE, make_image
+
+
+def flip(value: int, *bits: int) -> int:
+    """翻轉指定位元"""
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(0, 2 ** 64 - 1) == 64
+
+
+class TestBKTree:
+    def test_empty_tree(self):
+        assert BKTree().search(123, 64) == []
+
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        keys = [rng.getrandbits(64) for _ in range(500)]
+        # 加入若干相近雜湊，確保小距離查詢有結果
+        keys += [flip(keys[0], *rng.sample(range(64), n)) for n in range(1, 12)]
+        tree = BKTree()
+        for index, key in enumerate(keys):
+            tree.add(key, index)
+
+        for query in keys[:20] + [rng.getrandbits(64) for _ in range(20)]:
+            for max_distance in (0, 4, 8, 24):
+                expected = sorted(
+                    (hamming_distance(query, key), index)
+                    for index, key in enumerate(keys)
+                    if hamming_distance(query, key) <= max_distance
+                )
+                found = tree.search(query, max_distance)
+                assert sorted(found) == expected
+                assert [distance for distance, _ in found] == sorted(d for d, _ in expected)
+
+    def test_remove_hides_node(self):
+        tree = BKTree()
+        first = tree.add(0b1111, "a")
+        tree.add(0b0111, "b")
+        tree.remove(first)
+        tree.remove(first)
+        assert tree.size == 1
+        # 已刪除的節點仍保留子樹
+        assert tree.search(0b1111, 1) == [(1, "b")]
+
+
+class TestRecentHashIndex:
+    def test_returns_closest_match(self):
+        index = RecentHashIndex(max_entries=10, window_seconds=60)
+        index.add(0, "far", now=0)
+        index.add(flip(0, 1), "near", now=0)
+        assert index.find(flip(0, 1, 2), max_distance=8, now=1) == ("near", 1)
+        assert index.find(flip(0, *range(20)), max_distance=8, now=1) is None
+
+    def test_window_expiry(self):
+        index = RecentHashIndex(max_entries=10, window_seconds=60)
+        index.add(42, "old", now=0)
+        index.add(7, "new", now=30)
+        assert index.find(42, 0, now=60) == ("old", 0)
+        assert index.find(42, 0, now=61) is None
+        assert len(index) == 1
+        assert index.find(7, 0, now=61) == ("new", 0)
+
+    def test_max_entries_and_rebuild(self):
+        index = RecentHashIndex(max_entries=3, window_seconds=3600)
+        for value in range(20):
+            index.add(value << 8, value, now=value)
+        assert len(index) == 3
+        # 失效節點多於有效節點時重建，樹中只剩最近的記錄
+        assert index._tree.size == 3
+        assert index._dead <= len(index)
+        assert index.find(0, 0, now=20) is None
+        assert index.find(19 << 8, 0, now=20) == (19, 0)
+
+
+class TestDuplicateService:
+    @pytest.fixture
+    def service(self, monkeypatch):
+        monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", True)
+        monkeypatch.setattr(settings, "DUPLICATE_MAX_DISTANCE", 4)
+        monkeypatch.setattr(settings, "DUPLICATE_MAX_PER_USER", 10)
+        monkeypatch.setattr(settings, "DUPLICATE_WINDOW_SECONDS", 3600)
+        monkeypatch.setattr(settings, "DUPLICATE_MAX_USERS", 2)
+        return DuplicateService()
+
+    def test_matches_are_scoped_per_user(self, service):
+        service.add("user:1", 0xFF00, "invoice")
+        assert service.find("user:1", flip(0xFF00, 3)) == ("invoice", 1)
+        assert service.find("user:2", 0xFF00) is None
+        assert service.find("user:1", flip(0xFF00, *range(5))) is None
+        assert service.get_stats()["checks"] == 3
+        assert service.get_stats()["matches"] == 1
+
+    def test_least_recently_used_user_is_evicted(self, service):
+        service.add("user:1", 1, "a")
+        service.add("user:2", 2, "b")
+        service.find("user:1", 1)
+        service.add("user:3", 3, "c")
+        assert service.find("user:1", 1) == ("a", 0)
+        assert service.find("user:2", 2) is None
+        assert service.get_stats()["users"] == 2
+
+    def test_disabled_or_missing_key(self, service, monkeypatch):
+        service.add(None, 1, "a")
+        service.add("user:1", None, "a")
+        assert service.get_stats()["users"] == 0
+        service.add("user:1", 1, "a")
+        monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", False)
+        assert service.find("user:1", 1) is None
+
+
+class TestCacheHitDuplicates:
+    @pytest.fixture
+    def service(self, monkeypatch):
+        """啟用識別緩存與近似重複檢測的識別服務，model_calls 記錄調用次數"""
+        monkeypatch.setattr(settings, "RECOGNITION_CACHE_ENABLED", True)
+        monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", True)
+        monkeypatch.setattr(settings, "DUPLICATE_ACTION", "flag")
+        monkeypatch.setattr(settings, "AI_QUOTA_ENABLED", False)
+        monkeypatch.setattr(ai_service_module, "duplicate_service", DuplicateService())
+        service = AIService()
+        service.model_calls = 0
+
+        async def call_ai_api(prompt, image_url, reservation=None):
+            service.model_calls += 1
+            return AI_RESPONSE
+
+        monkeypatch.setattr(service, "_call_ai_api", call_ai_api)
+        return service
+
+    @staticmethod
+    def recognize(service, quota_key):
+        return asyncio.run(service.recognize_invoice_bytes(make_image(), "image/png", quota_key))
+
+    def test_exact_reupload_is_flagged(self, service):
+        first = self.recognize(service, "user:1")
+        second = self.recognize(service, "user:1")
+        assert service.model_calls == 1
+        assert first.duplicateOf is None
+        assert second.duplicateOf == first.id and second.id != first.id
+
+    def test_exact_reupload_reuses_previous_result(self, service, monkeypatch):
+        monkeypatch.setattr(settings, "DUPLICATE_ACTION", "reuse")
+        first = self.recognize(service, "user:1")
+        second = self.recognize(service, "user:1")
+        assert second.duplicateOf == first.id
+        assert second.invoiceNumber == first.invoiceNumber
+
+    def test_cache_hit_from_other_user_is_indexed(self, service):
+        self.recognize(service, "user:1")
+        first = self.recognize(service, "user:2")
+        second = self.recognize(service, "user:2")
+        assert service.model_calls == 1
+        assert first.duplicateOf is None
+        assert second.duplicateOf == first.id
+
+    def test_stream_cache_hit_is_flagged(self, service):
+        first = self.recognize(service, "user:1")
+
+        async def stream():
+            return [event async for event in service.recognize_invoice_stream(
+                base64.b64encode(make_image()).decode(), "user:1"
+            )]
+
+        event, data = asyncio.run(stream())[-1]
+        assert event == "done"
+        assert data.duplicateOf == first.id
+
+    def test_hash_is_computed_when_not_cached(self, service, monkeypatch):
+        monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", False)
+        first = self.recognize(service, "user:1")
+        monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", True)
+        # 緩存中沒有雜湊：命中時重新計算並加入索引
+        assert self.recognize(service, "user:1").duplicateOf is None
+        third = self.recognize(service, "user:1")
+        assert service.model_calls == 1
+        assert third.duplicateOf is not None and third.duplicateOf != first.id
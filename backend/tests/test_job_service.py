@@ -0,0 +1,155 @@
+"""識別任務隊列測試"""
+import asyncio
+
+import pytest
+
+from app.core.exceptions import ServiceUnavailableException
+from app.services import job_service as job_module
+from app.services.invoice_service import invoice_service
+from app.services.job_service import (
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    RecognitionJobService,
+)
+
+
+@pytest.fixture
+def recognized(monkeypatch):
+    """以假識別結果替代 invoice_service，記錄 (圖片, 配額鍵)；release 事件控制識別何時完成"""
+    calls = []
+    release = asyncio.Event()
+    release.set()
+
+    async def recognize_invoice(base64_image, quota_key=None):
+        calls.append((base64_image, quota_key))
+        await release.wait()
+        if base64_image == "bad":
+            return False, None, "識別失敗"
+        if base64_image == "boom":
+            raise RuntimeError("boom")
+        return True, {"image": base64_image}, None
+
+    monkeypatch.setattr(invoice_service, "recognize_invoice", recognize_invoice)
+    return calls, release
+
+
+def run(service: RecognitionJobService, scenario):
+    """在事件循環中執行測試流程，結束後停止 worker"""
+
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await service.stop()
+
+    return asyncio.run(main())
+
+
+def test_submit_and_wait(recognized):
+    calls, _ = recognized
+    service = RecognitionJobService(worker_count=2)
+
+    async def scenario():
+        job = service.submit("image", quota_key="user:1")
+        assert job.status == JOB_PENDING
+        return await service.wait(job.id, timeout=1, quota_key="user:1")
+
+    job = run(service, scenario)
+    assert job.status == JOB_SUCCEEDED
+    assert job.data == {"image": "image"}
+    # 完成後釋放圖片資料
+    assert job.image is None and job.finished_at is not None
+    assert calls == [("image", "user:1")]
+
+
+@pytest.mark.parametrize("image, message", [("bad", "識別失敗"), ("boom", "發票識別失敗: boom")])
+def test_failed_jobs(recognized, image, message):
+    service = RecognitionJobService(worker_count=1)
+
+    async def scenario():
+        job = service.submit(image)
+        return await service.wait(job.id, timeout=1)
+
+    job = run(service, scenario)
+    assert job.status == JOB_FAILED
+    assert job.message == message
+
+
+def test_jobs_are_scoped_to_submitter(recognized):
+    service = RecognitionJobService(worker_count=1)
+
+    async def scenario():
+        job = service.submit("image", quota_key="user:1")
+        other = await service.wait(job.id, timeout=1, quota_key="user:2")
+        owner = await service.wait(job.id, timeout=1, quota_key="user:1")
+        return job, other, owner
+
+    job, other, owner = run(service, scenario)
+    assert other is None
+    assert owner is job and owner.status == JOB_SUCCEEDED
+    assert service.get(job.id, quota_key="user:2") is None
+    # 未指定配額鍵（未啟用配額時）不限制
+    assert service.get(job.id) is job
+
+
+def test_wait_times_out_on_running_job(recognized):
+    _, release = recognized
+    release.clear()
+    service = RecognitionJobService(worker_count=1)
+
+    async def scenario():
+        job = service.submit("image")
+        waited = await service.wait(job.id, timeout=0.05)
+        status = waited.status
+        release.set()
+        await service.wait(job.id, timeout=1)
+        return status, job.status
+
+    assert run(service, scenario) == (JOB_RUNNING, JOB_SUCCEEDED)
+
+
+def test_full_queue_is_rejected(recognized):
+    _, release = recognized
+    release.clear()
+    service = RecognitionJobService(max_queue_size=1, worker_count=1)
+
+    async def scenario():
+        service.submit("first")
+        await asyncio.sleep(0)
+        service.submit("queued")
+        with pytest.raises(ServiceUnavailableException):
+            service.submit("rejected")
+        stats = service.get_stats()
+        release.set()
+        return stats
+
+    stats = run(service, scenario)
+    assert stats["queue_size"] == 1
+    assert stats["jobs"][JOB_RUNNING] == 1 and stats["jobs"][JOB_PENDING] == 1
+
+
+def test_expired_jobs_are_purged_in_finish_order(recognized, monkeypatch):
+    service = RecognitionJobService(worker_count=1, ttl_seconds=60)
+    clock = [1000.0]
+    monkeypatch.setattr(job_module.time, "time", lambda: clock[0])
+
+    async def scenario():
+        first = service.submit("first")
+        await service.wait(first.id, timeout=1)
+        clock[0] += 30
+        second = service.submit("second")
+        await service.wait(second.id, timeout=1)
+
+        # 第一個任務已過期：查詢返回 None，下次提交時從完成隊列清除
+        clock[0] += 31
+        assert service.get(second.id) is second
+        assert service.get(first.id) is None
+        third = service.submit("third")
+        await service.wait(third.id, timeout=1)
+        return first, second, third
+
+    first, second, third = run(service, scenario)
+    assert set(service.jobs) == {second.id, third.id}
+    assert [job_id for _, job_id in service._finished] == [second.id, third.id]
@@ -0,0 +1,80 @@
+"""增量 JSON 解析測試"""
+import json
+
+import pytest
+
+from app.utils.json_stream import StreamingJSONObjectParser
+
+INVOICE = {
+    "invoice_number": "AB-12345678",
+    "invoice_date": "2024-01-15",
+    "seller_name": 'Shop "A" {Main} [1]',
+    "total_amount": 1234.5,
+    "tax_amount": None,
+    "is_copy": False,
+    "items": [
+        {"id": 1, "name": "咖啡 \\ 拿鐵", "price": 120, "tags": ["hot", {"size": "L"}]},
+        {"id": 2, "name": "蛋糕}", "price": 80, "tags": []},
+    ],
+    "extra": {"note": "a, b", "lines": [1, 2]},
+    "currency": "TWD",
+}
+
+
+def parse(chunks, array_fields=("items",)):
+    """依序輸入所有片段，返回 (事件列表, 解析器)"""
+    parser = StreamingJSONObjectParser(array_fields=array_fields)
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events, parser
+
+
+def expected_events(data, array_fields=("items",)):
+    events = []
+    for key, value in data.items():
+        if key in array_fields:
+            events.extend(("item", key, item) for item in value)
+        else:
+            events.append(("field", key, value))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 10_000])
+def test_chunk_boundaries_do_not_matter(size):
+    text = json.dumps(INVOICE, ensure_ascii=False, indent=2)
+    events, parser = parse(text[i:i + size] for i in range(0, len(text), size))
+    assert events == expected_events(INVOICE)
+    assert parser.finished
+
+
+def test_items_are_emitted_as_soon_as_complete():
+    text = json.dumps(INVOICE, ensure_ascii=False)
+    first_item_end = text.index('"id": 2') - len(", {")
+    parser = StreamingJSONObjectParser(array_fields=("items",))
+    events = parser.feed(text[:first_item_end])
+    assert events[-1] == ("item", "items", INVOICE["items"][0])
+    assert not parser.finished
+
+
+def test_ignores_text_around_object():
+    text = "```json\n" + json.dumps({"a": 1, "items": [{"x": "}"}]}) + "\n```\n{\"b\": 2}"
+    events, parser = parse([text])
+    assert events == [("field", "a", 1), ("item", "items", {"x": "}"})]
+    assert parser.finished
+
+
+def test_primitive_values_at_end_of_object():
+    events, _ = parse(['{"a": 12', ', "b": true', ', "c": null}'])
+    assert events == [("field", "a", 12), ("field", "b", True), ("field", "c", None)]
+
+
+def test_array_without_streaming_is_a_field():
+    events, _ = parse(['{"items": [{"x": 1}], "tags": ["a", "b"]}'], array_fields=())
+    assert events == [("field", "items", [{"x": 1}]), ("field", "tags", ["a", "b"])]
+
+
+def test_incomplete_object_is_not_finished():
+    events, parser = parse(['{"a": "unterminated ', "string"])
+    assert events == []
+    assert not parser.finished
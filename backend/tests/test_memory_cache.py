@@ -0,0 +1,88 @@
+"""有界內存緩存測試"""
+import asyncio
+
+from app.core.cache import CacheService, MemoryCache, estimate_size
+
+
+def test_evicts_least_recently_used_by_entries():
+    cache = MemoryCache(max_entries=3)
+    for key in "abc":
+        cache.set(key, key, 60)
+    assert cache.get("a") == "a"
+    cache.set("d", "d", 60)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_evicts_by_estimated_bytes():
+    value = "x" * 1000
+    entry_size = estimate_size("k0") + estimate_size(value)
+    cache = MemoryCache(max_entries=100, max_bytes=entry_size * 3)
+    for index in range(5):
+        assert cache.set(f"k{index}", value, 60)
+    stats = cache.get_stats()
+    assert stats["entries"] == 3
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert stats["evictions"] == 2
+    assert cache.get("k0") is None and cache.get("k4") == value
+
+
+def test_oversized_value_is_not_cached():
+    cache = MemoryCache(max_bytes=1024)
+    cache.set("small", "x", 60)
+    assert not cache.set("big", "x" * 4096, 60)
+    assert cache.get("big") is None
+    # 不會為了放入過大的值而淘汰現有條目
+    assert cache.get("small") == "x"
+
+
+def test_replacing_and_deleting_keep_byte_count():
+    cache = MemoryCache()
+    cache.set("a", "x" * 100, 60)
+    cache.set("a", "y" * 10, 60)
+    assert cache.current_bytes == estimate_size("a") + estimate_size("y" * 10)
+    assert cache.delete("a")
+    assert not cache.delete("a")
+    assert cache.current_bytes == 0
+
+
+def test_expired_entries():
+    cache = MemoryCache(sweep_interval=3600)
+    cache.set("a", 1, 0)
+    assert cache.get("a") is None
+    stats = cache.get_stats()
+    assert (stats["expirations"], stats["misses"], stats["entries"]) == (1, 1, 0)
+
+
+def test_sweep_removes_write_only_keys():
+    cache = MemoryCache(sweep_interval=0)
+    for index in range(10):
+        cache.set(f"k{index}", index, 0)
+    cache.set("live", 1, 60)
+    assert cache.get_stats()["entries"] == 1
+    assert cache.current_bytes == estimate_size("live") + estimate_size(1)
+
+
+def test_hit_rate():
+    cache = MemoryCache()
+    cache.set("a", 1, 60)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+
+def test_cache_service_uses_bounded_instance_cache():
+    service = CacheService(max_entries=2)
+
+    async def main():
+        for key in "abc":
+            await service.set(key, {"value": key}, 60)
+        return await service.get_many(list("abc"))
+
+    assert asyncio.run(main()) == {"b": {"value": "b"}, "c": {"value": "c"}}
+    assert service.get_stats()["backend"] == "memory"
+    assert service.get_stats()["max_entries"] == 2
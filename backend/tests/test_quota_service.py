@@ -0,0 +1,101 @@
+"""AI 用量配額預留與結算測試"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.quota_service import MemoryUsageStore, QuotaExceededError, QuotaService
+
+
+@pytest.fixture
+def quota(monkeypatch):
+    """每日 5000 token、1MB 圖片流量的配額服務（進程內存儲存）"""
+    monkeypatch.setattr(settings, "AI_QUOTA_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_QUOTA_TOKEN_ESTIMATE", 1500)
+    monkeypatch.setattr(settings, "AI_QUOTA_DAILY_TOKENS", 5000)
+    monkeypatch.setattr(settings, "AI_QUOTA_MONTHLY_TOKENS", 0)
+    monkeypatch.setattr(settings, "AI_QUOTA_DAILY_IMAGE_BYTES", 1024 * 1024)
+    monkeypatch.setattr(settings, "AI_QUOTA_MONTHLY_IMAGE_BYTES", 0)
+    return QuotaService(store=MemoryUsageStore())
+
+
+def daily(quota: QuotaService, key: str = "user:1"):
+    return asyncio.run(quota.get_usage(key))["daily"]
+
+
+def test_reserve_counts_estimate_and_image(quota):
+    reservation = asyncio.run(quota.reserve("user:1", 1000))
+    assert reservation.estimated_tokens == 1500
+    usage = daily(quota)
+    assert usage["tokens"] == 1500
+    assert usage["image_bytes"] == 1000
+    assert usage["requests"] == 1
+
+
+def test_settle_with_usage_replaces_estimate(quota):
+    reservation = asyncio.run(quota.reserve("user:1", 1000))
+    reservation.record_usage(SimpleNamespace(prompt_tokens=900, completion_tokens=300))
+    asyncio.run(quota.settle(reservation))
+    usage = daily(quota)
+    assert usage["tokens"] == 1200
+    assert usage["prompt_tokens"] == 900
+    assert usage["completion_tokens"] == 300
+
+
+def test_settle_without_usage_refunds_estimate(quota):
+    reservation = asyncio.run(quota.reserve("user:1", 1000))
+    asyncio.run(quota.settle(reservation))
+    usage = daily(quota)
+    assert usage["tokens"] == 0
+    # 圖片已發送，流量不退還
+    assert usage["image_bytes"] == 1000
+
+
+def test_exceeded_quota_rolls_back(quota):
+    for _ in range(3):
+        asyncio.run(quota.reserve("user:1", 1000))
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(quota.reserve("user:1", 1000))
+    usage = daily(quota)
+    assert usage["tokens"] == 4500
+    assert usage["requests"] == 3
+    assert quota.rejected == 1
+    # 其他使用者不受影響
+    assert asyncio.run(quota.reserve("user:2", 1000)) is not None
+
+
+def test_image_bytes_limit(quota):
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(quota.reserve("user:1", 2 * 1024 * 1024))
+    assert daily(quota)["image_bytes"] == 0
+
+
+def test_settled_tokens_free_quota(quota):
+    for _ in range(3):
+        reservation = asyncio.run(quota.reserve("user:1", 0))
+        reservation.record_usage(SimpleNamespace(prompt_tokens=400, completion_tokens=100))
+        asyncio.run(quota.settle(reservation))
+    # 已結算 1500 token，仍可再預留兩次
+    asyncio.run(quota.reserve("user:1", 0))
+    asyncio.run(quota.reserve("user:1", 0))
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(quota.reserve("user:1", 0))
+
+
+def test_disabled_or_anonymous_is_not_metered(quota, monkeypatch):
+    assert asyncio.run(quota.reserve(None, 1000)) is None
+    monkeypatch.setattr(settings, "AI_QUOTA_ENABLED", False)
+    assert asyncio.run(quota.reserve("user:1", 1000)) is None
+    asyncio.run(quota.settle(None))
+    assert daily(quota)["tokens"] == 0
+
+
+def test_memory_store_drops_buckets_outside_window():
+    store = MemoryUsageStore()
+    day = 86400.0
+    asyncio.run(store.add("user:1", {"tokens": 10}, 100 * day))
+    assert asyncio.run(store.get_usage("user:1", 100 * day + 3600))["daily"]["tokens"] == 10
+    assert asyncio.run(store.get_usage("user:1", 101 * day + 1))["daily"]["tokens"] == 0
+    assert asyncio.run(store.get_usage("user:1", 101 * day + 1))["monthly"]["tokens"] == 10
+    assert asyncio.run(store.get_usage("user:1", 130 * day))["monthly"]["tokens"] == 0
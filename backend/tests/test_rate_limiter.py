@@ -0,0 +1,232 @@
+"""GCRA 限流器與限流中間件路由規則測試"""
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.core.rate_limiter import (
+    FileRateLimitStore,
+    GCRARateLimiter,
+    MemoryRateLimitStore,
+    RateLimitStore,
+    RedisRateLimitStore,
+    create_rate_limit_store,
+    gcra_update,
+)
+from app.middleware.rate_limit import RateLimitMiddleware
+
+
+class TestGCRAUpdate:
+    def test_allows_burst_up_to_period(self):
+        tat = None
+        for _ in range(10):
+            allowed, tat, retry_after = gcra_update(tat, 0.0, 1.0, 10.0, 1)
+            assert allowed and retry_after == 0.0
+        allowed, unchanged, retry_after = gcra_update(tat, 0.0, 1.0, 10.0, 1)
+        assert not allowed
+        assert unchanged == tat
+        assert retry_after == pytest.approx(1.0)
+
+    def test_recovers_one_unit_per_emission_interval(self):
+        _, tat, _ = gcra_update(None, 0.0, 1.0, 2.0, 2)
+        assert not gcra_update(tat, 0.5, 1.0, 2.0, 1)[0]
+        assert gcra_update(tat, 1.0, 1.0, 2.0, 1)[0]
+
+    def test_idle_key_starts_from_now(self):
+        # 很久以前的 TAT 不會累積額外配額
+        allowed, tat, _ = gcra_update(-1000.0, 0.0, 1.0, 5.0, 5)
+        assert allowed and tat == 5.0
+        assert not gcra_update(tat, 0.0, 1.0, 5.0, 1)[0]
+
+
+@pytest.fixture(params=["memory", "file", "redis"])
+def make_limiter(request, tmp_path):
+    """按參數建立使用各儲存後端的限流器（Redis 使用 fakeredis）"""
+    if request.param == "redis":
+        request.getfixturevalue("fake_redis")
+
+    def make(limit: int, period: float = 60.0) -> GCRARateLimiter:
+        if request.param == "memory":
+            store = MemoryRateLimitStore()
+        elif request.param == "file":
+            store = FileRateLimitStore(str(tmp_path / "rate_limit.dat"), slots=64)
+        else:
+            store = RedisRateLimitStore("redis://fake")
+        return GCRARateLimiter(limit=limit, period=period, store=store)
+
+    return make
+
+
+def run(limiter: GCRARateLimiter, requests):
+    """
+    在同一事件循環中依序發出請求，返回各次結果
+
+    Args:
+        requests: [(鍵, 消耗量), ...]
+    """
+
+    async def main():
+        try:
+            return [await limiter.hit(key, cost) for key, cost in requests]
+        finally:
+            await limiter.store.close()
+
+    return asyncio.run(main())
+
+
+class TestGCRARateLimiter:
+    def test_limit_and_remaining(self, make_limiter):
+        results = run(make_limiter(3), [("a", 1)] * 4)
+        assert [result.allowed for result in results] == [True, True, True, False]
+        assert [result.remaining for result in results[:3]] == [2, 1, 0]
+        assert results[3].retry_after == pytest.approx(20.0, abs=0.1)
+
+    def test_keys_are_independent(self, make_limiter):
+        results = run(make_limiter(1), [("a", 1), ("b", 1), ("a", 1)])
+        assert [result.allowed for result in results] == [True, True, False]
+
+    def test_rejected_request_does_not_consume(self, make_limiter):
+        results = run(make_limiter(5), [("a", 4), ("a", 2), ("a", 1)])
+        assert [result.allowed for result in results] == [True, False, True]
+
+    def test_cost_above_limit_is_capped(self, make_limiter):
+        # 消耗量超過上限時按上限計算：配額全滿時仍可放行一次
+        first, second = run(make_limiter(10), [("a", 20), ("a", 20)])
+        assert first.allowed and first.remaining == 0
+        assert not second.allowed
+        assert second.retry_after == pytest.approx(60.0, abs=0.1)
+
+    def test_recovers_after_emission_interval(self, make_limiter):
+        limiter = make_limiter(2, period=0.2)
+
+        async def main():
+            try:
+                assert (await limiter.hit("a", 2)).allowed
+                assert not (await limiter.hit("a", 1)).allowed
+                await asyncio.sleep(0.12)
+                return await limiter.hit("a", 1)
+            finally:
+                await limiter.store.close()
+
+        assert asyncio.run(main()).allowed
+
+
+class TestRedisRateLimitStore:
+    def test_keys_expire_after_full_recovery(self, fake_redis):
+        store = RedisRateLimitStore("redis://fake", key_prefix="rl:")
+
+        async def main():
+            try:
+                await store.update("a", 1.0, 60.0, 3)
+                return await store.redis_client.pttl("rl:a")
+            finally:
+                await store.close()
+
+        assert 2900 <= asyncio.run(main()) <= 3000
+
+    def test_falls_back_to_memory_and_backs_off(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_RETRY_SECONDS", 30.0)
+        fake_redis.connected = False
+        store = RedisRateLimitStore("redis://fake")
+        calls = 0
+        script = store._script
+
+        async def counting_script(**kwargs):
+            nonlocal calls
+            calls += 1
+            return await script(**kwargs)
+
+        store._script = counting_script
+        limiter = GCRARateLimiter(limit=2, period=60.0, store=store)
+        results = run(limiter, [("a", 1)] * 3)
+        # 首次失敗後的請求不再嘗試 Redis，由進程內存照常限流
+        assert calls == 1
+        assert [result.allowed for result in results] == [True, True, False]
+        stats = store.get_stats()
+        assert stats["fallback_count"] == 3 and stats["degraded"]
+
+    def test_retries_redis_after_backoff(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(settings, "REDIS_RETRY_SECONDS", 0.0)
+        fake_redis.connected = False
+        store = RedisRateLimitStore("redis://fake")
+
+        async def main():
+            try:
+                await store.update("a", 1.0, 60.0, 1)
+                fake_redis.connected = True
+                await store.update("a", 1.0, 60.0, 1)
+                return await store.redis_client.exists("ratelimit:a")
+            finally:
+                await store.close()
+
+        assert asyncio.run(main()) == 1
+        assert store.fallback_count == 1
+        assert not store.get_stats()["degraded"]
+
+
+@pytest.mark.parametrize(
+    "storage, redis_enabled, expected",
+    [
+        ("auto", True, RedisRateLimitStore),
+        ("auto", False, MemoryRateLimitStore),
+        ("redis", False, RedisRateLimitStore),
+        ("file", True, FileRateLimitStore),
+        ("memory", True, MemoryRateLimitStore),
+    ],
+)
+def test_create_rate_limit_store(fake_redis, monkeypatch, tmp_path, storage, redis_enabled, expected):
+    monkeypatch.setattr(settings, "RATE_LIMIT_STORAGE", storage)
+    monkeypatch.setattr(settings, "REDIS_ENABLED", redis_enabled)
+    monkeypatch.setattr(settings, "RATE_LIMIT_FILE_PATH", str(tmp_path / "rate_limit.dat"))
+    store = create_rate_limit_store()
+    assert type(store) is expected
+    asyncio.run(store.close())
+
+
+def test_store_requires_update():
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+class TestRouteCosts:
+    @pytest.fixture
+    def middleware(self):
+        return RateLimitMiddleware(
+            None,
+            requests_per_minute=60,
+            route_costs={
+                "/api/invoice/health": 0,
+                "/api/invoice/recognize": 5,
+                "/api/invoice/recognize/batch": 20,
+                "POST /api/invoice/jobs": 5,
+            },
+        )
+
+    @pytest.mark.parametrize(
+        "method, path, cost",
+        [
+            ("POST", "/api/invoice/recognize", 5),
+            ("POST", "/api/invoice/recognize/upload", 5),
+            ("POST", "/api/invoice/recognize/batch", 20),
+            ("GET", "/api/invoice/health", 0),
+            ("POST", "/api/invoice/jobs", 5),
+            ("GET", "/api/invoice/jobs/123", 1),
+            ("GET", "/api/invoice/list", 1),
+        ],
+    )
+    def test_longest_prefix_wins(self, middleware, method, path, cost):
+        assert middleware.get_cost(method, path) == cost
+
+    def test_prefix_matches_whole_segments(self, middleware):
+        assert middleware.get_cost("POST", "/api/invoice/recognizer") == 1
+        assert middleware.get_cost("GET", "/api/invoice/healthz") == 1
+
+
+def test_rejected_requests_pass_through_logging_middleware():
+    from app.main import app
+    from app.middleware.logging import LoggingMiddleware
+
+    # 最後註冊的中介軟體位於最外層；被限流拒絕的 429 也應記錄日誌與耗時指標
+    classes = [middleware.cls for middleware in app.user_middleware]
+    assert classes[0] is LoggingMiddleware
+    assert classes.index(RateLimitMiddleware) > 0
@@ -0,0 +1,95 @@
+"""識別結果緩存測試"""
+import asyncio
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services.ai_service import AIService
+
+AI_RESPONSE = json.dumps({
+    "invoiceNumber": "12345678",
+    "invoiceCode": "044001",
+    "date": "2024-01-15",
+    "amount": "100.00",
+    "taxAmount": "13.00",
+    "totalAmount": "113.00",
+    "seller": "測試商店",
+    "sellerTaxId": "91440000TEST",
+    "buyer": "",
+    "buyerTaxId": "",
+    "remarks": "",
+    "items": [{"name": "咖啡", "quantity": "1", "price": "100.00"}],
+})
+
+
+def make_image(color=(200, 200, 200)) -> bytes:
+    """生成測試用 PNG 圖片"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """以假模型回應替代 AI 調用的識別服務，model_calls 記錄調用次數"""
+    monkeypatch.setattr(settings, "RECOGNITION_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", False)
+    service = AIService()
+    service.model_calls = 0
+
+    async def call_ai_api(prompt, image_url, reservation=None):
+        service.model_calls += 1
+        await asyncio.sleep(0)
+        return AI_RESPONSE
+
+    monkeypatch.setattr(service, "_call_ai_api", call_ai_api)
+    return service
+
+
+def recognize(service: AIService, image_bytes: bytes):
+    return asyncio.run(service.recognize_invoice_bytes(image_bytes, "image/png"))
+
+
+def test_hit_skips_model_call(service):
+    first = recognize(service, make_image())
+    second = recognize(service, make_image())
+    assert service.model_calls == 1
+    assert second.invoiceNumber == first.invoiceNumber == "12345678"
+    assert [item.name for item in second.items] == ["咖啡"]
+
+
+def test_hit_returns_fresh_ids(service):
+    first = recognize(service, make_image())
+    second = recognize(service, make_image())
+    third = recognize(service, make_image())
+    assert len({first.id, second.id, third.id}) == 3
+    assert len({first.items[0].id, second.items[0].id, third.items[0].id}) == 3
+
+
+def test_hit_and_miss_counters(service):
+    recognize(service, make_image())
+    recognize(service, make_image())
+    recognize(service, make_image((10, 20, 30)))
+    stats = service.get_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-4)
+    assert service.model_calls == 2
+
+
+def test_disabled_cache_always_calls_model(service, monkeypatch):
+    monkeypatch.setattr(settings, "RECOGNITION_CACHE_ENABLED", False)
+    recognize(service, make_image())
+    recognize(service, make_image())
+    assert service.model_calls == 2
+    assert service.get_cache_stats()["hits"] == 0
+
+
+def test_key_depends_on_model_and_prompt_version(service, monkeypatch):
+    key = service._get_cache_key(b"image")
+    assert key == service._get_cache_key(b"image")
+    assert key != service._get_cache_key(b"other")
+    monkeypatch.setattr(settings, "AI_PROMPT_VERSION", settings.AI_PROMPT_VERSION + "-next")
+    assert key != service._get_cache_key(b"image")
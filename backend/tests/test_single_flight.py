@@ -0,0 +1,199 @@
+"""請求合併（single-flight）與緩存提前刷新測試"""
+import asyncio
+import random
+
+import pytest
+
+from app.config import settings
+from app.core import cache as cache_module
+from app.core.cache import SingleFlight, cached
+from app.services.ai_service import AIService
+from tests.test_recognition_cache import AI_RESPONSE, make_image
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": calls}
+
+        async def main():
+            results = await asyncio.gather(*(flight.do("k", compute) for _ in range(10)))
+            return results, dict(flight._inflight)
+
+        results, inflight = asyncio.run(main())
+        assert calls == 1
+        assert all(result is results[0] for result in results)
+        assert flight.coalesced == 9
+        assert inflight == {}
+
+    def test_exception_reaches_every_caller_and_is_not_cached(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def main():
+            results = await asyncio.gather(
+                *(flight.do("k", compute) for _ in range(3)), return_exceptions=True
+            )
+            with pytest.raises(RuntimeError):
+                await flight.do("k", compute)
+            return results
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert calls == 2
+
+    def test_cancelled_caller_does_not_cancel_computation(self):
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def main():
+            first = asyncio.create_task(flight.do("k", compute))
+            second = asyncio.create_task(flight.do("k", compute))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second, first.cancelled()
+
+        assert asyncio.run(main()) == ("done", True)
+
+    def test_claim_and_join(self):
+        flight = SingleFlight()
+
+        async def main():
+            future = flight.claim("k")
+            joined = flight.join("k")
+            assert joined is future
+            assert flight.join("other") is None
+            waiter = asyncio.ensure_future(flight.do("k", lambda: pytest.fail("不應再次計算")))
+            future.set_result("streamed")
+            return await waiter, await joined
+
+        assert asyncio.run(main()) == ("streamed", "streamed")
+        assert flight._inflight == {}
+        assert flight.coalesced == 2
+
+
+@pytest.fixture
+def clear_cache():
+    """清空 cached 裝飾器使用的共享內存緩存"""
+    cache_module._memory_cache.clear()
+    yield
+    cache_module._memory_cache.clear()
+
+
+class TestCachedDecorator:
+    def test_concurrent_misses_compute_once(self, clear_cache):
+        calls = 0
+
+        @cached(expire_seconds=60)
+        async def load(key):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"key": key}
+
+        async def main():
+            return await asyncio.gather(*(load("a") for _ in range(5)), load("b"))
+
+        results = asyncio.run(main())
+        assert calls == 2
+        assert results[:5] == [{"key": "a"}] * 5 and results[5] == {"key": "b"}
+
+    @pytest.mark.parametrize("draw, refreshed", [(0.0, False), (1 - 1e-12, True)])
+    def test_xfetch_early_refresh(self, clear_cache, monkeypatch, draw, refreshed):
+        calls = 0
+
+        @cached(expire_seconds=60, early_refresh_beta=1000)
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.005)
+            return calls
+
+        async def main():
+            first = await load()
+            # XFetch 的提前量為 -delta * beta * ln(1 - rand)：rand 為 0 時不提前，
+            # 趨近 1 時提前量（約 0.005 * 1000 * 27.6 秒）超過剩餘的 60 秒
+            monkeypatch.setattr(random, "random", lambda: draw)
+            second = await load()
+            await asyncio.sleep(0.02)
+            monkeypatch.setattr(random, "random", lambda: 0.0)
+            return first, second, await load()
+
+        first, second, third = asyncio.run(main())
+        # 提前刷新在背景進行，觸發刷新的請求仍返回現有值
+        assert (first, second) == (1, 1)
+        assert third == (2 if refreshed else 1)
+        assert calls == (2 if refreshed else 1)
+
+    def test_stale_value_is_served_while_revalidating(self, clear_cache):
+        calls = 0
+
+        @cached(expire_seconds=0.05, stale_seconds=60, early_refresh_beta=0)
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        async def main():
+            first = await load()
+            await asyncio.sleep(0.06)
+            stale = await load()
+            await asyncio.sleep(0.03)
+            return first, stale, await load()
+
+        assert asyncio.run(main()) == (1, 1, 2)
+
+
+class TestRecognitionCoalescing:
+    @pytest.fixture
+    def service(self, monkeypatch):
+        """模型調用較慢的識別服務，model_calls 記錄調用次數"""
+        monkeypatch.setattr(settings, "RECOGNITION_CACHE_ENABLED", True)
+        monkeypatch.setattr(settings, "DUPLICATE_DETECTION_ENABLED", False)
+        monkeypatch.setattr(settings, "AI_QUOTA_ENABLED", False)
+        service = AIService()
+        service.model_calls = 0
+
+        async def call_ai_api(prompt, image_url, reservation=None):
+            service.model_calls += 1
+            await asyncio.sleep(0.05)
+            return AI_RESPONSE
+
+        monkeypatch.setattr(service, "_call_ai_api", call_ai_api)
+        return service
+
+    def recognize_concurrently(self, service, quota_keys):
+        image = make_image()
+
+        async def main():
+            return await asyncio.gather(
+                *(service.recognize_invoice_bytes(image, "image/png", key) for key in quota_keys)
+            )
+
+        return asyncio.run(main())
+
+    def test_same_image_same_user_calls_model_once(self, service):
+        results = self.recognize_concurrently(service, ["user:1"] * 5)
+        assert service.model_calls == 1
+        assert len({result.id for result in results}) == 5
+        assert service.get_cache_stats()["coalesced"] == 4
+
+    def test_different_users_are_not_coalesced(self, service):
+        self.recognize_concurrently(service, ["user:1", "user:2"])
+        assert service.model_calls == 2